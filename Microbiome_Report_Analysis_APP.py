@@ -1,21 +1,616 @@
 import streamlit as st
-import os
-from pathlib import Path
-from PIL import Image
+import importlib
+import io
+import tempfile
+import threading
+import time
+import zipfile
 
+import abundance_summary
 import clean_input_microbiome_taxonomy
+import diversity
 import generate_all_abundance_plots
 import generate_all_abundance_plots_with_series_lines
 import generate_all_heatmaps
+import generate_diversity
+import job_queue
+import lineage_tree
+import normalization
+import perf_trace
+import render_executor
+import report_formats
+import result_cache
+import table_store
+import taxon_search
 
 
 # ================= CONFIG =================
-TABLE_DIR = Path("tables")
-TABLE_DIR.mkdir(exist_ok=True)
+TABLE_DIR = "tables"
+SUMMARY_DIR = "summaries"
+INPUT_NAME = "input_taxonomy.txt"
+
+# Lineage tables or native Kraken2 / Bracken reports, plain or compressed
+UPLOAD_TYPES = report_formats.REPORT_EXTENSIONS + report_formats.COMPRESSED_EXTENSIONS
+TAX_LEVELS = clean_input_microbiome_taxonomy.TAX_LEVELS
+
+# Resolution of on-screen previews; downloads use each module's DPI
+PREVIEW_DPI = 80
+
+PLOT_MODULES = {
+    "Stacked bar plots": generate_all_abundance_plots,
+    "Stacked bar plots + series lines": generate_all_abundance_plots_with_series_lines
+}
+
+# Client-side (Vega-Lite) equivalents of each plot style
+# (functions of interactive_charts, imported on first use)
+INTERACTIVE_CHARTS = {
+    "Stacked bar plots": "stacked_bar_chart",
+    "Stacked bar plots + series lines": "stacked_bar_with_lines_chart"
+}
+
+PLOT_TOP_NS = sorted({
+    module.TOP_N for module in [*PLOT_MODULES.values(), generate_all_heatmaps]
+})
 
-LEVELS = ["domain", "phylum", "class", "order", "family", "genus", "species"]
+# Tables are kept (and cached) in the binary table store format;
+# CSV is only produced for downloads
+TABLE_SUFFIX = ".npz"
+CLEANED_PATH = clean_input_microbiome_taxonomy.OUTPUT_CLEANED.removesuffix(".csv") + TABLE_SUFFIX
+
+# Lookup structures built with the tables (cached, but not downloaded)
+INDEX_DIR = "index"
+TREE_PATH = f"{INDEX_DIR}/lineage_tree.npz"
+
+# Taxa offered by the drill-down picker at once (narrow the rest with its filter)
+DRILL_MAX_OPTIONS = 200
+
+# Per-session results; every value is a {archive path: bytes} dict
+RESULT_KEYS = ["tables", "abundance_plots", "heatmaps", "diversity"]
+
+# Result images are shown as thumbnails at most this wide (px), a page at a time
+THUMBNAIL_WIDTH = 1400
+IMAGES_PER_PAGE = 6
+
+# Result archives larger than this spill from memory to a temporary file
+ARCHIVE_SPOOL_BYTES = 16 * 1024 ** 2
 # =========================================
 
+state = st.session_state
+
+# ⏱️ Stage timings for the Performance panel (no-op unless enabled there).
+# A session keeps one recording across reruns; it is only stopped when the
+# settings change, so memory tracing stays on while any session needs it.
+perf_recorder = state.get("perf_recorder")
+perf_memory = bool(state.get("perf_enabled") and state.get("perf_memory"))
+if perf_recorder and (not state.get("perf_enabled") or perf_recorder["memory"] != perf_memory):
+    perf_trace.stop(state.pop("perf_recorder"))
+    perf_recorder = None
+if state.get("perf_enabled"):
+    if perf_recorder:
+        perf_trace.resume(perf_recorder)
+    else:
+        state["perf_recorder"] = perf_trace.start(state.setdefault("perf_events", []), memory=perf_memory)
+
+
+def show_cache_status(hit):
+    if hit:
+        st.caption("⚡ Cache hit: identical input and settings, results restored without recomputing.")
+    else:
+        st.caption("🧮 Cache miss: results computed and stored for future runs.")
+
+
+def reset_results():
+    for key in RESULT_KEYS + [
+        "level_tables", "summaries", "indexes", "lineage_tree", "taxon_index", "taxon_filter", "filtered_tables",
+        "level_totals",
+        "normalized", "previews", "thumbnails", "full_resolution", "result_times",
+        "jobs"
+    ]:
+        state.pop(key, None)
+
+
+def set_results(key, files):
+    # The time stamp stands in for the file mtime in the archive manifest
+    state[key] = files
+    state.setdefault("result_times", {})[key] = time.time()
+
+
+def run_cached(input_hash, compute, **params):
+    """
+    Returns (files, cache_hit) for a pipeline stage on an upload,
+    computing and storing the files only on a cache miss.
+    """
+    key = result_cache.cache_key(input_hash, **params)
+    with perf_trace.stage("cache_restore", **params):
+        files = result_cache.restore(key)
+    if files is not None:
+        return files, True
+
+    with perf_trace.stage("compute", **params):
+        files = compute()
+    with perf_trace.stage("cache_store", **params):
+        result_cache.store(key, files)
+    return files, False
+
+
+def table_path(level):
+    return f"{TABLE_DIR}/{level.lower()}_table{TABLE_SUFFIX}"
+
+
+def summary_path(level, top_n):
+    return f"{SUMMARY_DIR}/{level.lower()}_top{top_n}{TABLE_SUFFIX}"
+
+
+def download_callback(compute, stage, memo=None, key=None, **args):
+    """
+    Download callable running `compute()` (the file's bytes) when its
+    button is clicked, timed as `stage`. It runs on a download thread, so
+    `compute` may only touch objects it captured, never st.session_state.
+    With `memo`, the bytes are kept in memo[key] and computed once.
+    """
+    def download():
+        if memo is not None and key in memo:
+            return memo[key]
+        with perf_trace.stage(stage, **args):
+            data = compute()
+        if memo is not None:
+            memo[key] = data
+        return data
+
+    return perf_trace.bind(download)
+
+
+def csv_exports(files):
+    """
+    Maps stored tables to CSV download callables ({csv path: callable});
+    each table is only converted when its CSV is requested.
+    """
+    def export(data):
+        return download_callback(
+            lambda: table_store.from_bytes(data).to_csv(index=False).encode(), "csv_export"
+        )
+
+    return {
+        path.removesuffix(TABLE_SUFFIX) + ".csv": export(data)
+        for path, data in files.items()
+    }
+
+
+def normalized_exports(method, **options):
+    """
+    CSV download callables of every level table normalized with `method`.
+    Each table is normalized once per setting, when first requested.
+    """
+    level_tables = load_level_tables()
+    memo = state.setdefault("normalized", {})
+    setting = (method, tuple(sorted(options.items())))
+
+    def export(level):
+        return download_callback(
+            lambda: normalization.normalize(level_tables[level], method, **options)
+            .to_csv(index=False).encode(),
+            "normalize", memo, (level, setting), level=level, method=method
+        )
+
+    return {
+        f"{TABLE_DIR}/{level.lower()}_table_{method}.csv": export(level)
+        for level in level_tables
+    }
+
+
+def compute_tables(data, sample, report):
+    # Runs as a background job: no session state in here
+    report(0, 4, "reading the report")
+    raw_df = clean_input_microbiome_taxonomy.read_taxonomy(io.BytesIO(data), sample)
+    report(1, 4, "cleaning lineages and building level tables")
+    cleaned_df, level_tables = clean_input_microbiome_taxonomy.process_taxonomy(raw_df)
+
+    files = {CLEANED_PATH: table_store.to_bytes(cleaned_df)}
+    for level, level_df in level_tables.items():
+        files[table_path(level)] = table_store.to_bytes(level_df)
+
+    report(2, 4, "indexing the lineage tree")
+    files[TREE_PATH] = lineage_tree.to_bytes(lineage_tree.build_tree(cleaned_df))
+
+    # 🔹 Top-N summaries are computed once and cached with the tables
+    report(3, 4, "summarizing the top taxa")
+    for top_n in PLOT_TOP_NS:
+        summaries = abundance_summary.summarize_tables(level_tables, top_n)
+        for level, summary in summaries.items():
+            files[summary_path(level, top_n)] = table_store.to_bytes(summary)
+
+    return files
+
+
+def input_name():
+    return state["input"].get("name", INPUT_NAME)
+
+
+def input_format():
+    # (format, compression) of the upload, detected from its first bytes
+    if "format" not in state["input"]:
+        stream = io.BytesIO(state["input"]["bytes"])
+        compression = report_formats.detect_compression(stream)
+        state["input"]["format"] = (report_formats.open_report(stream)[1], compression)
+    return state["input"]["format"]
+
+
+def clean_params():
+    params = dict(stage="clean", table_format=TABLE_SUFFIX)
+    # Native single-sample reports name their sample column after the file
+    if input_format()[0] != "lineage":
+        params["sample"] = report_formats.sample_name(input_name())
+    return params
+
+
+def clean_job(input_hash, data, params, report):
+    return run_cached(
+        input_hash,
+        lambda: compute_tables(data, params.get("sample"), report),
+        **params
+    )
+
+
+def load_level_tables():
+    # Level tables of a cache hit are rebuilt from their stored arrays
+    if "level_tables" not in state:
+        state["level_tables"] = {
+            level: table_store.from_bytes(state["tables"][table_path(level)])
+            for level in TAX_LEVELS
+            if table_path(level) in state["tables"]
+        }
+    return state["level_tables"]
+
+
+def set_table_results(files):
+    # Index files stay out of the table downloads
+    index_folder = f"{INDEX_DIR}/"
+    state["indexes"] = {path: data for path, data in files.items() if path.startswith(index_folder)}
+    set_results("tables", {
+        path: data for path, data in files.items() if not path.startswith(index_folder)
+    })
+
+
+def load_lineage_tree():
+    # Tables cached before the tree existed get it built on first use
+    if "lineage_tree" not in state:
+        data = state.get("indexes", {}).get(TREE_PATH)
+        state["lineage_tree"] = (
+            lineage_tree.from_bytes(data) if data
+            else lineage_tree.build_tree(table_store.from_bytes(state["tables"][CLEANED_PATH]))
+        )
+    return state["lineage_tree"]
+
+
+def load_taxon_index():
+    # Built once per dataset, on the first search
+    if "taxon_index" not in state:
+        state["taxon_index"] = taxon_search.build_index(load_lineage_tree())
+    return state["taxon_index"]
+
+
+def level_totals(level):
+    # Name totals of a rank, computed once per dataset
+    totals = state.setdefault("level_totals", {})
+    if level not in totals:
+        totals[level] = lineage_tree.level_totals(load_lineage_tree(), level)
+    return totals[level]
+
+
+def drill_options(level, query):
+    """
+    Taxa offered by the drill-down picker: the most abundant ones, or
+    those whose name contains `query` (looked up in the search index).
+    """
+    totals = level_totals(level)
+    if query:
+        index = load_taxon_index()
+        names = [index["names"][code] for code in taxon_search.match_names(index, query)]
+        totals = totals[totals.index.isin(names)]
+    return list(totals.index[:DRILL_MAX_OPTIONS])
+
+
+def set_taxon_filter(exclude, min_prevalence):
+    # Plots, previews and charts made with another filter are dropped
+    taxon_filter = (
+        {"exclude": sorted(exclude), "min_prevalence": min_prevalence}
+        if exclude or min_prevalence > 0 else None
+    )
+    if taxon_filter != state.get("taxon_filter"):
+        state["taxon_filter"] = taxon_filter
+        for key in [
+            "filtered_tables", "summaries", "previews", "full_resolution", "thumbnails",
+            "abundance_plots", "heatmaps"
+        ]:
+            state.pop(key, None)
+
+
+def load_summaries(top_n):
+    summaries = state.setdefault("summaries", {})
+    taxon_filter = state.get("taxon_filter")
+
+    if top_n not in summaries and taxon_filter:
+        if "filtered_tables" not in state:
+            state["filtered_tables"] = taxon_search.filter_level_tables(
+                load_lineage_tree(), **taxon_filter
+            )
+        summaries[top_n] = abundance_summary.summarize_tables(state["filtered_tables"], top_n)
+
+    if top_n not in summaries:
+        if all(summary_path(level, top_n) in state["tables"] for level in TAX_LEVELS):
+            summaries[top_n] = {
+                level: table_store.from_bytes(state["tables"][summary_path(level, top_n)])
+                for level in TAX_LEVELS
+            }
+        else:
+            summaries[top_n] = abundance_summary.summarize_tables(
+                load_level_tables(), top_n
+            )
+
+    return summaries[top_n]
+
+
+def plot_cache_params(module, **params):
+    # Filtered plots are cached apart from unfiltered ones
+    if state.get("taxon_filter"):
+        params["taxon_filter"] = state["taxon_filter"]
+    return dict(
+        stage=module.OUTPUT_DIR.as_posix(),
+        top_n=module.TOP_N,
+        dpi=module.DPI,
+        **params
+    )
+
+
+@perf_trace.timed()
+def generate_plots(input_hash, modules, families, summaries, report):
+    """
+    Returns (files, cache_hit) per plot module. Every family missing
+    from the result cache is rendered in one parallel batch, and each
+    level is reported as soon as it is rendered.
+    `families` holds the cache parameters of each module and `summaries`
+    maps each TOP_N to its level summaries.
+    """
+    keys = [result_cache.cache_key(input_hash, **params) for params in families]
+    results = [result_cache.restore(key) for key in keys]
+    missing = [i for i, files in enumerate(results) if files is None]
+
+    total = sum(len(summaries[modules[i].TOP_N]) for i in missing)
+    report(0, total, "restored from cache" if not missing else "rendering", {
+        path: png for files in results if files for path, png in files.items()
+    })
+
+    if missing:
+        done = 0
+
+        def on_result(request, level, name, png):
+            nonlocal done
+            done += 1
+            module = modules[missing[request]]
+            report(
+                done, total,
+                f"rendered {module.OUTPUT_DIR.as_posix()} {level} ({done}/{total})",
+                {f"{module.OUTPUT_DIR.as_posix()}/{name}": png}
+            )
+
+        rendered = render_executor.render_batch([
+            (modules[i].__name__, summaries[modules[i].TOP_N], modules[i].DPI)
+            for i in missing
+        ], on_result=on_result)
+
+        for i, pngs in zip(missing, rendered):
+            folder = modules[i].OUTPUT_DIR.as_posix()
+            results[i] = {f"{folder}/{name}": png for name, png in pngs.items()}
+            result_cache.store(keys[i], results[i])
+
+    return [(files, i not in missing) for i, files in enumerate(results)]
+
+
+def start_job(kind, job_id, func, *args, label):
+    # Identical work already queued or running (any session) is joined, not repeated
+    state.setdefault("jobs", {})[kind] = job_queue.submit(
+        job_id, perf_trace.bind(func), *args, label=label
+    )
+
+
+def start_plot_job(kind, modules, label):
+    summaries = {module.TOP_N: load_summaries(module.TOP_N) for module in modules}
+    families = [plot_cache_params(module) for module in modules]
+    input_hash = state["input"]["hash"]
+    job_id = result_cache.cache_key(input_hash, stage="plots", families=families)
+    start_job(kind, job_id, generate_plots, input_hash, modules, families, summaries, label=label)
+
+
+def follow_job(kind, on_partial=None):
+    """
+    Shows the progress of this session's `kind` job and passes results
+    that are already done to `on_partial`. Returns the job once it has
+    finished (and forgets it), otherwise None.
+    """
+    job_id = state.get("jobs", {}).get(kind)
+    if job_id is None:
+        return None
+
+    job = job_queue.status(job_id)
+    if job_queue.is_active(job):
+        if on_partial and job["partial"]:
+            on_partial(job["partial"])
+        job_progress(kind, len(job["partial"]) if on_partial else None)
+        return None
+
+    del state["jobs"][kind]
+    if job is None:
+        st.warning("This job's results expired before they were shown. Please run it again.")
+        return None
+    if job["status"] == "failed":
+        st.error(f"{job['label']} failed: {job['error']}")
+        return None
+    return job
+
+
+@st.fragment(run_every=job_queue.POLL_INTERVAL)
+def job_progress(kind, partial_shown=None):
+    """
+    Progress bar of a running job; only this fragment is polled. The page
+    reruns once the job finishes or, with `partial_shown`, once more
+    early results are ready than the page shows.
+    """
+    job = job_queue.status(state.get("jobs", {}).get(kind))
+    if not job_queue.is_active(job):
+        st.rerun()
+    if partial_shown is not None and len(job["partial"]) > partial_shown:
+        st.rerun()
+    st.progress(job_queue.progress(job), text=f"{job['label']}: {job['message']}")
+
+
+def job_running(kind):
+    return kind in state.get("jobs", {})
+
+
+def set_plot_results(files):
+    # Splits rendered files into the abundance plot and heatmap results
+    heatmap_folder = f"{generate_all_heatmaps.OUTPUT_DIR.as_posix()}/"
+    heatmaps = {path: png for path, png in files.items() if path.startswith(heatmap_folder)}
+    abundance = {path: png for path, png in files.items() if not path.startswith(heatmap_folder)}
+    if abundance:
+        set_results("abundance_plots", abundance)
+    if heatmaps:
+        set_results("heatmaps", heatmaps)
+
+
+def finish_plot_job(kind, success):
+    job = follow_job(kind, on_partial=set_plot_results)
+    if job is not None:
+        files = {}
+        for family_files, _ in job["result"]:
+            files.update(family_files)
+        set_plot_results(files)
+
+        st.success(success)
+        show_cache_status(all(hit for _, hit in job["result"]))
+
+
+def full_resolution_png(module, level):
+    """
+    Download callable for one plot: renders it at full resolution the
+    first time it is requested and memoizes the result in this session.
+    """
+    summary = load_summaries(module.TOP_N)[level]
+    memo = state.setdefault("full_resolution", {})
+    memo_key = (module.__name__, level)
+
+    # Reuse a plot already rendered by a full batch run
+    batch_path = f"{module.OUTPUT_DIR.as_posix()}/{module.png_name(level)}"
+    for key in ["abundance_plots", "heatmaps"]:
+        if batch_path in state.get(key, {}):
+            memo[memo_key] = state[key][batch_path]
+
+    return download_callback(
+        lambda: module.render_png(summary, level, module.DPI)[1],
+        "full_resolution_download", memo, memo_key, module=module.__name__
+    )
+
+
+def show_preview(module, level):
+    # Render only the selected level, at screen resolution
+    previews = state.setdefault("previews", {})
+    preview_key = (module.__name__, level)
+
+    if preview_key not in previews:
+        with perf_trace.stage("preview", module=module.__name__):
+            summary = load_summaries(module.TOP_N)[level]
+            previews[preview_key] = module.render_png(summary, level, PREVIEW_DPI)[1]
+
+    name = module.png_name(level)
+    st.image(previews[preview_key], caption=name, width="stretch")
+    st.download_button(
+        label=f"⬇️ Download {name} ({module.DPI} dpi)",
+        data=full_resolution_png(module, level),
+        file_name=name,
+        mime="image/png",
+        key=f"download_full_{preview_key}"
+    )
+
+
+def chart_builder(name):
+    # altair is only imported once an interactive chart is shown
+    return getattr(importlib.import_module("interactive_charts"), name)
+
+
+def show_interactive(chart_builder, module, level):
+    # Ships the small summary to the browser; nothing is rasterized here
+    with perf_trace.stage("interactive_chart", chart=chart_builder.__name__, level=level):
+        summary = load_summaries(module.TOP_N)[level]
+        chart = chart_builder(summary, level, module.TOP_N)
+    st.altair_chart(chart, width="stretch")
+
+
+def compute_diversity(level, metric):
+    level_df = load_level_tables()[level]
+    folder = generate_diversity.OUTPUT_DIR.as_posix()
+    return {
+        f"{folder}/{name}": data
+        for name, data in generate_diversity.diversity_files(level_df, level, metric).items()
+    }
+
+
+def show_downloads(files):
+    for path, data in files.items():
+        name = path.split("/")[-1]
+        st.download_button(
+            label=f"⬇️ Download {name}",
+            data=data,
+            file_name=name,
+            key=f"download_{path}"
+        )
+
+
+def thumbnail(path, data):
+    """
+    Screen-sized copy of a result image, made once per session. Streamlit
+    would otherwise decode, resize and re-encode every full-resolution
+    PNG on each rerun.
+    """
+    thumbnails = state.setdefault("thumbnails", {})
+    if path not in thumbnails:
+        from PIL import Image
+
+        with perf_trace.stage("thumbnail", path=path):
+            image = Image.open(io.BytesIO(data))
+            factor = -(-image.width // THUMBNAIL_WIDTH)
+            if factor > 1:
+                image = image.reduce(factor)
+                buffer = io.BytesIO()
+                image.save(buffer, format="PNG", compress_level=1)
+                thumbnails[path] = buffer.getvalue()
+            else:
+                thumbnails[path] = data
+    return thumbnails[path]
+
+
+def show_images(files, key):
+    paths = list(files)
+    if len(paths) > IMAGES_PER_PAGE:
+        n_pages = -(-len(paths) // IMAGES_PER_PAGE)
+        page = st.radio(
+            f"Page ({len(paths)} images)",
+            range(1, n_pages + 1),
+            horizontal=True,
+            key=f"{key}_page"
+        )
+        paths = paths[(page - 1) * IMAGES_PER_PAGE:page * IMAGES_PER_PAGE]
+
+    for path in paths:
+        name = path.split("/")[-1]
+        st.image(thumbnail(path, files[path]), caption=name, width="stretch")
+        st.download_button(
+            label=f"⬇️ Download {name}",
+            data=files[path],
+            file_name=name,
+            key=f"download_{path}"
+        )
+
+
 st.set_page_config(
     page_title="Microbiome Report Analysis Dashboard",
     layout="wide"
@@ -39,18 +634,36 @@ st.header("1️⃣ Upload Taxonomy File")
 st.caption(
     "Upload a Kraken2-style taxonomy report (.txt) to initiate downstream microbiome analysis. (NOTE - You can download the example input file from (Github - Microbiome_Streamlit_APP/sample_input_example/input_taxonomy.txt))"
 )
+st.caption(
+    "Native Kraken2 reports (.report / .kreport) and Bracken tables (.bracken) are converted on upload; "
+    "gzip, bz2 and xz compressed files (.gz / .bz2 / .xz) are read without unpacking them first."
+)
 
 uploaded_file = st.file_uploader(
     "Upload input_taxonomy.txt",
-    type=["txt"]
+    type=UPLOAD_TYPES
 )
 
 if uploaded_file:
-    input_path = Path("input_taxonomy.txt")
-    with open(input_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    # A new upload starts a fresh analysis in this session
+    if state.get("input", {}).get("file_id") != uploaded_file.file_id:
+        with perf_trace.stage("upload"):
+            data = uploaded_file.getvalue()
+            state["input"] = {
+                "file_id": uploaded_file.file_id,
+                "name": uploaded_file.name,
+                "bytes": data,
+                "hash": result_cache.content_hash(data)
+            }
+        reset_results()
     st.success("File uploaded successfully!")
 
+    report_format, compression = input_format()
+    st.caption(
+        f"Detected format: {report_formats.FORMATS[report_format]}"
+        + (f" ({compression}-compressed)" if compression else "")
+    )
+
 # ======================================================
 # STEP 2: CLEAN TAXONOMY
 # ======================================================
@@ -59,31 +672,145 @@ st.caption(
     "Cleans raw taxonomy output and generates structured abundance tables across standard taxonomic levels."
 )
 
-if st.button("Run Taxonomy Cleaning"):
-    with st.spinner("Running taxonomy cleaning..."):
-        clean_input_microbiome_taxonomy.main()
+if st.button("Run Taxonomy Cleaning", disabled=job_running("tables")):
+    if "input" not in state:
+        st.error("Please upload a taxonomy file first.")
+    else:
+        reset_results()
+        params = clean_params()
+        start_job(
+            "tables",
+            result_cache.cache_key(state["input"]["hash"], **params),
+            clean_job, state["input"]["hash"], state["input"]["bytes"], params,
+            label="Taxonomy cleaning"
+        )
 
-    st.success("Cleaning completed!")
+# 🔹 Cleaning runs in the background; this shows its progress, then its tables
+tables_job = follow_job("tables")
+if tables_job is not None:
+    files, cache_hit = tables_job["result"]
+    set_table_results(files)
 
-    for level in LEVELS:
-        file = f"{level}_table.csv"
-        if os.path.exists(file):
-            os.rename(file, TABLE_DIR / file)
+    st.success("Cleaning completed!")
+    show_cache_status(cache_hit)
 
 # Show tables
-if TABLE_DIR.exists():
+if "tables" in state:
     st.subheader("📄 Generated Taxonomy Tables")
     st.caption(
         "Download cleaned abundance tables for each taxonomic rank (Domain to Species)."
     )
 
-    for file in TABLE_DIR.glob("*.csv"):
-        with open(file, "rb") as f:
-            st.download_button(
-                label=f"⬇️ Download {file.name}",
-                data=f,
-                file_name=file.name
+    table_values = st.selectbox(
+        "Table values",
+        list(normalization.METHODS),
+        format_func=normalization.METHODS.get,
+        help=(
+            "Relative abundance: each sample sums to 100%. CLR: centred log-ratio "
+            f"with a pseudocount of {normalization.PSEUDOCOUNT}. Rarefied: every sample "
+            "subsampled to the same number of reads."
+        )
+    )
+
+    if table_values == "counts":
+        show_downloads(csv_exports({
+            path: data for path, data in state["tables"].items()
+            if path.startswith(f"{TABLE_DIR}/")
+        }))
+    elif table_values == "rarefied":
+        rarefy_depth = st.number_input(
+            "Rarefaction depth (reads per sample, 0 = shallowest sample)",
+            min_value=0, value=0, step=1000
+        )
+        st.caption("Samples with fewer reads than the depth are left out.")
+        show_downloads(normalized_exports(
+            "rarefied", depth=int(rarefy_depth) or None
+        ))
+    else:
+        show_downloads(normalized_exports(table_values))
+
+    # 🔹 Drill-down reads subtree totals from the lineage tree (no regrouping)
+    st.subheader("🌳 Lineage Drill-down")
+    st.caption("Pick a taxon to list its most abundant descendants at a lower rank.")
+
+    tree = load_lineage_tree()
+    drill_level = st.selectbox("Rank", TAX_LEVELS[:-1], index=1, key="drill_level")
+    drill_query = st.text_input(
+        "Filter taxa", placeholder="part of a name", key="drill_query",
+        help=f"Only the {DRILL_MAX_OPTIONS} most abundant matching taxa are listed."
+    )
+    drill_taxon = st.selectbox(
+        "Taxon (most abundant first)",
+        drill_options(drill_level, drill_query),
+        key="drill_taxon"
+    )
+    drill_child_level = st.selectbox(
+        "Descendant rank", TAX_LEVELS[TAX_LEVELS.index(drill_level) + 1:], key="drill_child_level"
+    )
+    if drill_taxon is not None:
+        st.dataframe(
+            lineage_tree.drill_down(tree, drill_level, drill_taxon, drill_child_level),
+            width="stretch", hide_index=True
+        )
+
+    # 🔹 Queries run over the indexed names of every rank, not the full table
+    st.subheader("🔎 Taxon Search & Plot Filter")
+    st.caption(
+        "Find taxa at any rank with their per-sample counts. Excluded taxa and a minimum "
+        "prevalence apply to the abundance plots and heatmaps below."
+    )
+
+    search_query = st.text_input("Search taxa", placeholder="e.g. Nitrosomonas", key="search_query")
+    search_mode = st.radio(
+        "Match", list(taxon_search.MODES), format_func=taxon_search.MODES.get,
+        horizontal=True, key="search_mode"
+    )
+    search_matches = []
+    if search_query:
+        try:
+            search_results = taxon_search.search(tree, load_taxon_index(), search_query, search_mode)
+        except ValueError as error:
+            st.error(str(error))
+        else:
+            st.caption(
+                f"{len(search_results)} matching taxa, most abundant first "
+                f"(at most {taxon_search.MAX_RESULTS})."
             )
+            st.dataframe(search_results, width="stretch", hide_index=True)
+            search_matches = list(search_results["Taxon"].unique())
+
+    current_filter = state.get("taxon_filter") or {"exclude": [], "min_prevalence": 0.0}
+    with st.form("taxon_filter_form"):
+        filter_exclude = st.multiselect(
+            "Exclude from plots (with every taxon below them)",
+            sorted(set(search_matches) | set(current_filter["exclude"])),
+            default=current_filter["exclude"]
+        )
+        filter_prevalence = st.slider(
+            "Minimum prevalence (% of samples with the taxon)",
+            0, 100, round(current_filter["min_prevalence"] * 100)
+        )
+        if st.form_submit_button("Apply to plots"):
+            set_taxon_filter(filter_exclude, filter_prevalence / 100)
+
+    if state.get("taxon_filter"):
+        st.caption(
+            f"🔹 Plot filter active: {len(state['taxon_filter']['exclude'])} excluded taxa, "
+            f"minimum prevalence {state['taxon_filter']['min_prevalence']:.0%}."
+        )
+
+if "tables" in state:
+    st.caption(
+        "Or render every plot style and the heatmaps at once, in parallel across CPU cores."
+    )
+
+    if st.button("Generate all plots", disabled=job_running("all_plots")):
+        start_plot_job(
+            "all_plots", list(PLOT_MODULES.values()) + [generate_all_heatmaps],
+            label="All plots"
+        )
+
+finish_plot_job("all_plots", "✅ All plots generated!")
 
 # ======================================================
 # STEP 3: ABUNDANCE PLOTS (CHOICE BASED)
@@ -95,46 +822,63 @@ st.caption(
 
 plot_mode = st.radio(
     "Choose plot style",
-    options=[
-        "Stacked bar plots",
-        "Stacked bar plots + series lines"
-    ]
+    options=list(PLOT_MODULES)
 )
 
 st.caption(
     "Select plots with series lines to observe abundance trends alongside taxonomic composition."
 )
 
-if st.button("Generate Abundance Plots"):
-    with st.spinner("Generating abundance plots..."):
+output_mode = st.radio(
+    "Output",
+    options=["Static images (PNG)", "Interactive charts (in browser)"],
+    horizontal=True
+)
+interactive_mode = output_mode.startswith("Interactive")
 
-        if plot_mode == "Stacked bar plots":
-            generate_all_abundance_plots.main()
-            output_folder = "abundance_plots"
-        else:
-            generate_all_abundance_plots_with_series_lines.main()
-            output_folder = "abundance_plots_with_lines"
+st.caption(
+    "Interactive charts support hover, zoom, legend highlighting, and sample filtering directly in the browser."
+)
 
-    st.success("Abundance plots generated successfully!")
+preview_mode = not interactive_mode and st.toggle(
+    "Quick preview (render only the selected level; full resolution on download)",
+    value=True
+)
+
+if interactive_mode:
+    if "tables" in state:
+        chart_level = st.selectbox(
+            "Taxonomic level", TAX_LEVELS, key="abundance_chart_level"
+        )
+        show_interactive(chart_builder(INTERACTIVE_CHARTS[plot_mode]), PLOT_MODULES[plot_mode], chart_level)
+    else:
+        st.info("Run taxonomy cleaning to explore abundance charts.")
+
+elif preview_mode:
+    if "tables" in state:
+        preview_level = st.selectbox(
+            "Taxonomic level", TAX_LEVELS, key="abundance_preview_level"
+        )
+        show_preview(PLOT_MODULES[plot_mode], preview_level)
+    else:
+        st.info("Run taxonomy cleaning to preview abundance plots.")
+
+elif st.button("Generate Abundance Plots", disabled=job_running("abundance_plots")):
+    if "tables" not in state:
+        st.error("Please run taxonomy cleaning first.")
+    else:
+        start_plot_job("abundance_plots", [PLOT_MODULES[plot_mode]], label=plot_mode)
+
+finish_plot_job("abundance_plots", "Abundance plots generated successfully!")
 
 # ======================================================
 # VIEW + DOWNLOAD PLOTS
 # ======================================================
-plot_dir = Path(output_folder) if "output_folder" in locals() else None
-
-if plot_dir and plot_dir.exists():
+if state.get("abundance_plots"):
     st.subheader("📊 View Abundance Plots")
     st.caption("Preview and download publication-ready abundance plots.")
 
-    for img_path in sorted(plot_dir.glob("*.png")):
-        st.image(img_path, caption=img_path.name, use_container_width=True)
-
-        with open(img_path, "rb") as f:
-            st.download_button(
-                label=f"⬇️ Download {img_path.name}",
-                data=f,
-                file_name=img_path.name
-            )
+    show_images(state["abundance_plots"], "abundance_plots")
 
 # ======================================================
 # STEP 4: HEATMAPS
@@ -144,37 +888,96 @@ st.caption(
     "Generate heatmaps to explore abundance patterns and clustering across samples."
 )
 
-HEATMAP_DIR = Path("heatmaps")
-HEATMAP_DIR.mkdir(exist_ok=True)
+if interactive_mode:
+    if "tables" in state:
+        heatmap_chart_level = st.selectbox(
+            "Taxonomic level", TAX_LEVELS, key="heatmap_chart_level"
+        )
+        show_interactive(chart_builder("heatmap_chart"), generate_all_heatmaps, heatmap_chart_level)
+    else:
+        st.info("Run taxonomy cleaning to explore heatmap charts.")
+
+elif preview_mode:
+    if "tables" in state:
+        heatmap_level = st.selectbox(
+            "Taxonomic level", TAX_LEVELS, key="heatmap_preview_level"
+        )
+        show_preview(generate_all_heatmaps, heatmap_level)
+    else:
+        st.info("Run taxonomy cleaning to preview heatmaps.")
 
-if st.button("Generate Heatmaps"):
-    with st.spinner("Generating heatmaps..."):
-        generate_all_heatmaps.main()
+elif st.button("Generate Heatmaps", disabled=job_running("heatmaps")):
+    if "tables" not in state:
+        st.error("Please run taxonomy cleaning first.")
+    else:
+        start_plot_job("heatmaps", [generate_all_heatmaps], label="Heatmaps")
 
-    st.success("✅ Heatmaps generated!")
+finish_plot_job("heatmaps", "✅ Heatmaps generated!")
 
 # ------------------------------------------------------
 # VIEW + DOWNLOAD HEATMAPS
 # ------------------------------------------------------
-if any(HEATMAP_DIR.glob("*.png")):
+if state.get("heatmaps"):
     st.subheader("🔥 View Heatmaps")
     st.caption("High-resolution heatmaps highlighting dominant taxa distributions.")
 
-    for img in sorted(HEATMAP_DIR.glob("*.png")):
-        st.image(Image.open(img), caption=img.name, width="stretch")
-        with open(img, "rb") as f:
-            st.download_button(
-                label=f"⬇️ Download {img.name}",
-                data=f,
-                file_name=img.name
+    show_images(state["heatmaps"], "heatmaps")
+
+# ======================================================
+# STEP 5: DIVERSITY
+# ======================================================
+st.header("5️⃣ Diversity & Ordination")
+st.caption(
+    "Per-sample alpha diversity (observed richness, Shannon, Simpson) and between-sample "
+    "beta diversity (Bray-Curtis or Jaccard), with a PCoA ordination of the distance matrix."
+)
+
+diversity_level = st.selectbox(
+    "Taxonomic level", TAX_LEVELS, index=TAX_LEVELS.index("Genus"), key="diversity_level"
+)
+diversity_metric = st.radio(
+    "Beta diversity metric", diversity.BETA_METRICS, horizontal=True
+)
+
+if st.button("Compute Diversity"):
+    if "tables" not in state:
+        st.error("Please run taxonomy cleaning first.")
+    else:
+        with st.spinner("Computing diversity..."):
+            files, cache_hit = run_cached(
+                state["input"]["hash"],
+                lambda: compute_diversity(diversity_level, diversity_metric),
+                stage="diversity", level=diversity_level, metric=diversity_metric
             )
+            # Results of other levels / metrics stay available for download
+            set_results("diversity", {**state.get("diversity", {}), **files})
+
+        st.success("✅ Diversity computed!")
+        show_cache_status(cache_hit)
+
+if state.get("diversity"):
+    st.subheader("🌿 Diversity Results")
+
+    folder = generate_diversity.OUTPUT_DIR.as_posix()
+    alpha_path = f"{folder}/{generate_diversity.alpha_name(diversity_level)}"
+    pcoa_path = f"{folder}/{generate_diversity.pcoa_name(diversity_level, diversity_metric)}"
+
+    if alpha_path in state["diversity"]:
+        st.dataframe(
+            generate_diversity.read_alpha_csv(state["diversity"][alpha_path]),
+            width="stretch"
+        )
+    if pcoa_path in state["diversity"]:
+        st.image(
+            thumbnail(pcoa_path, state["diversity"][pcoa_path]),
+            caption=pcoa_path.split("/")[-1]
+        )
+
+    show_downloads(state["diversity"])
 
 # ======================================================
 # DOWNLOAD ALL RESULTS
 # ======================================================
-import zipfile
-import io
-
 st.markdown("---")
 st.subheader("⬇️ Download Analysis Results")
 
@@ -183,45 +986,102 @@ st.caption(
 )
 
 def collect_result_files():
-    files = []
+    files = {}
 
-    folders = [
-        Path("tables"),
-        Path("abundance_plots"),
-        Path("abundance_plots_with_lines"),
-        Path("heatmaps"),
-    ]
+    # Tables go into the archive as CSV
+    files.update(csv_exports(state.get("tables", {})))
+    for key in RESULT_KEYS[1:]:
+        files.update(state.get(key, {}))
 
-    for folder in folders:
-        if folder.exists():
-            files.extend(folder.glob("*"))
+    if "input" in state:
+        files[input_name()] = state["input"]["bytes"]
 
-    extra_files = [
-        Path("cleaned_taxonomy.csv"),
-        Path("input_taxonomy.txt"),
+    return files
+
+
+def result_manifest():
+    # (name, size, mtime) of every result file
+    times = state.get("result_times", {})
+    manifest = [
+        (path, len(data), times.get(key))
+        for key in RESULT_KEYS
+        for path, data in state.get(key, {}).items()
     ]
 
-    for f in extra_files:
-        if f.exists():
-            files.append(f)
+    if "input" in state:
+        manifest.append((input_name(), len(state["input"]["bytes"]), state["input"]["file_id"]))
 
-    return files
+    return tuple(manifest)
 
 
-result_files = collect_result_files()
+class ArchiveReader(io.RawIOBase):
+    """
+    Read-only view of a spooled archive with its own position, so
+    concurrent downloads of the same file never move each other's.
+    """
+    def __init__(self, file, lock):
+        self.file, self.lock, self.position = file, lock, 0
 
-if result_files:
-    zip_buffer = io.BytesIO()
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        with self.lock:
+            end = self.file.seek(0, io.SEEK_END)
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: end}[whence]
+        self.position = base + offset
+        return self.position
+
+    def readinto(self, buffer):
+        with self.lock:
+            self.file.seek(self.position)
+            n = self.file.readinto(buffer)
+        self.position += n
+        return n
+
+
+def archive_download(files, manifest):
+    """
+    Download callable for the results ZIP. The archive is only built when
+    the button is clicked, is spooled to a temporary file, and is reused
+    for as long as the manifest of result files is unchanged. The spooled
+    file itself is handed out, so the app never keeps a second copy.
+    """
+    archive = state.setdefault("archive", {"lock": threading.Lock()})
+
+    def build():
+        with archive["lock"]:
+            if archive.get("manifest") != manifest:
+                spooled = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_BYTES)
+
+                with zipfile.ZipFile(spooled, "w") as zipf:
+                    for path, data in files.items():
+                        if callable(data):
+                            data = data()
+                        # PNGs are already compressed; store them as-is
+                        compression = (
+                            zipfile.ZIP_STORED if path.endswith(".png")
+                            else zipfile.ZIP_DEFLATED
+                        )
+                        zipf.writestr(path, data, compress_type=compression)
+
+                # A replaced archive is freed once no download reads it any more
+                archive.update(manifest=manifest, file=spooled)
 
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
-        for file in result_files:
-            zipf.write(file, arcname=file.as_posix())
+            return ArchiveReader(archive["file"], archive["lock"])
 
-    zip_buffer.seek(0)
+    return download_callback(build, "zip_build", files=len(files))
 
+
+result_files = collect_result_files()
+
+if result_files:
     st.download_button(
         label="📦 Download all results (ZIP)",
-        data=zip_buffer,
+        data=archive_download(result_files, result_manifest()),
         file_name="microbiome_analysis_results.zip",
         mime="application/zip"
     )
@@ -239,25 +1099,37 @@ st.caption(
 )
 
 if st.button("Clear all results and reset"):
-    paths_to_clear = [
-        Path("tables"),
-        Path("abundance_plots"),
-        Path("abundance_plots_with_lines"),
-        Path("heatmaps"),
-        Path("input_taxonomy.txt"),
-        Path("cleaned_taxonomy.csv")
-    ]
-
-    for path in paths_to_clear:
-        if path.exists():
-            if path.is_dir():
-                for f in path.glob("*"):
-                    f.unlink()
-            else:
-                path.unlink()
+    reset_results()
+    state.pop("input", None)
 
     st.success("Previous analysis cleared. You can refresh the page, then upload a new file and rerun the pipeline.")
 
 
+# ======================================================
+# PERFORMANCE
+# ======================================================
+with st.expander("⏱️ Performance"):
+    st.caption(
+        "Wall time, CPU time and (optionally) peak memory of each pipeline stage in this session. "
+        "Work done in parallel render processes is shown as one render_batch stage."
+    )
+    st.toggle("Record stage timings", key="perf_enabled")
+    st.checkbox("Track peak memory (slower)", key="perf_memory", disabled=not state.get("perf_enabled"))
+
+    perf_events = state.get("perf_events", [])
+    if perf_events:
+        st.dataframe(perf_trace.summary_rows(perf_events), width="stretch", hide_index=True)
+        st.download_button(
+            label="⬇️ Download trace (Chrome JSON)",
+            data=perf_trace.chrome_trace_bytes(perf_events),
+            file_name="microbiome_app_trace.json",
+            mime="application/json"
+        )
+        if st.button("Clear timings"):
+            perf_events.clear()
+            st.rerun()
+    elif state.get("perf_enabled"):
+        st.info("Timings appear here after the next pipeline step.")
+
 st.markdown("---")
 st.caption("A small demo version designed for fast, reproducible, and user-friendly microbiome analysis by Shakthi J.")
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+import normalization
+import sparse_abundance
+
+# ================= CONFIG =================
+TOP_N = 10
+OTHERS = "Others"
+
+# Leading columns of a summary; the sample columns follow
+SUMMARY_COLUMNS = ["Total", "Legend"]
+# =========================================
+
+
+def summarize_level(df, level, top_n=TOP_N):
+    """
+    Computes the top-N + Others view of one level table, shared by every
+    plot style.
+
+    Returns a DataFrame with one row per top taxon plus a final "Others"
+    row and the columns [level, "Total", "Legend", *samples], where the
+    sample values are relative abundances (%) of each sample.
+    `df` may also be a sparse level table (see sparse_abundance).
+    """
+    if sparse_abundance.is_sparse(df):
+        return summarize_sparse_level(df, level, top_n)
+
+    sample_cols = df.columns[1:]
+    counts = df[sample_cols]
+
+    # Ensure numeric; integer counts are used as stored (no float copy)
+    if not all(pd.api.types.is_numeric_dtype(t) for t in counts.dtypes):
+        counts = counts.apply(pd.to_numeric, errors="coerce")
+    values = counts.to_numpy()
+    if values.dtype.kind not in "iu":
+        values = np.nan_to_num(values.astype(float, copy=False))
+
+    # Rank taxa by total abundance
+    totals = values.sum(axis=1, dtype=np.float64)
+    top, rest = rank_taxa(totals, top_n)
+
+    # Top N rows plus one Others row (column totals minus the top rows)
+    top_values = values[top].astype(np.float64)
+    others = values.sum(axis=0, dtype=np.float64) - top_values.sum(axis=0)
+    matrix = np.vstack([top_values, others])
+    row_totals = np.append(totals[top], totals[rest].sum())
+    names = list(df.iloc[top, 0]) + [OTHERS]
+
+    return build_summary(level, names, matrix, row_totals, sample_cols)
+
+
+def summarize_sparse_level(table, level, top_n=TOP_N):
+    # Only the top N rows are ever densified
+    matrix = table["matrix"]
+    totals = sparse_abundance.row_totals(matrix)
+    top, rest = rank_taxa(totals, top_n)
+
+    others = np.ones(len(totals), dtype=bool)
+    others[top] = False
+    matrix_top = np.vstack([
+        sparse_abundance.dense_rows(matrix, top),
+        sparse_abundance.column_totals(matrix, others)
+    ])
+    row_totals = np.append(totals[top], totals[rest].sum())
+    names = list(table["labels"].iloc[top, 0]) + [OTHERS]
+
+    return build_summary(level, names, matrix_top, row_totals, table["samples"])
+
+
+def rank_taxa(totals, top_n):
+    # (top N rows, remaining rows) by descending total
+    order = (
+        pd.Series(totals)
+        .sort_values(ascending=False)
+        .index
+        .to_numpy()
+    )
+    return order[:top_n], order[top_n:]
+
+
+def build_summary(level, names, matrix, row_totals, sample_cols):
+    # `matrix` holds the counts of the top rows and the Others row
+    relative = normalization.percent(normalization.float_matrix(matrix))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = row_totals / row_totals.sum() * 100
+
+    summary = pd.DataFrame(relative, columns=sample_cols, copy=False)
+    summary.insert(0, level, names)
+    summary.insert(1, "Total", row_totals)
+    summary.insert(2, "Legend", [
+        f"{name} ({share:.1f}%)" for name, share in zip(names, shares)
+    ])
+
+    return summary
+
+
+def summarize_tables(level_tables, top_n=TOP_N):
+    return {
+        level: summarize_level(df, level, top_n)
+        for level, df in level_tables.items()
+    }
+
+
+def is_summary(df):
+    return (
+        not sparse_abundance.is_sparse(df)
+        and list(df.columns[1:3]) == SUMMARY_COLUMNS
+    )
+
+
+def ensure_summary(df, level, top_n=TOP_N):
+    # Renderers accept a level table or its precomputed summary
+    return df if is_summary(df) else summarize_level(df, level, top_n)
+
+
+def sample_columns(summary):
+    return summary.columns[1 + len(SUMMARY_COLUMNS):]
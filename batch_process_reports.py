@@ -0,0 +1,261 @@
+import argparse
+import glob
+import sys
+import time
+from concurrent.futures import as_completed
+from pathlib import Path
+
+import abundance_summary
+import clean_input_microbiome_taxonomy as cleaning
+import cohort
+import cohort_store
+import generate_all_abundance_plots
+import generate_all_abundance_plots_with_series_lines
+import generate_all_heatmaps
+import render_executor
+import report_formats
+import table_store
+
+# ================= CONFIG =================
+# Files picked up when a directory is given (plain or compressed reports)
+INPUT_PATTERNS = report_formats.REPORT_PATTERNS
+
+OUTPUT_DIR = Path("cohort_results")
+TABLE_DIR = "tables"
+
+WORKERS = render_executor.WORKERS
+
+PLOT_MODULES = [
+    generate_all_abundance_plots,
+    generate_all_abundance_plots_with_series_lines,
+    generate_all_heatmaps
+]
+# =========================================
+
+
+def find_reports(inputs, patterns=INPUT_PATTERNS):
+    """
+    Expands files, directories and glob patterns into report paths.
+    Every file is listed once, even if several inputs match it.
+    """
+    paths = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            paths.extend(sorted(p for pattern in patterns for p in path.glob(pattern)))
+        elif path.is_file():
+            paths.append(path)
+        else:
+            paths.extend(sorted(Path(p) for p in glob.glob(item, recursive=True)))
+
+    unique = {}
+    for path in paths:
+        unique.setdefault(path.resolve(), path)
+    return list(unique.values())
+
+
+def skip_duplicate_content(paths):
+    # Identical reports (e.g. copied into two folders, or a .gz copy) are cleaned once
+    kept, seen = [], {}
+    for path in paths:
+        digest = report_formats.content_hash(path)
+        if digest in seen:
+            print(f"⏭️  {path} is identical to {seen[digest]}, skipped", file=sys.stderr)
+            continue
+        seen[digest] = path
+        kept.append(path)
+    return kept
+
+
+def show_progress(done, total, label, started):
+    width = 30
+    filled = int(width * done / total) if total else width
+    bar = "█" * filled + "·" * (width - filled)
+    elapsed = time.time() - started
+    print(
+        f"\r[{bar}] {done}/{total} {label} ({elapsed:.1f}s)".ljust(100),
+        end="" if done < total else "\n",
+        file=sys.stderr,
+        flush=True
+    )
+
+
+def clean_reports(paths, workers=WORKERS, chunksize=None):
+    """
+    Cleans every report across worker processes.
+    Returns [(report name, collapsed lineage table)] in input order.
+    """
+    started = time.time()
+    results = {}
+
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            results[path] = cohort.clean_report(path, chunksize)
+            show_progress(len(results), len(paths), f"cleaned {path.name}", started)
+    else:
+        pool = render_executor.get_pool(workers)
+        futures = {
+            pool.submit(cohort.clean_report, path, chunksize): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            results[path] = future.result()
+            show_progress(len(results), len(paths), f"cleaned {path.name}", started)
+
+    # Report names drop every report and compression suffix: b.txt.gz -> b
+    return [(report_formats.sample_name(path), results[path]) for path in paths]
+
+
+def save_cohort(cleaned_df, level_tables, output_dir):
+    table_dir = output_dir / TABLE_DIR
+    table_dir.mkdir(parents=True, exist_ok=True)
+
+    cleaned_file = output_dir / cleaning.OUTPUT_CLEANED
+    cleaned_df.to_csv(cleaned_file, index=False)
+    table_store.save_copy(cleaned_df, cleaned_file)
+
+    for level, level_df in level_tables.items():
+        output_file = table_dir / f"{level.lower()}_table.csv"
+        level_df.to_csv(output_file, index=False)
+        table_store.save_copy(level_df, output_file)
+
+
+def render_plots(level_tables, output_dir, workers=WORKERS):
+    # One parallel batch for every plot style and level
+    started = time.time()
+    show_progress(0, 1, "rendering plots", started)
+
+    rendered = render_executor.render_batch(
+        [
+            (
+                module.__name__,
+                abundance_summary.summarize_tables(level_tables, module.TOP_N),
+                module.DPI
+            )
+            for module in PLOT_MODULES
+        ],
+        workers
+    )
+
+    for module, pngs in zip(PLOT_MODULES, rendered):
+        plot_dir = output_dir / module.OUTPUT_DIR
+        plot_dir.mkdir(parents=True, exist_ok=True)
+        for file_name, png in pngs.items():
+            (plot_dir / file_name).write_bytes(png)
+
+    show_progress(1, 1, "rendered plots", started)
+
+
+def update_store(paths, args):
+    """
+    Incremental run: only reports not yet in the store are cleaned and
+    appended; plots of the affected levels are then regenerated.
+    """
+    known = cohort_store.known_reports(cohort_store.load_manifest(args.store))
+    digests = {path: report_formats.content_hash(path) for path in paths}
+    new_paths = [path for path in paths if digests[path] not in known]
+    print(
+        f"🧬 {len(new_paths)} new report(s), {len(paths) - len(new_paths)} already in {args.store}",
+        file=sys.stderr
+    )
+
+    if new_paths:
+        reports = clean_reports(new_paths, args.workers, args.chunksize)
+        cohort_store.append_reports(
+            [(name, digests[path], table) for path, (name, table) in zip(new_paths, reports)],
+            args.store
+        )
+
+    if args.plots:
+        started = time.time()
+        show_progress(0, 1, "rendering stale plots", started)
+        written = cohort_store.refresh_plots(PLOT_MODULES, args.store, args.workers)
+        show_progress(1, 1, f"rendered {len(written)} plot(s)", started)
+
+    if args.export:
+        cohort_store.export_tables(args.output, args.store)
+
+    manifest = cohort_store.load_manifest(args.store)
+    print(
+        f"✅ Cohort store {args.store}: {len(cohort_store.cohort_samples(manifest))} samples "
+        f"in {len(manifest['parts'])} part(s)",
+        file=sys.stderr
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=(
+            "Clean a batch of Kraken2-style taxonomy reports in parallel and "
+            "merge them into cohort-wide abundance tables."
+        )
+    )
+    parser.add_argument(
+        "inputs", nargs="+",
+        help="report files, directories (*.txt, *.report, *.bracken, ... optionally .gz/.bz2/.xz) or glob patterns"
+    )
+    parser.add_argument(
+        "-o", "--output", type=Path, default=OUTPUT_DIR,
+        help=f"output directory (default: {OUTPUT_DIR})"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=WORKERS,
+        help="worker processes (default: one per CPU core)"
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=None,
+        help="read each report in chunks of this many rows"
+    )
+    parser.add_argument(
+        "--plots", action="store_true",
+        help="also render every abundance plot and heatmap"
+    )
+    parser.add_argument(
+        "--store", type=Path, default=None,
+        help=(
+            "incremental mode: append only new reports to this cohort store "
+            "(plots are kept in the store)"
+        )
+    )
+    parser.add_argument(
+        "--export", action="store_true",
+        help="with --store, also write the full cohort tables to --output"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Headless batch run: clean every report, merge the samples into one
+    cohort (outer join on lineage) and write the cohort tables, plus all
+    plots with --plots.
+    """
+    args = parse_args(argv)
+
+    paths = skip_duplicate_content(find_reports(args.inputs))
+    if not paths:
+        raise FileNotFoundError(f"No taxonomy reports found in {args.inputs}")
+
+    if args.store:
+        update_store(paths, args)
+        return
+
+    print(f"🧬 Cleaning {len(paths)} report(s) with {args.workers} worker(s)", file=sys.stderr)
+    reports = clean_reports(paths, args.workers, args.chunksize)
+
+    # 🔹 Merge into cohort-wide tables
+    cleaned_df, level_tables = cohort.build_cohort(reports)
+    save_cohort(cleaned_df, level_tables, args.output)
+    print(
+        f"✅ Cohort of {len(cleaned_df.columns) - len(cohort.TAX_LEVELS)} samples "
+        f"written to {args.output}",
+        file=sys.stderr
+    )
+
+    if args.plots:
+        render_plots(level_tables, args.output, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import argparse
+import hashlib
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import benchmark_pipeline
+import job_queue
+
+# ================= CONFIG =================
+APP_FILE = Path(__file__).resolve().with_name("Microbiome_Report_Analysis_APP.py")
+OUTPUT_FILE = Path("app_benchmark_results.json")
+
+# Synthetic report loaded into the app before the rerun timings
+DEFAULT_SIZE = "1k:4"
+REPEAT = 5
+
+# Script run timeout for the headless app (s)
+RUN_TIMEOUT = 600
+# =========================================
+
+# Run in a fresh interpreter: time of the first script run, imports included
+STARTUP_SCRIPT = """
+import sys, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=float(sys.argv[2]))
+started = time.perf_counter()
+at.run()
+print(time.perf_counter() - started)
+"""
+
+
+def measure_startup(repeat):
+    # Cold start: the app's own module imports plus its first run
+    timings = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT, str(APP_FILE), str(RUN_TIMEOUT)],
+            capture_output=True, text=True, check=True, cwd=APP_FILE.parent
+        )
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def timed_runs(at, repeat, action=None):
+    # Wall time of `repeat` reruns, each after `action` (e.g. a widget change)
+    timings = []
+    for i in range(repeat):
+        if action:
+            action(at, i)
+        started = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def click(at, label):
+    next(button for button in at.button if button.label == label).click().run()
+
+
+def wait_for_job(at, key, timeout=RUN_TIMEOUT):
+    # Jobs run in the background: rerun until none is left and `key` is set
+    deadline = time.monotonic() + timeout
+    while at.session_state["jobs"] or key not in at.session_state:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"No {key!r} after {timeout} s")
+        time.sleep(job_queue.POLL_INTERVAL)
+        at.run()
+
+
+def load_report(at, path):
+    # Stands in for the file uploader
+    data = Path(path).read_bytes()
+    at.session_state["input"] = {
+        "file_id": path.name,
+        "bytes": data,
+        "hash": hashlib.sha256(data).hexdigest()
+    }
+
+
+def measure_reruns(path, repeat):
+    """
+    Rerun latency of a warm app: without input, then with every plot
+    generated (21 result images), then on level changes.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP_FILE), default_timeout=RUN_TIMEOUT)
+    at.run()
+    timings = {"rerun_empty": timed_runs(at, repeat)}
+
+    load_report(at, path)
+    at.run()
+    click(at, "Run Taxonomy Cleaning")
+    wait_for_job(at, "tables")
+    at.toggle[0].set_value(False).run()
+    click(at, "Generate all plots")
+    wait_for_job(at, "heatmaps")
+    images = len(at.session_state["abundance_plots"]) + len(at.session_state["heatmaps"])
+
+    timings["rerun_with_results"] = timed_runs(at, repeat)
+
+    levels = at.selectbox(key="diversity_level").options
+    timings["widget_change_with_results"] = timed_runs(
+        at, repeat,
+        lambda at, i: at.selectbox(key="diversity_level").set_value(levels[i % len(levels)])
+    )
+
+    return timings, images
+
+
+def summarize(stage, timings, size):
+    return {
+        "size": size,
+        "stage": stage,
+        "wall_s": timings,
+        "wall_min_s": min(timings),
+        "wall_median_s": statistics.median(timings)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time the app's cold start and rerun latency (headless)."
+    )
+    parser.add_argument("--size", default=DEFAULT_SIZE, help="<taxa>:<samples> of the loaded report")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", type=Path, default=OUTPUT_FILE)
+    parser.add_argument("--compare", type=Path, default=None, help="previous results file")
+    args = parser.parse_args(argv)
+
+    n_taxa, n_samples = benchmark_pipeline.parse_size(args.size)
+    path = benchmark_pipeline.input_file(n_taxa, n_samples, args.seed).resolve()
+
+    results = [summarize("startup", measure_startup(args.repeat), "app")]
+    rerun_timings, images = measure_reruns(path, args.repeat)
+    results += [
+        summarize(stage, timings, f"app_{n_taxa}x{n_samples}")
+        for stage, timings in rerun_timings.items()
+    ]
+
+    for row in results:
+        print(f"{row['size']:>16} {row['stage']:<30} {row['wall_median_s'] * 1e3:9.1f} ms")
+    print(f"({images} result images)")
+
+    report = {
+        "environment": benchmark_pipeline.environment(),
+        "settings": {"size": args.size, "repeat": args.repeat, "seed": args.seed},
+        "results": results
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        benchmark_pipeline.compare(results, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
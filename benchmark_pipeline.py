@@ -0,0 +1,227 @@
+import argparse
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import abundance_summary
+import clean_input_microbiome_taxonomy as cleaning
+import generate_all_abundance_plots
+import generate_all_abundance_plots_with_series_lines
+import generate_all_heatmaps
+import synthetic_taxonomy
+import table_store
+
+# ================= CONFIG =================
+# Synthetic inputs are generated once per size and reused across runs
+BENCH_DIR = Path(".microbiome_cache/benchmarks")
+OUTPUT_FILE = Path("benchmark_results.json")
+
+# "<taxa>:<samples>"; production scale is 100k:2000
+DEFAULT_SIZES = ["1k:4", "10k:100"]
+REPEAT = 3
+
+# Level rendered by the plot stages
+PLOT_LEVEL = "Genus"
+PLOT_MODULES = [
+    generate_all_abundance_plots,
+    generate_all_abundance_plots_with_series_lines,
+    generate_all_heatmaps
+]
+# =========================================
+
+
+def parse_size(text):
+    # "10k:100" -> (10000, 100)
+    def number(value):
+        value = value.strip().lower()
+        scale = {"k": 1_000, "m": 1_000_000}.get(value[-1], 1)
+        return int(float(value.rstrip("km")) * scale)
+
+    taxa, samples = text.split(":")
+    return number(taxa), number(samples)
+
+
+def input_file(n_taxa, n_samples, seed):
+    path = BENCH_DIR / f"synthetic_{n_taxa}x{n_samples}_seed{seed}.txt"
+    if not path.exists():
+        BENCH_DIR.mkdir(parents=True, exist_ok=True)
+        staging = path.with_suffix(".tmp")
+        synthetic_taxonomy.write_report(staging, n_taxa, n_samples, seed)
+        staging.replace(path)
+    return path
+
+
+def measure(func, repeat):
+    """
+    Runs `func` once under tracemalloc (peak Python/numpy allocations),
+    then `repeat` times untraced for wall and CPU time.
+    Returns (timings dict, result of the last run).
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    walls, cpus = [], []
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = func()
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+
+    return {
+        "wall_s": walls,
+        "wall_min_s": min(walls),
+        "wall_median_s": statistics.median(walls),
+        "cpu_median_s": statistics.median(cpus),
+        "peak_mb": peak / 1024 ** 2
+    }, result
+
+
+def pipeline_stages(path, plots):
+    """
+    The pipeline as (stage name, callable(previous results) -> result),
+    in run order.
+    """
+    stages = [
+        ("read", lambda r: cleaning.read_taxonomy(path)),
+        # No lineage cache, so every run parses every lineage
+        ("clean", lambda r: cleaning.clean_taxonomy_table(r["read"], None)),
+        ("level_tables", lambda r: {
+            level: df.reset_index()
+            for level, df in cleaning.aggregate_level_tables(r["clean"]).items()
+        }),
+        ("summarize", lambda r: abundance_summary.summarize_tables(r["level_tables"])),
+        ("store_write", lambda r: [
+            table_store.save_table(df, BENCH_DIR / "store" / level)
+            for level, df in r["level_tables"].items()
+        ]),
+        ("store_read", lambda r: [
+            table_store.load_table(BENCH_DIR / "store" / level)
+            for level in r["level_tables"]
+        ]),
+    ]
+
+    if plots:
+        for module in PLOT_MODULES:
+            stages.append((
+                f"render:{module.OUTPUT_DIR.name}",
+                lambda r, module=module: module.render_png(
+                    r["summarize"][PLOT_LEVEL], PLOT_LEVEL, module.DPI
+                )
+            ))
+
+    return stages
+
+
+def run_size(n_taxa, n_samples, seed, repeat, plots, log=print):
+    path = input_file(n_taxa, n_samples, seed)
+    results, rows = {}, []
+
+    for stage, func in pipeline_stages(path, plots):
+        timings, results[stage] = measure(lambda: func(results), repeat)
+        rows.append({
+            "size": f"{n_taxa}x{n_samples}",
+            "n_taxa": n_taxa,
+            "n_samples": n_samples,
+            "stage": stage,
+            **timings
+        })
+        log(
+            f"{n_taxa:>8} x {n_samples:<5} {stage:<34} "
+            f"{timings['wall_median_s']:8.3f} s {timings['peak_mb']:9.1f} MB"
+        )
+
+    return rows
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine()
+    }
+
+
+def compare(results, baseline):
+    """
+    Prints the median wall time of every (size, stage) against a previous
+    results file. Ratios below 1 are speedups.
+    """
+    previous = {
+        (row["size"], row["stage"]): row
+        for row in baseline["results"]
+    }
+    print(f"\nCompared with {baseline['environment'].get('revision')}:")
+    for row in results:
+        old = previous.get((row["size"], row["stage"]))
+        if old is None:
+            continue
+        ratio = row["wall_median_s"] / old["wall_median_s"] if old["wall_median_s"] else float("nan")
+        print(
+            f"{row['size']:>14} {row['stage']:<34} "
+            f"{old['wall_median_s']:8.3f} -> {row['wall_median_s']:8.3f} s  (x{ratio:.2f})"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time and memory-profile every pipeline stage on synthetic reports."
+    )
+    parser.add_argument(
+        "--sizes", nargs="+", default=DEFAULT_SIZES,
+        help=f"<taxa>:<samples> pairs (default: {' '.join(DEFAULT_SIZES)})"
+    )
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per stage")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--plots", action="store_true", help="also time one render per plot style")
+    parser.add_argument("-o", "--output", type=Path, default=OUTPUT_FILE)
+    parser.add_argument("--compare", type=Path, default=None, help="previous results file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        n_taxa, n_samples = parse_size(size)
+        results.extend(run_size(n_taxa, n_samples, args.seed, args.repeat, args.plots))
+
+    report = {
+        "environment": environment(),
+        "settings": {"repeat": args.repeat, "seed": args.seed, "plots": args.plots},
+        "results": results
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,38 @@
 import pandas as pd
+import numpy as np
+import hashlib
+import inspect
+import sqlite3
 from pathlib import Path
 
+import lineage_cache
+import lineage_tree
+import normalization
+import perf_trace
+import report_formats
+import sparse_abundance
+import table_store
+from taxonomy_rollup import restore_dtype, rollup_level_tables
+
 # ================= CONFIG =================
 INPUT_FILE = Path("input_taxonomy.txt")
 OUTPUT_CLEANED = "cleaned_taxonomy.csv"
 
+# Also write each table in the binary store (loads much faster than CSV)
+SAVE_BINARY = True
+
+# Lineage tree for drill-down (subtree totals per node; None = not saved)
+TREE_FILE = "lineage_tree.npz"
+
+# Rows per chunk for streaming mode (None = load the whole file at once)
+CHUNK_SIZE = None
+
+# Keep only nonzero counts in memory (for wide, mostly-zero cohorts)
+SPARSE = False
+
+# Parsed lineages are reused across runs (None disables the cache)
+LINEAGE_CACHE_FILE = lineage_cache.CACHE_FILE
+
 TAX_LEVELS = ["Domain", "Phylum", "Class", "Order", "Family", "Genus", "Species"]
 
 PREFIX_MAP = {
@@ -57,61 +85,444 @@ def fill_unidentified(taxonomy):
     return taxonomy
 
 
-def clean_taxonomy_table(df):
-    cleaned_rows = []
+def parse_taxonomy_column(taxa):
+    """
+    Columnar version of parse_taxonomy: splits every lineage string
+    into one column per level. Returns a DataFrame with TAX_LEVELS columns.
+    """
+    parts = taxa.str.split("; ").explode()
+    parts = pd.DataFrame({
+        "row": parts.index,
+        "part": parts.str.strip().to_numpy()
+    })
+    parts["level"] = parts["part"].str[:3].map(PREFIX_MAP)
+    parts = parts[parts["level"].notna()]
+
+    # Strip prefixes (every occurrence, as str.replace did per part)
+    values = parts["part"].copy()
+    for prefix, level in PREFIX_MAP.items():
+        mask = parts["level"] == level
+        values[mask] = values[mask].str.replace(prefix, "", regex=False)
+    values = values.str.strip()
+
+    # Drop "uncultured" names
+    uncultured = values.str.lower().str.contains("uncultured", regex=False)
+    parts["value"] = values.where(~uncultured)
+
+    # A repeated prefix overrides the earlier one
+    parts = parts.drop_duplicates(["row", "level"], keep="last")
+
+    return (
+        parts.pivot(index="row", columns="level", values="value")
+        .reindex(index=taxa.index, columns=TAX_LEVELS)
+        .astype(object)
+    )
+
+
+def fill_unidentified_columns(taxonomy):
+    """
+    Columnar version of fill_unidentified, applied level by level
+    over the whole table.
+    """
+    unidentified_used = np.zeros(len(taxonomy), dtype=bool)
+    parent = None
 
-    for _, row in df.iterrows():
-        taxon_info = parse_taxonomy(row["Taxon"])
-        taxon_info = fill_unidentified(taxon_info)
+    for level in TAX_LEVELS:
+        values = taxonomy[level]
+
+        if parent is not None:
+            missing = values.isna()
+            use_unidentified = (
+                missing
+                & parent.notna()
+                & (parent != "")
+                & ~unidentified_used
+            )
+
+            values = values.where(~missing, parent)
+            values[use_unidentified] = (
+                "unidentified (" + parent[use_unidentified] + ")"
+            )
+            unidentified_used |= use_unidentified.to_numpy()
+
+        taxonomy[level] = values
+        parent = values
 
-        new_row = taxon_info.copy()
-        for col in df.columns[1:]:
-            new_row[col] = row[col]
+    return taxonomy
 
-        cleaned_rows.append(new_row)
 
-    return pd.DataFrame(cleaned_rows)
+def cleaning_rules_version():
+    # Fingerprint of the cleaning rules; cached lineages expire with it
+    rules = [clean_name, parse_taxonomy_column, fill_unidentified_columns]
+    source = "".join(inspect.getsource(func) for func in rules)
+    source += repr(TAX_LEVELS) + repr(PREFIX_MAP)
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
 
 
-def create_level_tables(df):
+def parse_lineages(taxa):
+    return fill_unidentified_columns(parse_taxonomy_column(taxa))
+
+
+@perf_trace.timed()
+def parse_lineages_cached(taxa, cache_file):
+    """
+    parse_lineages backed by the on-disk lineage cache: only lineages
+    not seen in earlier runs are parsed, and those are added to the cache.
+    """
+    rules_version = cleaning_rules_version()
+    keys = [taxon for taxon in taxa if isinstance(taxon, str)]
+
+    try:
+        hits = lineage_cache.lookup(cache_file, rules_version, keys)
+    except sqlite3.Error:
+        return parse_lineages(taxa)
+
+    cached = taxa.isin(list(hits))
+    taxonomy = pd.DataFrame(
+        [hits[taxon] for taxon in taxa[cached]],
+        index=taxa.index[cached],
+        columns=TAX_LEVELS,
+        dtype=object
+    )
+
+    if not cached.all():
+        parsed = parse_lineages(taxa[~cached])
+        taxonomy = pd.concat([taxonomy, parsed]).reindex(taxa.index)
+
+        new_entries = {
+            taxon: tuple(v if isinstance(v, str) else None for v in ranks)
+            for taxon, ranks in zip(
+                taxa[~cached], parsed.itertuples(index=False, name=None)
+            )
+            if isinstance(taxon, str)
+        }
+        try:
+            lineage_cache.store(cache_file, rules_version, new_entries)
+        except sqlite3.Error:
+            pass
+
+    return taxonomy
+
+
+def clean_taxonomy_labels(taxa, cache_file=None):
+    # 🔹 Parse each distinct lineage once, then broadcast back to the rows
+    codes, uniques = pd.factorize(taxa)
+    uniques = pd.Series(uniques, dtype=object)
+    if cache_file:
+        taxonomy = parse_lineages_cached(uniques, cache_file)
+    else:
+        taxonomy = parse_lineages(uniques)
+
+    # Rows with a missing lineage map to an all-empty taxonomy
+    taxonomy.loc[len(uniques)] = None
+    codes[codes < 0] = len(uniques)
+    return taxonomy.iloc[codes].reset_index(drop=True)
+
+
+@perf_trace.timed()
+def clean_taxonomy_table(df, cache_file=None):
+    taxonomy = clean_taxonomy_labels(df["Taxon"], cache_file)
+
+    # 🔹 Sample matrix passes through as one block
+    samples = df.iloc[:, 1:].reset_index(drop=True)
+
+    return pd.concat([taxonomy, samples], axis=1)
+
+
+def clean_sparse_table(table, cache_file=None):
+    # Only the labels change; the count matrix is shared
+    return {
+        **table,
+        "labels": clean_taxonomy_labels(table["labels"]["Taxon"], cache_file)
+    }
+
+
+@perf_trace.timed()
+def aggregate_level_tables(df, level_tables=None):
+    """
+    Sums the sample columns of a cleaned table per taxonomic level.
+    When running sums are passed in, the new rows are folded into them;
+    numeric running sums are kept as float64 (exact for counts below
+    2**53) until restore_level_dtypes picks the final dtype.
+    """
     sample_cols = [c for c in df.columns if c not in TAX_LEVELS]
+    folding = level_tables is not None
+    level_tables = {} if level_tables is None else level_tables
+
+    # 🔹 Single-pass rollup for numeric counts, plain groupby otherwise
+    numeric = all(
+        pd.api.types.is_numeric_dtype(dtype)
+        and not pd.api.types.is_bool_dtype(dtype)
+        for dtype in df[sample_cols].dtypes
+    )
+    if numeric:
+        chunk_tables = rollup_level_tables(df, TAX_LEVELS)
+    else:
+        chunk_tables = {
+            level: df.groupby(level)[sample_cols].sum()
+            for level in TAX_LEVELS
+        }
 
     for level in TAX_LEVELS:
-        level_df = (
-            df.groupby(level)[sample_cols]
-            .sum()
-            .reset_index()
+        level_df = chunk_tables[level]
+
+        if folding and numeric:
+            level_df = level_df.astype(np.float64)
+        if level in level_tables:
+            level_df = pd.concat([level_tables[level], level_df]).groupby(level=0).sum()
+
+        level_tables[level] = level_df
+
+    return level_tables
+
+
+def restore_level_dtypes(level_tables, dtypes):
+    """
+    Gives folded level tables the dtypes the in-memory pipeline would:
+    the smallest fitting integer type when every input column was integer,
+    else the input column dtypes (float where any cell was missing or
+    fractional). `dtypes` are the sample column dtypes of the whole input;
+    None leaves the tables as they are.
+    """
+    if dtypes is None:
+        return level_tables
+
+    return {
+        level: pd.DataFrame(
+            restore_dtype(level_df.to_numpy(dtype=np.float64).T, dtypes),
+            index=level_df.index,
+            columns=level_df.columns
         )
+        for level, level_df in level_tables.items()
+    }
+
+
+def save_binary_copy(df, csv_path):
+    """
+    Writes (or, with SAVE_BINARY off or no table, removes) the binary
+    copy next to a CSV, so a copy never outlives the CSV it came from.
+    """
+    if SAVE_BINARY and df is not None:
+        table_store.save_copy(df, csv_path)
+    else:
+        table_store.remove(table_store.store_path(csv_path))
+
+
+def save_tree(cleaned_df=None):
+    # The lineage tree needs the dense cleaned table; other modes drop a stale one
+    if TREE_FILE and cleaned_df is not None:
+        Path(TREE_FILE).write_bytes(lineage_tree.to_bytes(lineage_tree.build_tree(cleaned_df)))
+    elif TREE_FILE:
+        Path(TREE_FILE).unlink(missing_ok=True)
+
 
+@perf_trace.timed()
+def save_level_tables(level_tables):
+    for level, level_df in level_tables.items():
         output_file = f"{level.lower()}_table.csv"
+        level_df = level_df.reset_index()
         level_df.to_csv(output_file, index=False)
+        save_binary_copy(level_df, output_file)
 
 
-def main():
+def create_level_tables(df):
+    save_level_tables(aggregate_level_tables(df))
+
+
+def ensure_taxon_column(raw_df):
+    # 🔹 Expect taxonomy column to be named 'Taxon'
+    if "Taxon" not in raw_df.columns:
+        raw_df.columns = ["Taxon"] + list(raw_df.columns[1:])
+    return raw_df
+
+
+@perf_trace.timed()
+def read_taxonomy(source, sample=None):
+    # Path or binary file-like object (e.g. an uploaded file), plain or
+    # compressed, lineage table or native Kraken2 / Bracken report (see
+    # report_formats); integer counts are downcast to the smallest integer
+    # type that fits them, float counts are kept as read. `sample` names the column of a single-sample report.
+    return normalization.downcast_counts(
+        ensure_taxon_column(report_formats.read_report(source, sample)), ["Taxon"]
+    )
+
+
+def process_taxonomy(raw_df, cache_file=LINEAGE_CACHE_FILE):
+    """
+    In-memory pipeline: cleans a raw taxonomy table and returns
+    (cleaned_df, level_tables), where level_tables maps each level to a
+    DataFrame shaped like its *_table.csv file.
+    """
+    cleaned_df = clean_taxonomy_table(raw_df, cache_file)
+
+    level_tables = {
+        level: level_df.reset_index()
+        for level, level_df in aggregate_level_tables(cleaned_df).items()
+    }
+
+    return cleaned_df, level_tables
+
+
+@perf_trace.timed()
+def read_sparse_taxonomy(source, chunksize=None):
+    """
+    Reads the input into a sparse table. With `chunksize`, only one chunk
+    is ever held densely.
+    """
+    if not chunksize:
+        return sparse_abundance.from_frame(read_taxonomy(source), ["Taxon"])
+
+    return sparse_abundance.concat([
+        sparse_abundance.from_frame(ensure_taxon_column(chunk), ["Taxon"])
+        for chunk in report_formats.read_chunks(source, chunksize)
+    ])
+
+
+@perf_trace.timed()
+def process_sparse_taxonomy(table, cache_file=LINEAGE_CACHE_FILE):
+    """
+    Sparse counterpart of process_taxonomy: returns (cleaned table,
+    level tables) with every table kept sparse.
+    """
+    cleaned = clean_sparse_table(table, cache_file)
+    return cleaned, sparse_abundance.rollup_level_tables(cleaned, TAX_LEVELS)
+
+
+@perf_trace.timed()
+def save_sparse_level_tables(level_tables):
+    for level, table in level_tables.items():
+        output_file = f"{level.lower()}_table.csv"
+        sparse_abundance.to_csv(table, output_file)
+        # Densified only when a binary copy is written
+        frame = sparse_abundance.to_frame(table) if SAVE_BINARY else None
+        save_binary_copy(frame, output_file)
+
+
+@perf_trace.timed()
+def stream_level_tables(input_file, chunksize, cache_file=None):
+    """
+    Reads the input in chunks of `chunksize` rows, appends each cleaned
+    chunk to the cleaned CSV and folds it into running per-level sums.
+    Only the aggregated level tables are kept in memory. Dtypes are
+    settled once at the end, so the tables (and the cleaned CSV) match
+    the in-memory pipeline.
+    """
+    level_tables = {}
+    dtypes = None
+    chunk_dtypes = set()
+    reader = report_formats.read_chunks(input_file, chunksize)
+
+    for i, raw_chunk in enumerate(reader):
+        cleaned_chunk = clean_taxonomy_table(
+            ensure_taxon_column(raw_chunk), cache_file
+        )
+
+        # 🔹 Dtypes the whole input would have been read with
+        samples = cleaned_chunk.drop(columns=TAX_LEVELS)
+        if all(pd.api.types.is_numeric_dtype(t) and not pd.api.types.is_bool_dtype(t) for t in samples.dtypes):
+            if i == 0:
+                dtypes = samples.dtypes
+            elif dtypes is not None:
+                dtypes = pd.Series(
+                    [np.promote_types(a, b) for a, b in zip(dtypes, samples.dtypes)],
+                    index=dtypes.index
+                )
+            chunk_dtypes.add(tuple(samples.dtypes))
+        else:
+            dtypes = None
+
+        cleaned_chunk.to_csv(
+            OUTPUT_CLEANED,
+            index=False,
+            mode="w" if i == 0 else "a",
+            header=i == 0
+        )
+        aggregate_level_tables(cleaned_chunk, level_tables)
+
+    # 🔹 A column turned float in a later chunk: earlier chunks wrote it as int
+    if dtypes is not None and chunk_dtypes != {tuple(dtypes)}:
+        rewrite_counts(OUTPUT_CLEANED, dtypes, chunksize)
+
+    return restore_level_dtypes(level_tables, dtypes)
+
+
+def rewrite_counts(csv_path, dtypes, chunksize):
+    """
+    Rewrites a cleaned CSV chunk by chunk with its sample columns read as
+    `dtypes`, so every count of a float column is written as a float
+    ("0.0"), as the in-memory pipeline writes it. Labels are kept as text.
+    """
+    temp_path = Path(f"{csv_path}.tmp")
+    reader = pd.read_csv(
+        csv_path,
+        chunksize=chunksize,
+        dtype={**{level: str for level in TAX_LEVELS}, **dtypes.to_dict()},
+        keep_default_na=False,
+        na_values={col: [""] for col in dtypes.index}
+    )
+    for i, chunk in enumerate(reader):
+        chunk.to_csv(temp_path, index=False, mode="w" if i == 0 else "a", header=i == 0)
+    temp_path.replace(csv_path)
+
+
+def find_input(input_file=INPUT_FILE):
+    # The input may also be compressed: input_taxonomy.txt.gz / .bz2 / .xz
+    for suffix in ["", *(f".{ext}" for ext in report_formats.COMPRESSED_EXTENSIONS)]:
+        candidate = Path(f"{input_file}{suffix}")
+        if candidate.exists():
+            return candidate
+    raise FileNotFoundError(f"{input_file} not found")
+
+
+def main(chunksize=CHUNK_SIZE, sparse=SPARSE, input_file=None):
     """
     Cleans raw Kraken2-style taxonomy output
     and generates abundance tables for each taxonomic level.
+    Pass `chunksize` to stream large inputs instead of loading them whole,
+    and `sparse` to keep only the nonzero counts in memory.
+    `input_file` may be a gzip/bz2/xz-compressed lineage table or a native
+    Kraken2 report or Bracken table (default: INPUT_FILE, plain or compressed).
     """
+    input_file = Path(input_file) if input_file else find_input()
 
-    if not INPUT_FILE.exists():
-        raise FileNotFoundError("input_taxonomy.txt not found")
+    # 🔹 Sparse mode: nonzero counts only, densified block-wise on output
+    if sparse:
+        cleaned, level_tables = process_sparse_taxonomy(
+            read_sparse_taxonomy(input_file, chunksize), LINEAGE_CACHE_FILE
+        )
+        sparse_abundance.to_csv(cleaned, OUTPUT_CLEANED)
+        save_binary_copy(None, OUTPUT_CLEANED)
+        save_sparse_level_tables(level_tables)
+        save_tree()
+        return
+
+    # 🔹 Streaming mode: clean and aggregate chunk by chunk
+    if chunksize:
+        save_level_tables(
+            stream_level_tables(input_file, chunksize, LINEAGE_CACHE_FILE)
+        )
+        # The cleaned table only exists as CSV in this mode
+        save_binary_copy(None, OUTPUT_CLEANED)
+        save_tree()
+        return
 
     # 🔹 Load input
-    raw_df = pd.read_csv(INPUT_FILE, sep="\t")
-
-    # 🔹 Expect taxonomy column to be named 'Taxon'
-    if "Taxon" not in raw_df.columns:
-        raw_df.columns = ["Taxon"] + list(raw_df.columns[1:])
+    raw_df = read_taxonomy(input_file)
 
     # 🔹 Clean taxonomy
-    cleaned_df = clean_taxonomy_table(raw_df)
+    cleaned_df = clean_taxonomy_table(raw_df, LINEAGE_CACHE_FILE)
 
     # 🔹 Save full cleaned table
-    cleaned_df.to_csv(OUTPUT_CLEANED, index=False)
+    with perf_trace.stage("save_cleaned_table"):
+        cleaned_df.to_csv(OUTPUT_CLEANED, index=False)
+        save_binary_copy(cleaned_df, OUTPUT_CLEANED)
 
     # 🔹 Generate level-wise tables
     create_level_tables(cleaned_df)
 
+    # 🔹 Lineage tree of the cleaned table
+    save_tree(cleaned_df)
+
 
 if __name__ == "__main__":
-    main()
+    perf_trace.run(main)
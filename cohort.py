@@ -0,0 +1,120 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import clean_input_microbiome_taxonomy as cleaning
+import normalization
+import report_formats
+
+# ================= CONFIG =================
+TAX_LEVELS = cleaning.TAX_LEVELS
+
+# Stands in for a missing rank while lineages are used as join keys
+MISSING = "\x1f"
+# =========================================
+
+
+def collapse_lineages(cleaned_df):
+    """
+    Sums the rows of a cleaned table that share a full lineage.
+    Returns the sample columns indexed by (Domain, ..., Species).
+    """
+    lineage = cleaned_df[TAX_LEVELS].fillna(MISSING)
+    samples = cleaned_df.drop(columns=TAX_LEVELS)
+    return samples.groupby([lineage[level] for level in TAX_LEVELS]).sum()
+
+
+def clean_report(path, chunksize=None):
+    """
+    Cleans one taxonomy report (any format report_formats reads) and
+    collapses it to one row per lineage. Runs in a worker process.
+    """
+    collapsed = None
+    for chunk in report_formats.read_chunks(path, chunksize):
+        cleaned = cleaning.clean_taxonomy_table(
+            cleaning.ensure_taxon_column(chunk), cleaning.LINEAGE_CACHE_FILE
+        )
+        chunk_lineages = collapse_lineages(cleaned)
+        collapsed = (
+            chunk_lineages if collapsed is None
+            else pd.concat([collapsed, chunk_lineages]).groupby(level=TAX_LEVELS).sum()
+        )
+
+    return normalization.downcast_counts(collapsed)
+
+
+def unique_sample_names(reports, taken=()):
+    """
+    Renames clashing sample columns to "<report>_<sample>" (just
+    "<sample>" for a report named after its sample), adding "_2", "_3",
+    ... while that is taken too, and warns about every rename.
+    `reports` is a list of (report name, collapsed table); `taken` holds
+    names already in use (e.g. samples of an existing cohort).
+    """
+    seen = set(taken)
+    renamed = []
+    for name, table in reports:
+        columns = {}
+        for col in table.columns:
+            new = col
+            if new in seen:
+                new = base = f"{name}_{col}" if name != col else col
+                suffix = 2
+                while new in seen:
+                    new = f"{base}_{suffix}"
+                    suffix += 1
+                warnings.warn(
+                    f"Sample {col!r} of report {name!r} is already in the cohort; renamed to {new!r}",
+                    stacklevel=2
+                )
+            seen.add(new)
+            columns[col] = new
+        renamed.append(table.rename(columns=columns))
+    return renamed
+
+
+def merge_lineage_tables(tables):
+    """
+    Outer-joins collapsed lineage tables on the lineage; a lineage missing
+    from a report counts as zero in its samples.
+    """
+    dtypes = {col: dtype for table in tables for col, dtype in table.dtypes.items()}
+    merged = pd.concat(tables, axis=1, join="outer").sort_index()
+
+    # Integer counts of every report share one fitted dtype (and block)
+    if all(dtype.kind in "iu" for dtype in dtypes.values()):
+        return normalization.downcast_counts(merged.fillna(0).astype(np.int64))
+
+    if not merged.isna().to_numpy().any():
+        return merged
+
+    # Restore the count dtypes (one block when they all agree)
+    merged = merged.fillna(0)
+    if len(set(dtypes.values())) == 1:
+        return merged.astype(next(iter(dtypes.values())))
+    return merged.astype(dtypes)
+
+
+def expand_lineages(merged):
+    # Back to the cleaned-table layout (taxonomy columns, then samples)
+    cleaned = merged.reset_index()
+    taxonomy = cleaned[TAX_LEVELS]
+    cleaned[TAX_LEVELS] = taxonomy.mask(taxonomy == MISSING)
+    return cleaned
+
+
+def build_cohort(reports):
+    """
+    Merges cleaned reports ([(report name, collapsed table)]) into one
+    cohort. Returns (cleaned_df, level_tables) like
+    clean_input_microbiome_taxonomy.process_taxonomy.
+    """
+    merged = merge_lineage_tables(unique_sample_names(reports))
+    cleaned_df = expand_lineages(merged)
+
+    level_tables = {
+        level: level_df.reset_index()
+        for level, level_df in cleaning.aggregate_level_tables(cleaned_df).items()
+    }
+    return cleaned_df, level_tables
@@ -0,0 +1,192 @@
+import json
+import shutil
+from pathlib import Path
+
+import abundance_summary
+import clean_input_microbiome_taxonomy as cleaning
+import cohort
+import render_executor
+import table_store
+
+# ================= CONFIG =================
+STORE_DIR = Path("cohort_store")
+MANIFEST_FILE = "manifest.json"
+PART_DIR = "parts"
+LINEAGE_TABLE = "lineages"
+TAX_LEVELS = cleaning.TAX_LEVELS
+# =========================================
+
+# Layout of a store:
+#   manifest.json                  parts, processed report hashes, stale levels
+#   parts/part-0001/lineages/      cleaned rows (one per lineage) of that part
+#   parts/part-0001/genus_table/   level tables of that part's samples only
+#   <plot dirs>/                   plots of the whole cohort
+# Each update only writes a new part; the cohort is the outer join of all
+# parts on lineage (levels: on taxon name).
+
+
+def load_manifest(store_dir=STORE_DIR):
+    path = Path(store_dir) / MANIFEST_FILE
+    if not path.exists():
+        return {"parts": [], "stale": []}
+    return json.loads(path.read_text())
+
+
+def save_manifest(manifest, store_dir=STORE_DIR):
+    # Written last, so an interrupted update leaves the previous state
+    path = Path(store_dir) / MANIFEST_FILE
+    staging = path.with_suffix(".tmp")
+    staging.write_text(json.dumps(manifest, indent=2))
+    staging.replace(path)
+
+
+def known_reports(manifest):
+    return {
+        digest
+        for part in manifest["parts"]
+        for digest in part["reports"]
+    }
+
+
+def cohort_samples(manifest):
+    return [sample for part in manifest["parts"] for sample in part["samples"]]
+
+
+def part_path(store_dir, name, table):
+    return Path(store_dir) / PART_DIR / name / table
+
+
+def level_table_name(level):
+    return f"{level.lower()}_table"
+
+
+def append_reports(reports, store_dir=STORE_DIR):
+    """
+    Adds cleaned reports to the store as one new part.
+
+    `reports` is a list of (report name, content hash, collapsed lineage
+    table) for reports not yet in the store. Only these reports are merged
+    and aggregated; existing parts are left untouched. Returns the levels
+    marked stale (every level: new samples change every top-N summary).
+    """
+    manifest = load_manifest(store_dir)
+    if not reports:
+        return manifest["stale"]
+
+    name = f"part-{len(manifest['parts']) + 1:04d}"
+    tables = cohort.unique_sample_names(
+        [(report_name, table) for report_name, _, table in reports],
+        taken=cohort_samples(manifest)
+    )
+
+    # 🔹 Merge and aggregate the new samples only
+    cleaned_df = cohort.expand_lineages(cohort.merge_lineage_tables(tables))
+    level_tables = cleaning.aggregate_level_tables(cleaned_df)
+
+    target = Path(store_dir) / PART_DIR / name
+    shutil.rmtree(target, ignore_errors=True)
+    table_store.save_table(cleaned_df, target / LINEAGE_TABLE)
+    for level, level_df in level_tables.items():
+        table_store.save_table(level_df.reset_index(), target / level_table_name(level))
+
+    manifest["parts"].append({
+        "name": name,
+        "samples": [c for table in tables for c in table.columns],
+        "reports": {digest: report_name for report_name, digest, _ in reports}
+    })
+    manifest["stale"] = list(TAX_LEVELS)
+    save_manifest(manifest, store_dir)
+
+    return manifest["stale"]
+
+
+def join_parts(frames, key_columns):
+    # Outer join of per-part tables on their label columns
+    indexed = [
+        frame.assign(**{c: frame[c].fillna(cohort.MISSING) for c in key_columns})
+        .set_index(key_columns)
+        for frame in frames
+    ]
+    return cohort.merge_lineage_tables(indexed)
+
+
+def load_level_table(level, store_dir=STORE_DIR):
+    manifest = load_manifest(store_dir)
+    frames = [
+        table_store.load_table(part_path(store_dir, part["name"], level_table_name(level)))
+        for part in manifest["parts"]
+    ]
+    if not frames:
+        return None
+    return join_parts(frames, [level]).reset_index()
+
+
+def load_level_tables(store_dir=STORE_DIR, levels=TAX_LEVELS):
+    return {level: load_level_table(level, store_dir) for level in levels}
+
+
+def load_cleaned(store_dir=STORE_DIR):
+    manifest = load_manifest(store_dir)
+    frames = [
+        table_store.load_table(part_path(store_dir, part["name"], LINEAGE_TABLE))
+        for part in manifest["parts"]
+    ]
+    if not frames:
+        return None
+    return cohort.expand_lineages(join_parts(frames, TAX_LEVELS))
+
+
+def refresh_plots(plot_modules, store_dir=STORE_DIR, workers=render_executor.WORKERS):
+    """
+    Re-renders the plots of every stale level from the cohort summaries
+    (one parallel batch), then clears the stale marks.
+    Returns {plot file path: PNG bytes} of the regenerated plots.
+    """
+    manifest = load_manifest(store_dir)
+    stale = manifest["stale"]
+    if not stale or not manifest["parts"]:
+        return {}
+
+    level_tables = load_level_tables(store_dir, stale)
+    rendered = render_executor.render_batch(
+        [
+            (
+                module.__name__,
+                abundance_summary.summarize_tables(level_tables, module.TOP_N),
+                module.DPI
+            )
+            for module in plot_modules
+        ],
+        workers
+    )
+
+    written = {}
+    for module, pngs in zip(plot_modules, rendered):
+        plot_dir = Path(store_dir) / module.OUTPUT_DIR
+        plot_dir.mkdir(parents=True, exist_ok=True)
+        for file_name, png in pngs.items():
+            (plot_dir / file_name).write_bytes(png)
+            written[(plot_dir / file_name).as_posix()] = png
+
+    manifest["stale"] = []
+    save_manifest(manifest, store_dir)
+    return written
+
+
+def export_tables(output_dir, store_dir=STORE_DIR):
+    # Full cohort as CSV (cost grows with the cohort, so only on request)
+    output_dir = Path(output_dir)
+    (output_dir / "tables").mkdir(parents=True, exist_ok=True)
+
+    cleaned_df = load_cleaned(store_dir)
+    if cleaned_df is None:
+        return
+    cleaned_df.to_csv(output_dir / cleaning.OUTPUT_CLEANED, index=False)
+
+    for level, level_df in load_level_tables(store_dir).items():
+        level_df.to_csv(output_dir / "tables" / f"{level_table_name(level)}.csv", index=False)
+
+
+def clear(store_dir=STORE_DIR):
+    shutil.rmtree(store_dir, ignore_errors=True)
+
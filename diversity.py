@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+# ================= CONFIG =================
+# Upper bound on the temporary array of one pairwise block
+BLOCK_BYTES = 64 * 1024 ** 2
+
+BETA_METRICS = ["Bray-Curtis", "Jaccard"]
+# =========================================
+
+
+def sample_matrix(level_df, dtype=np.float64):
+    """
+    Samples x taxa count matrix of a level table (first column = taxon
+    names, then one column per sample). Returns (matrix, sample names).
+    """
+    counts = level_df.iloc[:, 1:]
+    if not all(pd.api.types.is_numeric_dtype(t) for t in counts.dtypes):
+        counts = counts.apply(pd.to_numeric, errors="coerce")
+    matrix = np.ascontiguousarray(counts.fillna(0).to_numpy(dtype=dtype).T)
+    return matrix, list(counts.columns)
+
+
+def alpha_diversity(level_df):
+    """
+    Observed richness, Shannon (natural log) and Simpson (1 - sum p^2)
+    index of every sample. Returns a DataFrame indexed by sample.
+    """
+    matrix, samples = sample_matrix(level_df)
+    totals = matrix.sum(axis=1, keepdims=True)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = np.where(totals > 0, matrix / totals, 0.0)
+        p_log_p = np.where(p > 0, p * np.log(p), 0.0)
+
+    return pd.DataFrame(
+        {
+            "Observed richness": (matrix > 0).sum(axis=1),
+            "Shannon": 0.0 - p_log_p.sum(axis=1),
+            "Simpson": np.where(totals[:, 0] > 0, 1 - (p ** 2).sum(axis=1), 0.0)
+        },
+        index=pd.Index(samples, name="Sample")
+    )
+
+
+def block_rows(n_rows, row_bytes):
+    # Rows per block so one block stays within BLOCK_BYTES
+    return max(1, min(n_rows, BLOCK_BYTES // max(row_bytes, 1)))
+
+
+def bray_curtis(matrix):
+    """
+    Bray-Curtis dissimilarity between the rows of a samples x taxa
+    matrix: 1 - 2 * sum(min(a, b)) / (sum(a) + sum(b)).
+
+    The sum of minima is accumulated block by block (rows x later rows x
+    a slice of the taxa present in those rows), so no n x n x taxa array
+    is ever built.
+    """
+    n, n_taxa = matrix.shape
+    totals = matrix.sum(axis=1)
+    shared = np.zeros((n, n))
+    # Taxa-major copy: picking the taxa of a block is then a row gather
+    by_taxon = np.ascontiguousarray(matrix.T)
+
+    step = block_rows(n, n * n_taxa * matrix.itemsize)
+    for s in range(0, n, step):
+        rows = matrix[s:s + step]
+        # Only taxa present in this block can add to a minimum
+        present = np.flatnonzero(rows.any(axis=0))
+        rows, others = rows[:, present], by_taxon[present, s:]
+
+        taxa_step = max(1, BLOCK_BYTES // (len(rows) * others.shape[1] * matrix.itemsize))
+        for t in range(0, len(present), taxa_step):
+            # Upper triangle only (columns from s on), mirrored below
+            shared[s:s + step, s:] += np.minimum(
+                rows[:, t:t + taxa_step, None], others[None, t:t + taxa_step]
+            ).sum(axis=1)
+
+    shared = np.triu(shared) + np.triu(shared, 1).T
+    sums = totals[:, None] + totals[None, :]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distances = np.where(sums > 0, 1 - 2 * shared / sums, 0.0)
+    np.fill_diagonal(distances, 0.0)
+    return np.clip(distances, 0.0, 1.0)
+
+
+def jaccard(matrix):
+    """
+    Jaccard distance on presence/absence: 1 - |A and B| / |A or B|.
+    Intersections come from a blocked presence @ presence.T product.
+    """
+    presence = (matrix > 0).astype(np.float32)
+    n = len(presence)
+    richness = presence.sum(axis=1)
+
+    shared = np.empty((n, n), dtype=np.float64)
+    step = block_rows(n, n * presence.itemsize)
+    for s in range(0, n, step):
+        shared[s:s + step] = presence[s:s + step] @ presence.T
+
+    union = richness[:, None] + richness[None, :] - shared
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distances = np.where(union > 0, 1 - shared / union, 0.0)
+    np.fill_diagonal(distances, 0.0)
+    return distances
+
+
+BETA_FUNCTIONS = {"Bray-Curtis": bray_curtis, "Jaccard": jaccard}
+
+
+def beta_diversity(level_df, metric="Bray-Curtis"):
+    # Sample x sample distance matrix as a labelled DataFrame
+    matrix, samples = sample_matrix(level_df)
+    distances = BETA_FUNCTIONS[metric](matrix)
+    index = pd.Index(samples, name="Sample")
+    return pd.DataFrame(distances, index=index, columns=samples)
+
+
+def pcoa(distances, n_components=2):
+    """
+    Principal coordinates analysis (classical MDS) of a distance matrix.
+    Returns (coordinates DataFrame, share of variance per axis).
+    """
+    d = np.asarray(distances, dtype=np.float64)
+    n = len(d)
+
+    # Double-centred Gower matrix: -1/2 * J D^2 J
+    gower = -0.5 * d ** 2
+    gower -= gower.mean(axis=0, keepdims=True)
+    gower -= gower.mean(axis=1, keepdims=True)
+
+    eigenvalues, eigenvectors = np.linalg.eigh(gower)
+    order = np.argsort(eigenvalues)[::-1]
+    eigenvalues, eigenvectors = eigenvalues[order], eigenvectors[:, order]
+
+    # Negative / round-off eigenvalues (non-euclidean distances) carry no axis
+    tolerance = 1e-10 * abs(eigenvalues).max() if n else 0.0
+    positive = eigenvalues > tolerance
+    k = min(n_components, int(positive.sum()))
+    coordinates = np.zeros((n, n_components))
+    coordinates[:, :k] = eigenvectors[:, :k] * np.sqrt(eigenvalues[:k])
+
+    explained = np.zeros(n_components)
+    total = eigenvalues[positive].sum()
+    if total > 0:
+        explained[:k] = eigenvalues[:k] / total
+
+    columns = [f"PC{i + 1}" for i in range(n_components)]
+    index = getattr(distances, "index", pd.RangeIndex(n))
+    return pd.DataFrame(coordinates, index=index, columns=columns), explained
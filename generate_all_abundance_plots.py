@@ -1,10 +1,15 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import io
 from pathlib import Path
 import numpy as np
 
+import abundance_summary
+import perf_trace
+import render_executor
+import table_store
+
 # ================= CONFIG =================
 TOP_N = 10
+DPI = 300
 OUTPUT_DIR = Path("abundance_plots")
 
 LEVEL_FILES = {
@@ -36,53 +41,27 @@ COLORS_20 = [
 # =========================================
 
 def plot_top10_stacked(df, level):
-    sample_cols = df.columns[1:]
-
-    # Compute totals
-    df["Total"] = df[sample_cols].sum(axis=1)
-    df = df.sort_values("Total", ascending=False)
-
-    # Top N
-    df_top = df.head(TOP_N)
-
-    # Others
-    others_sum = df.iloc[TOP_N:][sample_cols].sum()
-    others_row = pd.DataFrame(
-        [["Others"] + others_sum.tolist() + [others_sum.sum()]],
-        columns=df.columns
-    )
+    summary = abundance_summary.ensure_summary(df, level, TOP_N)
+    sample_cols = abundance_summary.sample_columns(summary)
 
-    df_plot = pd.concat([df_top, others_row], ignore_index=True)
-
-    # Convert to relative abundance
-    df_plot[sample_cols] = (
-        df_plot[sample_cols]
-        .div(df_plot[sample_cols].sum(axis=0), axis=1)
-        * 100
-    )
-
-    # Legend labels
-    total_sum = df_plot["Total"].sum()
-    df_plot["Legend"] = df_plot.apply(
-        lambda r: f"{r[level]} ({r['Total'] / total_sum * 100:.1f}%)",
-        axis=1
-    )
+    # Stack segments: cumulative bottoms of the relative abundances
+    heights = summary[sample_cols].to_numpy()
+    bottoms = np.vstack([np.zeros(len(sample_cols)), heights.cumsum(axis=0)[:-1]])
 
     # Plot
-    fig, ax = plt.subplots(figsize=(12, 8))
-    bottom = np.zeros(len(sample_cols))
+    fig = render_executor.new_figure((12, 8))
+    ax = fig.subplots()
 
-    for i, row in df_plot.iterrows():
+    for i, label in enumerate(summary["Legend"]):
         ax.bar(
             sample_cols,
-            row[sample_cols],
-            bottom=bottom,
-            label=row["Legend"],
+            heights[i],
+            bottom=bottoms[i],
+            label=label,
             color=COLORS_20[i % len(COLORS_20)],
             edgecolor="white",
             linewidth=0.5
         )
-        bottom += row[sample_cols]
 
     ax.set_title(f"Top {TOP_N} {level}", fontsize=16, weight="bold", pad=20)
     ax.set_ylabel("Relative Abundance (%)", fontsize=12)
@@ -95,10 +74,33 @@ def plot_top10_stacked(df, level):
         fontsize=9
     )
 
-    plt.tight_layout()
+    fig.tight_layout()
     return fig
 
 
+def png_name(level):
+    return f"top10_{level.lower()}.png"
+
+
+def render_png(df, level, dpi=DPI):
+    # Single level, returned as (file name, PNG bytes)
+    with perf_trace.stage("plot", level=level):
+        fig = plot_top10_stacked(df, level)
+
+    buffer = io.BytesIO()
+    with perf_trace.stage("savefig", level=level, dpi=dpi):
+        fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+    return png_name(level), buffer.getvalue()
+
+
+def read_level_tables():
+    return {
+        level: table_store.read_table(file_path)
+        for level, file_path in LEVEL_FILES.items()
+        if file_path.exists()
+    }
+
+
 def main():
     """
     Generates stacked bar plots for the top 10 taxa
@@ -107,17 +109,19 @@ def main():
 
     OUTPUT_DIR.mkdir(exist_ok=True)
 
-    for level, file_path in LEVEL_FILES.items():
-        if not file_path.exists():
-            continue
-
-        df = pd.read_csv(file_path)
-        fig = plot_top10_stacked(df, level)
+    # 🔹 Top-N summaries are computed once, then levels render in parallel
+    with perf_trace.stage("read_level_tables"):
+        level_tables = read_level_tables()
+    with perf_trace.stage("summarize"):
+        summaries = abundance_summary.summarize_tables(level_tables, TOP_N)
+    pngs = render_executor.render_batch(
+        [("generate_all_abundance_plots", summaries, DPI)]
+    )[0]
 
-        output_path = OUTPUT_DIR / f"top10_{level.lower()}.png"
-        fig.savefig(output_path, dpi=300, bbox_inches="tight")
-        plt.close(fig)
+    with perf_trace.stage("write_pngs"):
+        for file_name, png in pngs.items():
+            (OUTPUT_DIR / file_name).write_bytes(png)
 
 
 if __name__ == "__main__":
-    main()
+    perf_trace.run(main)
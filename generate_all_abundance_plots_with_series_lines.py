@@ -1,10 +1,15 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import io
 import numpy as np
 from pathlib import Path
 
+import abundance_summary
+import perf_trace
+import render_executor
+import table_store
+
 # ================= CONFIG =================
 TOP_N = 10
+DPI = 300
 OUTPUT_DIR = Path("abundance_plots_with_lines")
 
 LEVEL_FILES = {
@@ -35,75 +40,36 @@ COLORS_20 = [
 
 # =========================================
 
-def plot_stacked_bar_with_lines(df, level, output_png):
-    sample_cols = df.columns[1:]
-
-    # Ensure numeric
-    df[sample_cols] = df[sample_cols].apply(pd.to_numeric, errors="coerce").fillna(0)
-
-    # Compute totals
-    df["Total"] = df[sample_cols].sum(axis=1)
-    df = df.sort_values("Total", ascending=False)
-
-    # Top N taxa
-    df_top = df.head(TOP_N)
-
-    # Others
-    others_sum = df.iloc[TOP_N:][sample_cols].sum()
-    others_row = pd.DataFrame(
-        [["Others"] + others_sum.tolist() + [others_sum.sum()]],
-        columns=df.columns
-    )
+def plot_stacked_bar_with_lines(df, level):
+    summary = abundance_summary.ensure_summary(df, level, TOP_N)
+    sample_cols = abundance_summary.sample_columns(summary)
 
-    df_plot = pd.concat([df_top, others_row], ignore_index=True)
+    # Stack segments: cumulative bottoms of the relative abundances
+    heights = summary[sample_cols].to_numpy()
+    bottoms = np.vstack([np.zeros(len(sample_cols)), heights.cumsum(axis=0)[:-1]])
 
-    # Convert to relative abundance (%)
-    df_plot[sample_cols] = (
-        df_plot[sample_cols]
-        .apply(pd.to_numeric, errors="coerce")
-        .fillna(0)
-    )
-
-    df_plot[sample_cols] = (
-        df_plot[sample_cols]
-        .div(df_plot[sample_cols].sum(axis=0), axis=1)
-        * 100
-    )
-
-    # Legend labels
-    total_sum = df_plot["Total"].sum()
-    df_plot["Legend"] = df_plot.apply(
-        lambda r: f"{r[level]} ({r['Total'] / total_sum * 100:.1f}%)",
-        axis=1
-    )
+    # Midpoints for connecting lines
+    midpoints = bottoms + heights / 2
 
     # Plot
-    fig, ax = plt.subplots(figsize=(12, 8))
+    fig = render_executor.new_figure((12, 8))
+    ax = fig.subplots()
     x_pos = np.arange(len(sample_cols))
-    bottom = np.zeros(len(sample_cols), dtype=float)
-
-    y_positions = {}
-
-    for i, row in df_plot.iterrows():
-        values = row[sample_cols].astype(float).values
 
+    for i, label in enumerate(summary["Legend"]):
         ax.bar(
             x_pos,
-            values,
-            bottom=bottom,
-            label=row["Legend"],
+            heights[i],
+            bottom=bottoms[i],
+            label=label,
             color=COLORS_20[i % len(COLORS_20)],
             edgecolor="white",
             linewidth=0.5,
             width=0.8
         )
 
-        # Midpoints for connecting lines
-        y_positions[row[level]] = bottom + values / 2
-        bottom += values
-
     # Draw connecting lines
-    for y_vals in y_positions.values():
+    for y_vals in midpoints:
         ax.plot(
             x_pos,
             y_vals,
@@ -130,9 +96,31 @@ def plot_stacked_bar_with_lines(df, level, output_png):
         fontsize=9
     )
 
-    plt.tight_layout()
-    fig.savefig(output_png, dpi=300, bbox_inches="tight")
-    plt.close(fig)
+    fig.tight_layout()
+    return fig
+
+
+def png_name(level):
+    return f"top10_{level.lower()}_with_lines.png"
+
+
+def render_png(df, level, dpi=DPI):
+    # Single level, returned as (file name, PNG bytes)
+    with perf_trace.stage("plot", level=level):
+        fig = plot_stacked_bar_with_lines(df, level)
+
+    buffer = io.BytesIO()
+    with perf_trace.stage("savefig", level=level, dpi=dpi):
+        fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+    return png_name(level), buffer.getvalue()
+
+
+def read_level_tables():
+    return {
+        level: table_store.read_table(file_path)
+        for level, file_path in LEVEL_FILES.items()
+        if file_path.exists()
+    }
 
 
 def main():
@@ -143,15 +131,19 @@ def main():
 
     OUTPUT_DIR.mkdir(exist_ok=True)
 
-    for level, file_path in LEVEL_FILES.items():
-        if not file_path.exists():
-            continue
-
-        df = pd.read_csv(file_path)
+    # 🔹 Top-N summaries are computed once, then levels render in parallel
+    with perf_trace.stage("read_level_tables"):
+        level_tables = read_level_tables()
+    with perf_trace.stage("summarize"):
+        summaries = abundance_summary.summarize_tables(level_tables, TOP_N)
+    pngs = render_executor.render_batch(
+        [("generate_all_abundance_plots_with_series_lines", summaries, DPI)]
+    )[0]
 
-        output_png = OUTPUT_DIR / f"top10_{level.lower()}_with_lines.png"
-        plot_stacked_bar_with_lines(df, level, output_png)
+    with perf_trace.stage("write_pngs"):
+        for file_name, png in pngs.items():
+            (OUTPUT_DIR / file_name).write_bytes(png)
 
 
 if __name__ == "__main__":
-    main()
+    perf_trace.run(main)
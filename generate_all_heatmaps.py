@@ -1,12 +1,27 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import io
+import numpy as np
 from pathlib import Path
 
+import abundance_summary
+import heatmap_engine
+import normalization
+import perf_trace
+import render_executor
+import table_store
+
 # ================= CONFIG =================
 TOP_N = 10
+DPI = 300
 OUTPUT_DIR = Path("heatmaps")
 
+# Reorder taxa / samples by hierarchical clustering (average linkage)
+CLUSTER_TAXA = False
+CLUSTER_SAMPLES = False
+
+# Figure size in inches; the height grows with TOP_N up to the maximum
+FIG_WIDTH = 10
+MAX_FIG_HEIGHT = 30
+
 LEVEL_FILES = {
     "Domain": Path("tables/domain_table.csv"),
     "Phylum": Path("tables/phylum_table.csv"),
@@ -18,42 +33,69 @@ LEVEL_FILES = {
 }
 # =========================================
 
-def plot_heatmap(df, level, output_png):
-    sample_cols = df.columns[1:]
-
-    # Ensure numeric
-    df[sample_cols] = df[sample_cols].apply(pd.to_numeric, errors="coerce").fillna(0)
+def plot_heatmap(df, level, dpi=DPI):
+    summary = abundance_summary.ensure_summary(df, level, TOP_N)
+    sample_cols = abundance_summary.sample_columns(summary)
 
-    # Select top N taxa
-    df["Total"] = df[sample_cols].sum(axis=1)
-    df = df.sort_values("Total", ascending=False).head(TOP_N)
-
-    # Convert to relative abundance (%)
-    df[sample_cols] = (
-        df[sample_cols]
-        .div(df[sample_cols].sum(axis=0), axis=1)
-        * 100
+    # Top N taxa only, as relative abundance (%) within them
+    matrix = normalization.percent(
+        normalization.float_matrix(summary[sample_cols].iloc[:-1])
+    )
+    taxa, samples = list(summary[level].iloc[:-1]), list(sample_cols)
+
+    # 🔹 Optional clustering (missing values count as 0 for distances)
+    if CLUSTER_TAXA:
+        order = heatmap_engine.cluster_order(np.nan_to_num(matrix))
+        matrix, taxa = matrix[order], [taxa[i] for i in order]
+    if CLUSTER_SAMPLES:
+        order = heatmap_engine.cluster_order(np.nan_to_num(matrix).T)
+        matrix, samples = matrix[:, order], [samples[i] for i in order]
+
+    # 🔹 No more columns than the image has pixels
+    matrix, samples, bin_width = heatmap_engine.bin_columns(
+        matrix, samples, int(FIG_WIDTH * dpi * 0.8)
     )
-
-    # Prepare matrix
-    heatmap_df = df.set_index(level)[sample_cols]
 
     # Plot
-    plt.figure(figsize=(10, max(6, TOP_N * 0.6)))
-    sns.heatmap(
-        heatmap_df,
+    fig = render_executor.new_figure((FIG_WIDTH, min(MAX_FIG_HEIGHT, max(6, TOP_N * 0.6))))
+    ax = fig.subplots()
+    heatmap_engine.draw_heatmap(
+        fig, ax, matrix, taxa, samples,
         cmap="viridis",
-        linewidths=0.5,
-        linecolor="white",
-        cbar_kws={"label": "Relative Abundance (%)"}
+        colorbar_label="Relative Abundance (%)"
     )
 
-    plt.title(f"Top {TOP_N} {level} – Relative Abundance", fontsize=14, weight="bold")
-    plt.xlabel("Samples")
-    plt.ylabel(level)
-    plt.tight_layout()
-    plt.savefig(output_png, dpi=300, bbox_inches="tight")
-    plt.close()
+    ax.set_title(f"Top {TOP_N} {level} – Relative Abundance", fontsize=14, weight="bold")
+    if bin_width > 1:
+        ax.set_xlabel(f"Samples (mean of {bin_width} per column)")
+    else:
+        ax.set_xlabel("Samples")
+    ax.set_ylabel(level)
+    fig.tight_layout()
+    return fig
+
+
+def png_name(level):
+    return f"heatmap_{level.lower()}_top{TOP_N}.png"
+
+
+def render_png(df, level, dpi=DPI):
+    # Single level, returned as (file name, PNG bytes)
+    with perf_trace.stage("plot", level=level):
+        fig = plot_heatmap(df, level, dpi=dpi)
+
+    buffer = io.BytesIO()
+    with perf_trace.stage("savefig", level=level, dpi=dpi):
+        fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+    return png_name(level), buffer.getvalue()
+
+
+def read_level_tables():
+    return {
+        level: table_store.read_table(file_path)
+        for level, file_path in LEVEL_FILES.items()
+        if file_path.exists()
+    }
 
 
 def main():
@@ -64,15 +106,19 @@ def main():
 
     OUTPUT_DIR.mkdir(exist_ok=True)
 
-    for level, file_path in LEVEL_FILES.items():
-        if not file_path.exists():
-            continue
-
-        df = pd.read_csv(file_path)
+    # 🔹 Top-N summaries are computed once, then levels render in parallel
+    with perf_trace.stage("read_level_tables"):
+        level_tables = read_level_tables()
+    with perf_trace.stage("summarize"):
+        summaries = abundance_summary.summarize_tables(level_tables, TOP_N)
+    pngs = render_executor.render_batch(
+        [("generate_all_heatmaps", summaries, DPI)]
+    )[0]
 
-        output_png = OUTPUT_DIR / f"heatmap_{level.lower()}_top{TOP_N}.png"
-        plot_heatmap(df, level, output_png)
+    with perf_trace.stage("write_pngs"):
+        for file_name, png in pngs.items():
+            (OUTPUT_DIR / file_name).write_bytes(png)
 
 
 if __name__ == "__main__":
-    main()
+    perf_trace.run(main)
@@ -0,0 +1,123 @@
+import io
+import pandas as pd
+from pathlib import Path
+
+import diversity
+import perf_trace
+import render_executor
+import table_store
+
+# ================= CONFIG =================
+DPI = 300
+OUTPUT_DIR = Path("diversity")
+
+# Levels written by the command-line run
+LEVELS = ["Genus", "Species"]
+
+LEVEL_FILES = {
+    "Domain": Path("tables/domain_table.csv"),
+    "Phylum": Path("tables/phylum_table.csv"),
+    "Class": Path("tables/class_table.csv"),
+    "Order": Path("tables/order_table.csv"),
+    "Family": Path("tables/family_table.csv"),
+    "Genus": Path("tables/genus_table.csv"),
+    "Species": Path("tables/species_table.csv")
+}
+# =========================================
+
+# Sample labels are only drawn up to this many points
+MAX_POINT_LABELS = 40
+
+
+def file_stem(level, metric):
+    return f"{metric.lower().replace('-', '_')}_{level.lower()}"
+
+
+def alpha_name(level):
+    return f"alpha_diversity_{level.lower()}.csv"
+
+
+def distance_name(level, metric):
+    return f"{file_stem(level, metric)}_distances.csv"
+
+
+def pcoa_name(level, metric):
+    return f"pcoa_{file_stem(level, metric)}.png"
+
+
+def plot_pcoa(coordinates, explained, level, metric):
+    fig = render_executor.new_figure((7, 6))
+    ax = fig.subplots()
+
+    ax.scatter(coordinates["PC1"], coordinates["PC2"], s=40, alpha=0.8, edgecolors="black", linewidths=0.5)
+    if len(coordinates) <= MAX_POINT_LABELS:
+        for sample, (x, y) in coordinates[["PC1", "PC2"]].iterrows():
+            ax.annotate(str(sample), (x, y), fontsize=8, xytext=(4, 4), textcoords="offset points")
+
+    ax.set_xlabel(f"PC1 ({explained[0] * 100:.1f}%)")
+    ax.set_ylabel(f"PC2 ({explained[1] * 100:.1f}%)")
+    ax.set_title(f"PCoA – {metric} ({level})", fontsize=14, weight="bold")
+    ax.axhline(0, color="grey", linewidth=0.5)
+    ax.axvline(0, color="grey", linewidth=0.5)
+    fig.tight_layout()
+    return fig
+
+
+def png_bytes(fig, dpi):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+def diversity_files(level_df, level, metric="Bray-Curtis", dpi=DPI):
+    """
+    Alpha diversity table, distance matrix (both CSV) and PCoA plot (PNG)
+    of one level table. Returns {file name: bytes}.
+    """
+    with perf_trace.stage("alpha_diversity", level=level):
+        alpha = diversity.alpha_diversity(level_df)
+    with perf_trace.stage("beta_diversity", level=level, metric=metric, samples=len(alpha)):
+        distances = diversity.beta_diversity(level_df, metric)
+    with perf_trace.stage("pcoa", level=level):
+        coordinates, explained = diversity.pcoa(distances)
+        png = png_bytes(plot_pcoa(coordinates, explained, level, metric), dpi)
+
+    return {
+        alpha_name(level): alpha.to_csv().encode(),
+        distance_name(level, metric): distances.to_csv().encode(),
+        pcoa_name(level, metric): png
+    }
+
+
+def read_alpha_csv(data):
+    # Alpha diversity table back from its CSV bytes
+    return pd.read_csv(io.BytesIO(data), index_col="Sample")
+
+
+def read_level_tables():
+    return {
+        level: table_store.read_table(LEVEL_FILES[level])
+        for level in LEVELS
+        if LEVEL_FILES[level].exists()
+    }
+
+
+def main():
+    """
+    Writes alpha diversity, every beta diversity matrix and its PCoA
+    plot for the configured levels.
+    """
+
+    OUTPUT_DIR.mkdir(exist_ok=True)
+
+    with perf_trace.stage("read_level_tables"):
+        level_tables = read_level_tables()
+
+    for level, level_df in level_tables.items():
+        for metric in diversity.BETA_METRICS:
+            for file_name, data in diversity_files(level_df, level, metric).items():
+                (OUTPUT_DIR / file_name).write_bytes(data)
+
+
+if __name__ == "__main__":
+    perf_trace.run(main)
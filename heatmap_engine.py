@@ -0,0 +1,167 @@
+import numpy as np
+
+# ================= CONFIG =================
+# Cell borders and tick labels are only drawn up to these sizes
+GRID_MAX_CELLS = 60
+MAX_TICK_LABELS = 100
+
+# Rows per block when computing pairwise distances
+DISTANCE_BLOCK_ROWS = 512
+# =========================================
+
+
+def condensed_distances(matrix):
+    """
+    Euclidean distances between the rows of `matrix`, as a condensed
+    vector (the upper triangle, row by row, like scipy's pdist).
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    n = len(matrix)
+    norms = np.einsum("ij,ij->i", matrix, matrix)
+
+    parts = []
+    for start in range(0, n, DISTANCE_BLOCK_ROWS):
+        block = matrix[start:start + DISTANCE_BLOCK_ROWS]
+        squared = norms[start:start + len(block), None] + norms[None, :] - 2 * block @ matrix.T
+        distances = np.sqrt(np.maximum(squared, 0))
+        parts.extend(distances[i, start + i + 1:] for i in range(len(block)))
+
+    return np.concatenate(parts) if parts else np.empty(0)
+
+
+def condensed_positions(i, n):
+    # Positions of every d(i, k) in a condensed vector (k == i -> 0)
+    k = np.arange(n)
+    lo, hi = np.minimum(i, k), np.maximum(i, k)
+    positions = n * lo - lo * (lo + 1) // 2 + hi - lo - 1
+    positions[i] = 0
+    return positions
+
+
+def linkage_order(condensed, n):
+    """
+    Leaf order of an average-linkage clustering of `n` items, computed
+    with the nearest-neighbour chain algorithm directly on the condensed
+    distance vector (updated in place; O(n^2) time, no n x n matrix).
+    """
+    if n <= 2:
+        return np.arange(n)
+
+    active = np.ones(n, dtype=bool)
+    sizes = np.ones(n)
+    nodes = np.arange(n)
+    children = {}
+    chain = []
+
+    for next_node in range(n, 2 * n - 1):
+        while True:
+            if not chain:
+                chain.append(int(np.flatnonzero(active)[0]))
+            a = chain[-1]
+
+            distances = condensed[condensed_positions(a, n)]
+            distances[~active] = np.inf
+            distances[a] = np.inf
+            b = int(np.argmin(distances))
+
+            # Ties go back down the chain, which guarantees termination
+            if len(chain) > 1 and distances[chain[-2]] <= distances[b]:
+                b = chain[-2]
+                break
+            chain.append(b)
+
+        chain = chain[:-2]
+
+        # Average linkage (Lance-Williams update), merged cluster keeps slot a
+        positions_a = condensed_positions(a, n)
+        positions_b = condensed_positions(b, n)
+        merged = (
+            sizes[a] * condensed[positions_a] + sizes[b] * condensed[positions_b]
+        ) / (sizes[a] + sizes[b])
+
+        active[b] = False
+        others = active.copy()
+        others[a] = False
+        condensed[positions_a[others]] = merged[others]
+
+        sizes[a] += sizes[b]
+        children[next_node] = (nodes[a], nodes[b])
+        nodes[a] = next_node
+
+    # Depth-first walk from the root gives the leaf order
+    order = []
+    stack = [2 * n - 2]
+    while stack:
+        node = stack.pop()
+        if node < n:
+            order.append(node)
+        else:
+            left, right = children[node]
+            stack.extend([right, left])
+
+    return np.array(order)
+
+
+def cluster_order(matrix):
+    matrix = np.asarray(matrix, dtype=np.float64)
+    return linkage_order(condensed_distances(matrix), len(matrix))
+
+
+def bin_columns(matrix, labels, max_columns):
+    """
+    Averages runs of adjacent columns so at most `max_columns` remain.
+    Returns (matrix, labels, columns per bin).
+    """
+    n = matrix.shape[1]
+    if n <= max_columns:
+        return matrix, list(labels), 1
+
+    width = int(np.ceil(n / max_columns))
+    starts = np.arange(0, n, width)
+    counts = np.diff(np.append(starts, n))
+
+    binned = np.add.reduceat(matrix, starts, axis=1) / counts
+    labels = [
+        f"{labels[s]} – {labels[s + c - 1]}" if c > 1 else labels[s]
+        for s, c in zip(starts, counts)
+    ]
+    return binned, labels, width
+
+
+def draw_heatmap(fig, ax, matrix, row_labels, col_labels, cmap="viridis", colorbar_label=None):
+    """
+    Draws `matrix` as one raster image (instead of one patch per cell),
+    with cell borders and tick labels only where they stay readable.
+    """
+    n_rows, n_cols = matrix.shape
+
+    image = ax.imshow(
+        matrix,
+        aspect="auto",
+        interpolation="nearest",
+        cmap=cmap,
+        rasterized=True
+    )
+    cbar = fig.colorbar(image, ax=ax)
+    if colorbar_label:
+        cbar.set_label(colorbar_label)
+
+    if max(n_rows, n_cols) <= GRID_MAX_CELLS:
+        ax.hlines(np.arange(n_rows + 1) - 0.5, -0.5, n_cols - 0.5, colors="white", linewidth=0.5)
+        ax.vlines(np.arange(n_cols + 1) - 0.5, -0.5, n_rows - 0.5, colors="white", linewidth=0.5)
+
+    for axis, labels, set_ticks in [
+        (ax.yaxis, row_labels, ax.set_yticks),
+        (ax.xaxis, col_labels, ax.set_xticks)
+    ]:
+        if len(labels) <= MAX_TICK_LABELS:
+            set_ticks(np.arange(len(labels)), labels=labels)
+        else:
+            set_ticks([])
+
+    ax.tick_params(axis="x", labelrotation=90)
+    ax.tick_params(axis="y", labelsize=max(4, min(10, 400 / max(n_rows, 1))))
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+
+    return image
@@ -0,0 +1,155 @@
+import altair as alt
+import numpy as np
+
+import abundance_summary
+import normalization
+
+# ================= CONFIG =================
+CHART_HEIGHT = 500
+
+# Same palette as the static plots (last colour = Others)
+COLORS_HEX = [
+    "#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b",
+    "#e377c2", "#bcbd21", "#17becf", "#aec7e8", "#7f7f7f"
+]
+# =========================================
+
+
+def long_form(summary, level):
+    """
+    One row per (taxon, sample) of a top-N summary, with the stack
+    midpoint used by the series lines.
+    """
+    sample_cols = list(abundance_summary.sample_columns(summary))
+
+    values = summary[sample_cols].to_numpy()
+    midpoints = values.cumsum(axis=0) - values / 2
+
+    data = (
+        summary[[level, "Legend"]]
+        .rename(columns={level: "Taxon"})
+        .assign(Rank=np.arange(len(summary)))
+        .loc[np.repeat(summary.index, len(sample_cols))]
+        .reset_index(drop=True)
+    )
+    data["Sample"] = np.tile(sample_cols, len(summary))
+    data["Abundance"] = values.ravel()
+    data["Midpoint"] = midpoints.ravel()
+
+    return data, sample_cols
+
+
+def sample_filter():
+    # Client-side sample search box
+    return alt.param(
+        name="sample_filter",
+        value="",
+        bind=alt.binding(input="search", placeholder="Filter samples", name="Samples ")
+    )
+
+
+SAMPLE_FILTER = "indexof(lower(datum.Sample), lower(sample_filter)) >= 0"
+
+
+def legend_colors(summary):
+    legends = list(summary["Legend"])
+    colors = [COLORS_HEX[i % len(COLORS_HEX)] for i in range(len(legends))]
+    return alt.Scale(domain=legends, range=colors)
+
+
+def stacked_bars(summary, level, highlight):
+    return alt.Chart().mark_bar(stroke="white", strokeWidth=0.5).encode(
+        y=alt.Y(
+            "Abundance:Q",
+            stack="zero",
+            title="Relative Abundance (%)",
+            scale=alt.Scale(domain=[0, 100])
+        ),
+        color=alt.Color(
+            "Legend:N",
+            scale=legend_colors(summary),
+            legend=alt.Legend(title=f"{level} (Total %)")
+        ),
+        order=alt.Order("Rank:Q"),
+        opacity=alt.condition(highlight, alt.value(1.0), alt.value(0.25)),
+        tooltip=[
+            alt.Tooltip("Taxon:N", title=level),
+            "Sample:N",
+            alt.Tooltip("Abundance:Q", title="Relative Abundance (%)", format=".2f")
+        ]
+    ).add_params(highlight)
+
+
+def stacked_bar_chart(summary, level, top_n=abundance_summary.TOP_N):
+    data, sample_cols = long_form(summary, level)
+    highlight = alt.selection_point(fields=["Legend"], bind="legend")
+
+    bars = stacked_bars(summary, level, highlight).encode(
+        x=alt.X("Sample:N", sort=sample_cols, title=None)
+    )
+
+    return (
+        alt.layer(bars, data=data)
+        .add_params(sample_filter())
+        .transform_filter(SAMPLE_FILTER)
+        .properties(title=f"Top {top_n} {level}", height=CHART_HEIGHT)
+        .interactive(bind_x=False)
+    )
+
+
+def stacked_bar_with_lines_chart(summary, level, top_n=abundance_summary.TOP_N):
+    data, sample_cols = long_form(summary, level)
+    highlight = alt.selection_point(fields=["Legend"], bind="legend")
+    x = alt.X("Sample:N", sort=sample_cols, title=None)
+
+    bars = stacked_bars(summary, level, highlight).encode(x=x)
+
+    lines = alt.Chart().mark_line(
+        color="black", strokeWidth=1, opacity=0.7, point=alt.OverlayMarkDef(color="black", size=16)
+    ).encode(
+        x=x,
+        y="Midpoint:Q",
+        detail="Taxon:N"
+    )
+
+    return (
+        alt.layer(bars, lines, data=data)
+        .add_params(sample_filter())
+        .transform_filter(SAMPLE_FILTER)
+        .properties(title=f"Top {top_n} {level}", height=CHART_HEIGHT)
+        .interactive(bind_x=False)
+    )
+
+
+def heatmap_chart(summary, level, top_n=abundance_summary.TOP_N):
+    # Top N taxa only, as relative abundance (%) within them
+    top = summary.iloc[:-1].copy()
+    sample_cols = abundance_summary.sample_columns(top)
+    top[sample_cols] = normalization.percent(normalization.float_matrix(top[sample_cols]))
+
+    data, sample_cols = long_form(top, level)
+
+    return (
+        alt.Chart(data)
+        .mark_rect(stroke="white", strokeWidth=0.5)
+        .encode(
+            x=alt.X("Sample:N", sort=sample_cols, title="Samples"),
+            y=alt.Y("Taxon:N", sort=alt.EncodingSortField("Rank"), title=level),
+            color=alt.Color(
+                "Abundance:Q",
+                scale=alt.Scale(scheme="viridis"),
+                title="Relative Abundance (%)"
+            ),
+            tooltip=[
+                alt.Tooltip("Taxon:N", title=level),
+                "Sample:N",
+                alt.Tooltip("Abundance:Q", title="Relative Abundance (%)", format=".2f")
+            ]
+        )
+        .add_params(sample_filter())
+        .transform_filter(SAMPLE_FILTER)
+        .properties(
+            title=f"Top {top_n} {level} – Relative Abundance",
+            height=max(300, 30 * len(top))
+        )
+    )
@@ -0,0 +1,121 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ================= CONFIG =================
+# Jobs running at once across every session of the server; later jobs queue
+MAX_CONCURRENT_JOBS = 2
+
+# Finished jobs stay available (to late pollers and other sessions) this long (s)
+JOB_TTL = 15 * 60
+
+# Seconds between status checks of a page waiting on a job
+POLL_INTERVAL = 0.5
+# =========================================
+
+ACTIVE = ("queued", "running")
+
+_jobs = {}
+_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    # Thread pool shared by every session, created on first use
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=MAX_CONCURRENT_JOBS, thread_name_prefix="pipeline-job"
+            )
+        return _executor
+
+
+def prune(now=None):
+    # Drops finished jobs older than JOB_TTL; call with the lock held
+    now = time.time() if now is None else now
+    expired = [
+        job_id for job_id, job in _jobs.items()
+        if job["status"] not in ACTIVE and now - job["finished"] > JOB_TTL
+    ]
+    for job_id in expired:
+        del _jobs[job_id]
+
+
+def submit(job_id, func, *args, label=""):
+    """
+    Runs func(*args, report) on the job pool and returns the job's ID.
+
+    `job_id` should identify the work (e.g. a result cache key): while a
+    job with that ID is queued, running or recently finished, submitting
+    it again returns the same job instead of starting the work twice.
+    Failed jobs are replaced.
+
+    `report(done, total, message, partial=None)` updates the job's
+    progress; `partial` ({name: value}) adds results that are ready early.
+    """
+    with _lock:
+        prune()
+        job = _jobs.get(job_id)
+        if job is not None and job["status"] != "failed":
+            return job_id
+
+        job = {
+            "id": job_id,
+            "label": label,
+            "status": "queued",
+            "done": 0,
+            "total": 0,
+            "message": "Waiting for a free worker",
+            "partial": {},
+            "result": None,
+            "error": None,
+            "submitted": time.time(),
+            "finished": None
+        }
+        _jobs[job_id] = job
+
+    get_executor().submit(_run, job, func, args)
+    return job_id
+
+
+def _run(job, func, args):
+    def report(done, total, message, partial=None):
+        with _lock:
+            job.update(done=done, total=total, message=message)
+            if partial:
+                job["partial"].update(partial)
+
+    with _lock:
+        job.update(status="running", message="Starting")
+
+    try:
+        result = func(*args, report)
+    except Exception as error:
+        with _lock:
+            job.update(status="failed", error=f"{type(error).__name__}: {error}", finished=time.time())
+    else:
+        with _lock:
+            job.update(status="done", result=result, finished=time.time())
+
+
+def status(job_id):
+    """
+    Consistent copy of a job's state, or None for an unknown (or expired)
+    job. The result and partial values themselves are shared, not copied.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        return {**job, "partial": dict(job["partial"])}
+
+
+def is_active(job):
+    return job is not None and job["status"] in ACTIVE
+
+
+def progress(job):
+    # Fraction done, for progress bars
+    return min(1.0, job["done"] / job["total"]) if job["total"] else 0.0
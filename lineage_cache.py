@@ -0,0 +1,124 @@
+import sqlite3
+import time
+from pathlib import Path
+
+# ================= CONFIG =================
+CACHE_FILE = Path(".microbiome_cache/lineages.sqlite")
+
+# Least recently used lineages are evicted beyond this many entries
+MAX_ENTRIES = 500_000
+
+# Seconds to wait for another session holding the write lock
+LOCK_TIMEOUT = 30
+
+# Keys per SELECT (stays under SQLite's bound-parameter limit)
+QUERY_BATCH = 500
+# =========================================
+
+
+def connect(cache_file, rules_version):
+    """
+    Opens the cache database, creating it if needed. Entries written
+    under a different rules version are dropped.
+    """
+    cache_file = Path(cache_file)
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(cache_file, timeout=LOCK_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+
+    with conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS lineages ("
+            " taxon TEXT PRIMARY KEY,"
+            " domain TEXT, phylum TEXT, class TEXT, ord TEXT,"
+            " family TEXT, genus TEXT, species TEXT,"
+            " last_used REAL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS lineages_last_used"
+            " ON lineages (last_used)"
+        )
+
+        row = conn.execute(
+            "SELECT value FROM meta WHERE key = 'rules_version'"
+        ).fetchone()
+        if row is None or row[0] != rules_version:
+            conn.execute("DELETE FROM lineages")
+            conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('rules_version', ?)",
+                (rules_version,)
+            )
+
+    return conn
+
+
+def lookup(cache_file, rules_version, taxa):
+    """
+    Returns {taxon: seven-rank tuple} for the taxa already in the cache
+    and marks them as recently used.
+    """
+    taxa = list(dict.fromkeys(taxa))
+    hits = {}
+
+    conn = connect(cache_file, rules_version)
+    try:
+        for start in range(0, len(taxa), QUERY_BATCH):
+            batch = taxa[start:start + QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                "SELECT taxon, domain, phylum, class, ord, family, genus, species"
+                f" FROM lineages WHERE taxon IN ({placeholders})",
+                batch
+            )
+            for row in rows:
+                hits[row[0]] = row[1:]
+
+        with conn:
+            now = time.time()
+            conn.executemany(
+                "UPDATE lineages SET last_used = ? WHERE taxon = ?",
+                [(now, taxon) for taxon in hits]
+            )
+    finally:
+        conn.close()
+
+    return hits
+
+
+def store(cache_file, rules_version, entries, max_entries=MAX_ENTRIES):
+    """
+    Saves {taxon: seven-rank tuple} entries, then evicts the least
+    recently used lineages beyond `max_entries`.
+    """
+    if not entries:
+        return
+
+    conn = connect(cache_file, rules_version)
+    try:
+        with conn:
+            now = time.time()
+            conn.executemany(
+                "INSERT OR REPLACE INTO lineages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(taxon, *ranks, now) for taxon, ranks in entries.items()]
+            )
+
+            count = conn.execute("SELECT COUNT(*) FROM lineages").fetchone()[0]
+            if count > max_entries:
+                conn.execute(
+                    "DELETE FROM lineages WHERE taxon IN ("
+                    " SELECT taxon FROM lineages ORDER BY last_used LIMIT ?)",
+                    (count - max_entries,)
+                )
+    finally:
+        conn.close()
+
+
+def clear(cache_file=CACHE_FILE):
+    cache_file = Path(cache_file)
+    for path in [cache_file, Path(f"{cache_file}-wal"), Path(f"{cache_file}-shm")]:
+        if path.exists():
+            path.unlink()
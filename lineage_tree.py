@@ -0,0 +1,212 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+import normalization
+import perf_trace
+from taxonomy_rollup import build_lineage_index, iter_node_sums, restore_dtype, sample_matrix
+
+# ================= CONFIG =================
+TAX_LEVELS = ["Domain", "Phylum", "Class", "Order", "Family", "Genus", "Species"]
+
+# Descendants listed by a drill-down
+DRILL_DOWN_TOP_N = 10
+# =========================================
+
+# Array fields of a tree, as saved by to_bytes
+ARRAYS = ["names", "node_level", "node_name", "parent", "child_start", "level_start", "abundance"]
+
+
+@perf_trace.timed()
+def build_tree(cleaned_df, levels=TAX_LEVELS):
+    """
+    Builds the lineage tree of a cleaned table. A node is one distinct
+    lineage prefix (e.g. Bacteria > Firmicutes); its abundance is the
+    sum of every row below it, so any subtree total is one lookup.
+
+    Returns a dict of flat arrays:
+      - names:       every distinct name once, sorted (interned)
+      - node_level:  level index of every node
+      - node_name:   position in `names` of every node (-1 = no name)
+      - parent:      parent node of every node (-1 for the top level)
+      - child_start: the children of node i are nodes
+                     child_start[i] to child_start[i + 1] - 1
+      - level_start: the nodes of level d are level_start[d] to
+                     level_start[d + 1] - 1
+      - abundance:   nodes x samples counts of every subtree
+    Nodes are numbered level by level and ordered by (parent, name), so
+    the descendants of a node at any depth are one contiguous range.
+    """
+    samples, values = sample_matrix(cleaned_df, levels)
+    index = build_lineage_index(cleaned_df, levels)
+
+    names = pd.Index(
+        np.concatenate([index["names"][level].to_numpy(dtype=object) for level in levels])
+    ).unique().sort_values()
+
+    node_sums = dict(iter_node_sums(index, values))
+    node_level, node_name, parent, abundance = [], [], [], []
+    level_start = [0]
+    parent_ids = None
+
+    for depth, level in enumerate(levels):
+        local_codes = index["node_names"][level]
+        # Local name codes -> positions in `names` (-1 stays -1)
+        to_global = np.append(names.get_indexer(index["names"][level]), -1)
+        codes = to_global[local_codes]
+
+        if depth == 0:
+            parents = np.full(len(codes), -1, dtype=np.int64)
+        else:
+            parents = parent_ids[index["parents"][level]]
+
+        # Renumber this level's nodes by (parent, name)
+        order = np.lexsort((codes, parents))
+        parent_ids = np.empty(len(order), dtype=np.int64)
+        parent_ids[order] = level_start[-1] + np.arange(len(order))
+
+        node_level.append(np.full(len(order), depth, dtype=np.int8))
+        node_name.append(codes[order])
+        parent.append(parents[order])
+        abundance.append(restore_dtype(node_sums.pop(level)[:, order], samples.dtypes))
+        level_start.append(level_start[-1] + len(order))
+
+    parent = np.concatenate(parent)
+    if any(isinstance(block, dict) for block in abundance):
+        # Mixed sample dtypes: keep one table-wide type
+        abundance = [
+            np.column_stack(list(block.values())) if isinstance(block, dict) else block
+            for block in abundance
+        ]
+
+    return {
+        "levels": list(levels),
+        "samples": samples.columns,
+        "names": names.to_numpy(dtype=str),
+        "node_level": np.concatenate(node_level),
+        "node_name": np.concatenate(node_name).astype(
+            normalization.fitting_dtype(-1, len(names))
+        ),
+        "parent": parent,
+        # Parents are sorted, so each node's children start where the
+        # first node with a larger parent ID would be
+        "child_start": np.searchsorted(parent, np.arange(len(parent) + 1)),
+        "level_start": np.array(level_start, dtype=np.int64),
+        "abundance": np.concatenate(abundance)
+    }
+
+
+def level_nodes(tree, level):
+    depth = tree["levels"].index(level)
+    return np.arange(tree["level_start"][depth], tree["level_start"][depth + 1])
+
+
+def find_nodes(tree, level, name):
+    # Nodes of a level with this name (a name can sit in several lineages)
+    code = np.searchsorted(tree["names"], name)
+    if code >= len(tree["names"]) or tree["names"][code] != name:
+        return np.array([], dtype=np.int64)
+    nodes = level_nodes(tree, level)
+    return nodes[tree["node_name"][nodes] == code]
+
+
+def descendants(tree, node, level):
+    """
+    Nodes of `level` below `node`, from the contiguous child ranges of
+    each level in between.
+    """
+    first, last = node, node + 1
+    for _ in range(tree["levels"].index(level) - int(tree["node_level"][node])):
+        first, last = tree["child_start"][first], tree["child_start"][last]
+    return np.arange(first, last)
+
+
+def children(tree, node):
+    return np.arange(tree["child_start"][node], tree["child_start"][node + 1])
+
+
+def lineage(tree, node):
+    # Names from the top level down to `node`
+    path = []
+    while node >= 0:
+        code = tree["node_name"][node]
+        path.append(str(tree["names"][code]) if code >= 0 else None)
+        node = tree["parent"][node]
+    return path[::-1]
+
+
+def node_table(tree, nodes, level):
+    """
+    Per-sample counts of the given nodes summed by name, shaped like a
+    level table (first column = names). Nodes without a name are left
+    out, as in the level tables.
+    """
+    nodes = nodes[tree["node_name"][nodes] >= 0]
+    table = pd.DataFrame(
+        tree["abundance"][nodes],
+        index=pd.Index(tree["names"][tree["node_name"][nodes]].astype(object), name=level),
+        columns=tree["samples"]
+    )
+    return table.groupby(level=0, sort=True).sum()
+
+
+def level_table(tree, level):
+    return node_table(tree, level_nodes(tree, level), level).reset_index()
+
+
+def level_totals(tree, level):
+    # Total count of every name of a level, most abundant first
+    totals = node_table(tree, level_nodes(tree, level), level).sum(axis=1)
+    return totals.sort_values(ascending=False, kind="stable")
+
+
+def taxon_counts(tree, level, name):
+    # Per-sample subtree total of a taxon (over every lineage holding it)
+    nodes = find_nodes(tree, level, name)
+    return pd.Series(
+        tree["abundance"][nodes].sum(axis=0), index=tree["samples"], name=name
+    )
+
+
+def drill_down(tree, level, name, child_level, top_n=DRILL_DOWN_TOP_N):
+    """
+    The `top_n` most abundant `child_level` taxa below a taxon (e.g. the
+    top genera of a phylum), with per-sample counts and each one's share
+    of the taxon's total. Only that subtree is touched.
+    """
+    if tree["levels"].index(child_level) <= tree["levels"].index(level):
+        raise ValueError(f"{child_level} is not below {level}")
+
+    nodes = np.concatenate([
+        descendants(tree, node, child_level) for node in find_nodes(tree, level, name)
+    ] or [np.array([], dtype=np.int64)])
+    table = node_table(tree, nodes, child_level)
+
+    totals = table.sum(axis=1)
+    table = table.loc[totals.sort_values(ascending=False, kind="stable").index[:top_n]]
+
+    parent_total = taxon_counts(tree, level, name).sum()
+    share = table.sum(axis=1) / parent_total * 100 if parent_total else np.nan
+    table.insert(0, f"% of {name}", share)
+    return table.reset_index()
+
+
+def to_bytes(tree):
+    # Single-blob form (uncompressed .npz), as table_store.to_bytes
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        levels=np.array(tree["levels"], dtype=str),
+        samples=np.array([str(c) for c in tree["samples"]], dtype=str),
+        **{name: tree[name] for name in ARRAYS}
+    )
+    return buffer.getvalue()
+
+
+def from_bytes(data):
+    with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+        tree = {name: npz[name] for name in ARRAYS}
+        tree["levels"] = [str(level) for level in npz["levels"]]
+        tree["samples"] = pd.Index(npz["samples"].astype(object))
+    return tree
@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+
+# ================= CONFIG =================
+# Float type of normalized values (np.float64 for full precision)
+FLOAT_DTYPE = np.float32
+
+# Added to every count before the log of the CLR transform
+PSEUDOCOUNT = 0.5
+
+# Reads kept per sample by rarefaction (None = depth of the shallowest sample)
+RAREFY_DEPTH = None
+RAREFY_SEED = 0
+
+METHODS = {
+    "counts": "Counts",
+    "percent": "Relative abundance (%)",
+    "clr": "CLR",
+    "rarefied": "Rarefied counts"
+}
+# =========================================
+
+UNSIGNED_TYPES = [np.uint8, np.uint16, np.uint32, np.uint64]
+SIGNED_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+def fitting_dtype(low, high):
+    # Smallest integer dtype covering [low, high]
+    candidates = UNSIGNED_TYPES if low >= 0 else SIGNED_TYPES
+    for dtype in candidates:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return None
+
+
+def is_whole(values):
+    if values.dtype.kind in "iu":
+        return True
+    return values.dtype.kind == "f" and bool(
+        np.isfinite(values).all() and (values == np.trunc(values)).all()
+    )
+
+
+def count_dtype(values):
+    """
+    Smallest integer dtype holding every value of an array, or None when
+    the values are not whole numbers (fractions, missing values).
+    """
+    if not is_whole(values):
+        return None
+    if values.size == 0:
+        return np.dtype(np.uint8)
+    return fitting_dtype(values.min(), values.max())
+
+
+def downcast_counts(df, label_columns=()):
+    """
+    Stores the integer count columns of a table as one block of the
+    smallest integer dtype that fits them. Tables with any float count
+    column (even one holding whole numbers) are returned unchanged.
+
+    Columns are scanned and copied one at a time, so no full-size
+    temporary is built even when every column is its own block.
+    """
+    count_cols = [c for c in df.columns if c not in label_columns]
+    if not count_cols or not all(
+        pd.api.types.is_integer_dtype(t) and isinstance(t, np.dtype)
+        for t in df[count_cols].dtypes
+    ):
+        return df
+
+    columns = [df[col].to_numpy() for col in count_cols]
+
+    if len(df):
+        dtype = fitting_dtype(
+            min(values.min() for values in columns),
+            max(values.max() for values in columns)
+        )
+    else:
+        dtype = np.dtype(np.uint8)
+    if dtype is None or all(values.dtype == dtype for values in columns):
+        return df
+
+    # Taxa x samples in column order, so the frame wraps it without a copy
+    counts = np.empty((len(df), len(count_cols)), dtype=dtype, order="F")
+    for i, values in enumerate(columns):
+        counts[:, i] = values
+    downcast = pd.DataFrame(counts, index=df.index, columns=count_cols, copy=False)
+    if len(count_cols) == len(df.columns):
+        return downcast
+
+    merged = pd.concat([df[[c for c in df.columns if c in label_columns]], downcast], axis=1)
+    return merged if list(merged.columns) == list(df.columns) else merged[df.columns]
+
+
+def float_matrix(counts, dtype=FLOAT_DTYPE):
+    # One writable copy of the counts; the transforms below work in place on it
+    values = counts.to_numpy() if isinstance(counts, pd.DataFrame) else np.asarray(counts)
+    return np.array(values, dtype=dtype, order="F")
+
+
+def percent(matrix):
+    """
+    Total-sum scaling, in place: every column (sample) becomes relative
+    abundance in %. Samples without counts become NaN.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        matrix /= matrix.sum(axis=0, keepdims=True)
+    matrix *= 100
+    return matrix
+
+
+def clr(matrix, pseudocount=PSEUDOCOUNT):
+    # Centred log-ratio per sample, in place
+    matrix += pseudocount
+    np.log(matrix, out=matrix)
+    matrix -= matrix.mean(axis=0, keepdims=True)
+    return matrix
+
+
+def rarefy(counts, depth=RAREFY_DEPTH, seed=RAREFY_SEED):
+    """
+    Subsamples every column of an integer taxa x samples matrix to
+    `depth` reads without replacement. Samples with fewer reads are
+    dropped. Returns (rarefied counts, kept sample mask).
+    """
+    totals = counts.sum(axis=0)
+    if depth is None:
+        depth = int(totals[totals > 0].min()) if (totals > 0).any() else 0
+
+    keep = totals >= depth
+    rng = np.random.default_rng(seed)
+    dtype = count_dtype(np.array([depth])) if depth > 0 else np.dtype(np.uint8)
+    rarefied = np.zeros((counts.shape[0], int(keep.sum())), dtype=dtype, order="F")
+
+    for out_col, col in enumerate(np.flatnonzero(keep)):
+        column = counts[:, col]
+        present = np.flatnonzero(column)
+        rarefied[present, out_col] = rng.multivariate_hypergeometric(
+            column[present].astype(np.int64), depth, method="marginals"
+        )
+
+    return rarefied, keep
+
+
+def normalize(level_df, method="percent", dtype=FLOAT_DTYPE, pseudocount=PSEUDOCOUNT,
+              depth=RAREFY_DEPTH, seed=RAREFY_SEED):
+    """
+    Normalizes a level table (first column = taxon names, then samples).
+    Values are converted once to `dtype` and transformed in place; the
+    result shares that buffer instead of copying it again.
+    """
+    labels, counts = level_df.iloc[:, :1], level_df.iloc[:, 1:]
+
+    if method == "counts":
+        return downcast_counts(level_df, [level_df.columns[0]])
+
+    if method == "rarefied":
+        values = counts.to_numpy()
+        if count_dtype(values) is None:
+            raise ValueError("Rarefaction needs whole-number counts")
+        values, keep = rarefy(values, depth, seed)
+        columns = counts.columns[keep]
+    elif method in ("percent", "clr"):
+        values = float_matrix(counts, dtype)
+        values = percent(values) if method == "percent" else clr(values, pseudocount)
+        columns = counts.columns
+    else:
+        raise ValueError(f"Unknown normalization: {method}")
+
+    normalized = pd.DataFrame(values, index=level_df.index, columns=columns, copy=False)
+    return pd.concat([labels, normalized], axis=1)
+
+
+def normalize_tables(level_tables, method="percent", **options):
+    return {
+        level: normalize(df, method, **options)
+        for level, df in level_tables.items()
+    }
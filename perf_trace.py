@@ -0,0 +1,249 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+# ================= CONFIG =================
+# Command-line runs write a Chrome trace here when set
+# (e.g. MICROBIOME_TRACE=trace.json python generate_all_heatmaps.py)
+TRACE_ENV = "MICROBIOME_TRACE"
+TRACE_MEMORY_ENV = "MICROBIOME_TRACE_MEMORY"
+
+# Oldest events are dropped beyond this many per recording
+MAX_EVENTS = 5000
+# =========================================
+
+# Active recording of the current thread / task; None = instrumentation off
+_recorder = contextvars.ContextVar("perf_recorder", default=None)
+_NOT_RECORDING = nullcontext()
+
+# tracemalloc is process-wide: recordings tracking memory are counted and
+# tracing started here stops only when the last of them stops
+_memory_lock = threading.Lock()
+_memory_users = 0
+_owns_tracemalloc = False
+
+
+def start(events, memory=False):
+    """
+    Starts recording stages into `events` (a list that may already hold
+    earlier events). With `memory`, peak allocations are tracked with
+    tracemalloc, which slows allocation-heavy stages down.
+    Returns the recording, which stays active until stop(recording).
+    """
+    recorder = {"events": events, "memory": memory, "stack": []}
+    if memory:
+        track_memory(True)
+    _recorder.set(recorder)
+    return recorder
+
+
+def resume(recorder):
+    # Makes a started recording current again (e.g. on a later app rerun)
+    recorder["stack"] = []
+    _recorder.set(recorder)
+
+
+def stop(recorder=None):
+    """
+    Stops a recording (default: the current one). Stopping a recording
+    twice, or when nothing records, does nothing.
+    """
+    recorder = recorder if recorder is not None else _recorder.get()
+    if recorder is None:
+        return
+    if recorder["memory"]:
+        recorder["memory"] = False
+        track_memory(False)
+    if _recorder.get() is recorder:
+        _recorder.set(None)
+
+
+def track_memory(on):
+    # One more (on) or one fewer (off) recording tracking memory
+    global _memory_users, _owns_tracemalloc
+    with _memory_lock:
+        _memory_users = _memory_users + 1 if on else max(_memory_users - 1, 0)
+        if _memory_users and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _owns_tracemalloc = True
+        elif not _memory_users and _owns_tracemalloc:
+            tracemalloc.stop()
+            _owns_tracemalloc = False
+
+
+def enabled():
+    return _recorder.get() is not None
+
+
+@contextmanager
+def recording(events=None, memory=False):
+    events = [] if events is None else events
+    token = _recorder.set(None)
+    recorder = start(events, memory)
+    try:
+        yield events
+    finally:
+        stop(recorder)
+        _recorder.reset(token)
+
+
+def stage(name, **args):
+    """
+    Context manager timing one pipeline stage. Costs one context-variable
+    lookup when nothing is recording.
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        return _NOT_RECORDING
+    return _record(recorder, name, args)
+
+
+@contextmanager
+def _record(recorder, name, args):
+    stack = recorder["stack"]
+    memory = recorder["memory"] and tracemalloc.is_tracing()
+
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+    else:
+        current = 0
+    frame = {"start_memory": current, "peak": current}
+    stack.append(frame)
+
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - wall
+        cpu_time = time.thread_time() - cpu
+        stack.pop()
+
+        event = {
+            "name": name,
+            "ts": wall * 1e6,
+            "dur": duration * 1e6,
+            "tid": threading.get_ident(),
+            "depth": len(stack),
+            "args": {"cpu_ms": cpu_time * 1e3, **args}
+        }
+
+        if memory:
+            _, peak = tracemalloc.get_traced_memory()
+            frame["peak"] = max(frame["peak"], peak)
+            event["args"]["peak_mb"] = (frame["peak"] - frame["start_memory"]) / 1024 ** 2
+            if stack:
+                stack[-1]["peak"] = max(stack[-1]["peak"], frame["peak"])
+            tracemalloc.reset_peak()
+
+        events = recorder["events"]
+        events.append(event)
+        if len(events) > MAX_EVENTS:
+            del events[:len(events) - MAX_EVENTS]
+
+
+def timed(name=None):
+    # Decorator form of stage(); the stage is named after the function
+    def decorate(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _recorder.get() is None:
+                return func(*args, **kwargs)
+            with stage(stage_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def bind(func):
+    """
+    Wraps a callable that will run on another thread (e.g. a download
+    callback) so its stages land in the current recording.
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _recorder.set({**recorder, "stack": []})
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _recorder.reset(token)
+
+    return wrapper
+
+
+def summary_rows(events):
+    # One row per event, oldest first, for tables
+    return [
+        {
+            "Stage": "  " * event["depth"] + event["name"],
+            "Wall (ms)": round(event["dur"] / 1e3, 1),
+            "CPU (ms)": round(event["args"]["cpu_ms"], 1),
+            "Peak memory (MB)": round(event["args"]["peak_mb"], 1) if "peak_mb" in event["args"] else None,
+            "Details": ", ".join(
+                f"{key}={value}" for key, value in event["args"].items()
+                if key not in ("cpu_ms", "peak_mb")
+            )
+        }
+        for event in sorted(events, key=lambda e: e["ts"])
+    ]
+
+
+def chrome_trace(events):
+    """
+    Events in the Chrome trace format (open in chrome://tracing or
+    https://ui.perfetto.dev).
+    """
+    return {
+        "traceEvents": [
+            {
+                "name": event["name"],
+                "cat": "pipeline",
+                "ph": "X",
+                "ts": event["ts"],
+                "dur": event["dur"],
+                "pid": os.getpid(),
+                "tid": event["tid"],
+                "args": event["args"]
+            }
+            for event in events
+        ],
+        "displayTimeUnit": "ms"
+    }
+
+
+def chrome_trace_bytes(events):
+    return json.dumps(chrome_trace(events), indent=1).encode()
+
+
+def run(main, *args, **kwargs):
+    """
+    Runs a command-line entry point, recording a Chrome trace to the file
+    named by MICROBIOME_TRACE when that variable is set.
+    """
+    trace_file = os.environ.get(TRACE_ENV)
+    if not trace_file:
+        return main(*args, **kwargs)
+
+    memory = os.environ.get(TRACE_MEMORY_ENV, "") not in ("", "0")
+    with recording(memory=memory) as events:
+        try:
+            with stage("main"):
+                return main(*args, **kwargs)
+        finally:
+            Path(trace_file).write_bytes(chrome_trace_bytes(events))
@@ -0,0 +1,105 @@
+import importlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import perf_trace
+
+# ================= CONFIG =================
+# Render processes (1 = render in the calling process)
+WORKERS = os.cpu_count() or 1
+# =========================================
+
+# One pool per worker count; a pool in use by another caller is never shut down
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _init_worker():
+    # Workers never need a display
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def new_figure(figsize):
+    """
+    Matplotlib figure outside pyplot (safe off the main thread).
+    matplotlib is slow to import, so it is only imported by the first
+    render, never when a plotting module is imported.
+    """
+    from matplotlib.figure import Figure
+    return Figure(figsize=figsize)
+
+
+def _render_level(module_name, df, level, dpi):
+    module = importlib.import_module(module_name)
+    return module.render_png(df, level, dpi)
+
+
+def get_pool(workers=WORKERS):
+    """
+    Process pool shared by every caller (and every app session), created
+    on first use. Workers are spawned rather than forked so the pool is
+    safe to start from a threaded server. Callers asking for another
+    number of workers get a pool of their own.
+    """
+    with _pools_lock:
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        return _pools[workers]
+
+
+def render_batch(requests, workers=WORKERS, on_result=None):
+    """
+    Renders several plot families in one batch, one job per level.
+
+    `requests` is a list of (module name, level_tables, dpi); the module
+    must provide render_png(df, level, dpi). Returns one
+    {file name: PNG bytes} dict per request, in request order and with
+    files in level order, regardless of which job finishes first.
+
+    `on_result(request index, level, file name, png)` is called in the
+    calling thread as each level finishes.
+    """
+    jobs = [
+        (module_name, df, level, dpi)
+        for module_name, level_tables, dpi in requests
+        for level, df in level_tables.items()
+    ]
+    owners = [
+        index
+        for index, (_, level_tables, _) in enumerate(requests)
+        for _ in level_tables
+    ]
+
+    def finished(position, result):
+        if on_result is not None:
+            on_result(owners[position], jobs[position][2], *result)
+
+    with perf_trace.stage("render_batch", jobs=len(jobs), workers=workers):
+        rendered = [None] * len(jobs)
+        if workers <= 1 or len(jobs) <= 1:
+            for position, job in enumerate(jobs):
+                rendered[position] = _render_level(*job)
+                finished(position, rendered[position])
+        else:
+            pool = get_pool(workers)
+            futures = {pool.submit(_render_level, *job): position for position, job in enumerate(jobs)}
+            for future in as_completed(futures):
+                position = futures[future]
+                rendered[position] = future.result()
+                finished(position, rendered[position])
+
+    results = []
+    position = 0
+    for _, level_tables, _ in requests:
+        count = len(level_tables)
+        results.append(dict(rendered[position:position + count]))
+        position += count
+
+    return results
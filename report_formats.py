@@ -0,0 +1,230 @@
+import bz2
+import gzip
+import hashlib
+import io
+import lzma
+import re
+from pathlib import Path
+
+import pandas as pd
+
+# ================= CONFIG =================
+# Compressed inputs are recognized by their first bytes, not their name
+COMPRESSION_MAGIC = {
+    b"\x1f\x8b": "gzip",
+    b"BZh": "bz2",
+    b"\xfd7zXZ\x00": "xz"
+}
+
+# Kraken2 / Bracken rank codes kept in lineages (sub-ranks such as G1 and
+# ranks without a prefix, e.g. K, count towards their nearest ranked parent)
+RANK_PREFIXES = {
+    "D": "d__",
+    "P": "p__",
+    "C": "c__",
+    "O": "o__",
+    "F": "f__",
+    "G": "g__",
+    "S": "s__"
+}
+
+# Report file names picked up from directories and offered by the uploader
+REPORT_EXTENSIONS = ["txt", "tsv", "report", "kreport", "kreport2", "k2report", "bracken"]
+COMPRESSED_EXTENSIONS = ["gz", "bz2", "xz"]
+
+# Bytes of (decompressed) input inspected to detect the format
+SNIFF_BYTES = 64 * 1024
+
+# Bytes read at a time while hashing a report
+HASH_BLOCK = 1024 ** 2
+# =========================================
+
+FORMATS = {
+    "lineage": "Lineage table (Taxon + sample columns)",
+    "kraken": "Kraken2 report",
+    "bracken": "Bracken table"
+}
+
+OPENERS = {
+    "gzip": lambda f: gzip.GzipFile(fileobj=f),
+    "bz2": bz2.BZ2File,
+    "xz": lzma.LZMAFile
+}
+
+# percent, clade reads, direct reads, [minimizers, distinct minimizers,] rank, taxid, name
+KRAKEN_LINE = re.compile(r"^\s*[\d.]+\t\d+\t\d+\t(?:\d+\t\d+\t)?[A-Z]\d*\t\d+\t")
+BRACKEN_HEADER = "name\ttaxonomy_id\ttaxonomy_lvl"
+
+REPORT_PATTERNS = [
+    f"*.{ext}{suffix}"
+    for ext in REPORT_EXTENSIONS
+    for suffix in ["", *(f".{c}" for c in COMPRESSED_EXTENSIONS)]
+]
+
+
+def peek(stream, size):
+    # First bytes of a seekable stream, which is rewound afterwards
+    head = stream.read(size)
+    stream.seek(0)
+    return head
+
+
+def detect_compression(stream):
+    head = peek(stream, 8)
+    for magic, compression in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def detect_format(head):
+    """
+    Format of a report from its first (decompressed) bytes: a Bracken
+    table, a native Kraken2 report or the internal lineage table.
+    """
+    lines = [line for line in head.decode("utf-8", errors="replace").splitlines() if line.strip()]
+    if not lines:
+        return "lineage"
+    if lines[0].startswith(BRACKEN_HEADER):
+        return "bracken"
+    if KRAKEN_LINE.match(lines[0]):
+        return "kraken"
+    return "lineage"
+
+
+def sample_name(source):
+    # Sample column of a single-sample report: "S1.kreport.gz" -> "S1"
+    name = getattr(source, "name", source)
+    if not isinstance(name, (str, Path)):
+        return "sample"
+
+    name = Path(name).name
+    known = set(REPORT_EXTENSIONS + COMPRESSED_EXTENSIONS)
+    while "." in name and name.rsplit(".", 1)[1].lower() in known:
+        name = name.rsplit(".", 1)[0]
+    return name or "sample"
+
+
+def content_hash(path):
+    """
+    SHA-256 of a report file's decompressed content, read block by block:
+    a compressed copy of a report hashes like the plain report (and a plain
+    report like result_cache.content_hash of its bytes).
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        compression = detect_compression(handle)
+        stream = OPENERS[compression](handle) if compression else handle
+        try:
+            for block in iter(lambda: stream.read(HASH_BLOCK), b""):
+                digest.update(block)
+        finally:
+            stream.close()
+    return digest.hexdigest()
+
+
+def open_report(stream):
+    """
+    Prepares a report (seekable binary file-like object) for reading.
+    Compressed input is decompressed as a stream, never written out.
+    Returns (binary stream, format).
+    """
+    compression = detect_compression(stream)
+    if compression:
+        stream = OPENERS[compression](stream)
+
+    return stream, detect_format(peek(stream, SNIFF_BYTES))
+
+
+def kraken_lineages(stream):
+    """
+    Converts a Kraken2 report on the fly into {lineage: direct reads}.
+    Names are indented two spaces per tree depth; each line's lineage is
+    built from the ranked nodes on its path. Unclassified reads and reads
+    left at the root have no lineage and are skipped.
+    """
+    lineages = {}
+    path = []
+
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    try:
+        for line in text:
+            fields = line.rstrip("\r\n").split("\t")
+            if len(fields) < 6 or not KRAKEN_LINE.match(line):
+                continue
+
+            direct_reads, rank = int(fields[2]), fields[-3].strip()
+            name = fields[-1].lstrip(" ")
+            depth = (len(fields[-1]) - len(name)) // 2
+
+            while path and path[-1][0] >= depth:
+                path.pop()
+            path.append((depth, RANK_PREFIXES.get(rank), name.strip()))
+
+            if direct_reads and rank != "U":
+                lineage = "; ".join(prefix + taxon for _, prefix, taxon in path if prefix)
+                if lineage:
+                    lineages[lineage] = lineages.get(lineage, 0) + direct_reads
+    finally:
+        # The caller's stream stays open
+        text.detach()
+
+    return lineages
+
+
+def read_kraken(stream, sample):
+    lineages = kraken_lineages(stream)
+    return pd.DataFrame({"Taxon": list(lineages), sample: list(lineages.values())})
+
+
+def read_bracken(stream, sample):
+    """
+    Bracken abundance table -> lineage table. Bracken keeps one rank and
+    no lineage, so each row only names its own rank (use the Kraken-style
+    report Bracken also writes for full lineages). Combined tables
+    (combine_bracken_outputs.py) give one sample per *_num column.
+    """
+    table = pd.read_csv(stream, sep="\t")
+    prefixes = table["taxonomy_lvl"].map(RANK_PREFIXES).fillna("")
+
+    if "new_est_reads" in table.columns:
+        counts = {sample: table["new_est_reads"]}
+    else:
+        counts = {
+            re.sub(r"(\.bracken)?_num$", "", col): table[col]
+            for col in table.columns if col.endswith("_num")
+        }
+
+    return pd.DataFrame({"Taxon": prefixes + table["name"].str.strip(), **counts})
+
+
+def read_chunks(source, chunksize=None, sample=None):
+    """
+    Yields the report as lineage tables (Taxon + sample columns), in
+    chunks of `chunksize` rows for lineage tables. Native reports hold
+    one sample each and are converted in one pass.
+    """
+    handle = open(source, "rb") if isinstance(source, (str, Path)) else source
+    stream, report_format = open_report(handle)
+    sample = sample or sample_name(source)
+
+    try:
+        if report_format == "kraken":
+            yield read_kraken(stream, sample)
+        elif report_format == "bracken":
+            yield read_bracken(stream, sample)
+        elif chunksize:
+            yield from pd.read_csv(stream, sep="\t", chunksize=chunksize)
+        else:
+            yield pd.read_csv(stream, sep="\t")
+    finally:
+        # Only streams opened here are closed (uploads stay readable)
+        if stream is not handle:
+            stream.close()
+        if handle is not source:
+            handle.close()
+
+
+def read_report(source, sample=None):
+    [table] = read_chunks(source, sample=sample)
+    return table
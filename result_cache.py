@@ -0,0 +1,151 @@
+import functools
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import clean_input_microbiome_taxonomy as cleaning
+
+# ================= CONFIG =================
+CACHE_DIR = Path(".microbiome_cache/results")
+
+# Least recently used results are evicted beyond this many bytes on disk
+MAX_CACHE_BYTES = 1024 ** 3
+
+# Restored file bytes kept in memory (shared by all sessions of the server)
+MAX_MEMORY_BYTES = 256 * 1024 ** 2
+
+# Bump when a pipeline change alters its results; entries cached by older
+# code then stop matching (cleaning rule changes are picked up on their own)
+RESULTS_VERSION = 1
+# =========================================
+
+# path -> ((mtime, size), bytes), least recently used first
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+@functools.cache
+def code_version():
+    # Salt of every key, as the lineage cache is keyed by its rules version
+    return f"{RESULTS_VERSION}-{cleaning.cleaning_rules_version()}"
+
+
+def cache_key(content_hash, **params):
+    """
+    Key for one pipeline stage: the input content hash plus every
+    parameter that changes the stage output (stage name, TOP_N, DPI, ...),
+    salted with the code version.
+    """
+    payload = json.dumps(
+        {"content": content_hash, "code": code_version(), **params},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def entry_size(entry):
+    return sum(f.stat().st_size for f in entry.rglob("*") if f.is_file())
+
+
+def evict(max_bytes=MAX_CACHE_BYTES, cache_dir=CACHE_DIR):
+    # Oldest entries (by last store / hit) go first
+    if not cache_dir.exists():
+        return
+
+    entries = sorted(
+        (e for e in cache_dir.iterdir() if e.is_dir() and not e.name.startswith(".")),
+        key=lambda e: e.stat().st_mtime,
+        reverse=True
+    )
+
+    total = 0
+    for entry in entries:
+        total += entry_size(entry)
+        if total > max_bytes:
+            shutil.rmtree(entry, ignore_errors=True)
+
+
+def store(key, files, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """
+    Saves result files ({relative name: bytes}) under `key`.
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    entry = cache_dir / key
+
+    # Build the entry aside and move it in, so readers never see half of it
+    staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=cache_dir))
+    for name, data in files.items():
+        target = staging / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+
+    try:
+        os.replace(staging, entry)
+    except OSError:
+        # Another session stored the same result first
+        shutil.rmtree(staging, ignore_errors=True)
+
+    evict(max_bytes, cache_dir)
+
+
+def read_file(path, max_bytes=MAX_MEMORY_BYTES):
+    """
+    File bytes, served from memory while the file's mtime and size are
+    unchanged. Only a stat() hits the disk on repeated reads.
+    """
+    stat = path.stat()
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    with _memory_lock:
+        cached = _memory.get(path)
+        if cached is not None and cached[0] == signature:
+            _memory.move_to_end(path)
+            return cached[1]
+
+    data = path.read_bytes()
+
+    with _memory_lock:
+        _memory[path] = (signature, data)
+        total = sum(len(entry[1]) for entry in _memory.values())
+        while total > max_bytes and _memory:
+            _, (_, evicted) = _memory.popitem(last=False)
+            total -= len(evicted)
+
+    return data
+
+
+def restore(key, cache_dir=CACHE_DIR):
+    """
+    Returns the cached result files for `key` as {relative name: bytes},
+    or None on a cache miss.
+    """
+    entry = cache_dir / key
+    if not entry.is_dir():
+        return None
+
+    files = {}
+    try:
+        for cached in sorted(entry.rglob("*")):
+            if cached.is_file():
+                files[cached.relative_to(entry).as_posix()] = read_file(cached)
+        os.utime(entry)
+    except FileNotFoundError:
+        # Evicted by another session while reading
+        return None
+
+    return files
+
+
+def clear(cache_dir=CACHE_DIR):
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    with _memory_lock:
+        _memory.clear()
@@ -0,0 +1,236 @@
+import numpy as np
+import pandas as pd
+
+import normalization
+from taxonomy_rollup import TAX_LEVELS, build_lineage_index
+
+# ================= CONFIG =================
+# Rows per block when a sparse table is written out densely
+WRITE_CHUNK_ROWS = 10_000
+# =========================================
+
+# A sparse table is a dict with:
+#   - labels:  DataFrame of the text columns, one row per table row
+#   - samples: Index of sample names
+#   - dtypes:  Series of the sample column dtypes, restored on output
+#   - matrix:  CSR arrays {"shape", "indptr", "indices", "data"} holding
+#              only the nonzero counts (rows x samples); missing counts
+#              are kept as NaN entries so they are written back as empty
+
+
+def csr_from_dense(values):
+    # NaN != 0, so missing counts are stored along with the nonzero ones
+    present = values != 0
+
+    rows, cols = np.nonzero(present)
+    return {
+        "shape": values.shape,
+        "indptr": np.concatenate([[0], np.cumsum(present.sum(axis=1))]).astype(np.int64),
+        "indices": cols.astype(np.int64),
+        "data": values[rows, cols]
+    }
+
+
+def from_frame(df, label_columns):
+    """
+    Converts a DataFrame into a sparse table. Columns in `label_columns`
+    are kept as labels; every other column must hold numeric counts.
+    """
+    sample_cols = [c for c in df.columns if c not in label_columns]
+    counts = df[sample_cols]
+
+    if not all(
+        pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+        for dtype in counts.dtypes
+    ):
+        raise ValueError("Sparse tables need numeric sample columns")
+
+    return {
+        "labels": df[list(label_columns)].reset_index(drop=True),
+        "samples": pd.Index(sample_cols),
+        "dtypes": counts.dtypes,
+        "matrix": csr_from_dense(counts.to_numpy())
+    }
+
+
+def drop_missing(matrix):
+    # Same matrix without its NaN entries (sums skip them, as groupby().sum())
+    data = matrix["data"]
+    if data.dtype.kind != "f" or not np.isnan(data).any():
+        return matrix
+
+    keep = ~np.isnan(data)
+    counts = np.bincount(row_ids(matrix)[keep], minlength=matrix["shape"][0])
+    return {
+        "shape": matrix["shape"],
+        "indptr": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        "indices": matrix["indices"][keep],
+        "data": data[keep]
+    }
+
+
+def is_sparse(table):
+    return isinstance(table, dict) and "matrix" in table
+
+
+def concat(tables):
+    # Stacks tables with the same samples row-wise (e.g. streamed chunks)
+    matrices = [t["matrix"] for t in tables]
+    offsets = np.cumsum([0] + [len(m["data"]) for m in matrices[:-1]])
+
+    return {
+        "labels": pd.concat([t["labels"] for t in tables], ignore_index=True),
+        "samples": tables[0]["samples"],
+        "dtypes": pd.Series(
+            [np.result_type(*column) for column in zip(*(t["dtypes"] for t in tables))],
+            index=tables[0]["dtypes"].index
+        ),
+        "matrix": {
+            "shape": (sum(m["shape"][0] for m in matrices), matrices[0]["shape"][1]),
+            "indptr": np.concatenate(
+                [[0]] + [m["indptr"][1:] + o for m, o in zip(matrices, offsets)]
+            ).astype(np.int64),
+            "indices": np.concatenate([m["indices"] for m in matrices]),
+            "data": np.concatenate([m["data"] for m in matrices])
+        }
+    }
+
+
+def row_ids(matrix):
+    return np.repeat(
+        np.arange(matrix["shape"][0]), np.diff(matrix["indptr"])
+    )
+
+
+def row_totals(matrix):
+    return np.bincount(
+        row_ids(matrix), weights=matrix["data"], minlength=matrix["shape"][0]
+    )
+
+
+def column_totals(matrix, rows=None):
+    # Column sums, optionally over a boolean row mask only
+    indices, data = matrix["indices"], matrix["data"]
+    if rows is not None:
+        keep = rows[row_ids(matrix)]
+        indices, data = indices[keep], data[keep]
+    return np.bincount(indices, weights=data, minlength=matrix["shape"][1])
+
+
+def dense_rows(matrix, rows):
+    """
+    Densifies the selected rows only. Returns a float64 array
+    (len(rows) x samples).
+    """
+    out = np.zeros((len(rows), matrix["shape"][1]), dtype=np.float64)
+    indptr = matrix["indptr"]
+    for i, row in enumerate(rows):
+        start, stop = indptr[row], indptr[row + 1]
+        out[i, matrix["indices"][start:stop]] = matrix["data"][start:stop]
+    return out
+
+
+def group_sum(matrix, codes, n_groups):
+    """
+    Sums the rows of a CSR matrix into `n_groups` rows selected by `codes`
+    (rows with a negative code are dropped). Work and memory scale with
+    the number of nonzero entries, not with rows x samples.
+    """
+    n_samples = matrix["shape"][1]
+    groups = codes[row_ids(matrix)]
+    keep = groups >= 0
+
+    # One key per (group, sample) cell, in row-major order
+    keys = groups[keep] * n_samples + matrix["indices"][keep]
+    cells, inverse = np.unique(keys, return_inverse=True)
+    data = np.bincount(inverse, weights=matrix["data"][keep], minlength=len(cells))
+
+    counts = np.bincount(cells // n_samples, minlength=n_groups)
+    return {
+        "shape": (n_groups, n_samples),
+        "indptr": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        "indices": cells % n_samples,
+        "data": data
+    }
+
+
+def sum_dtypes(data, dtypes):
+    # Column dtypes of summed counts, as taxonomy_rollup.restore_dtype picks them
+    if all(dtype.kind in "iu" for dtype in dtypes):
+        return pd.Series(normalization.count_dtype(data), index=dtypes.index)
+    return dtypes
+
+
+def rollup_level_tables(table, levels=TAX_LEVELS):
+    """
+    Sparse counterpart of taxonomy_rollup.rollup_level_tables: rows are
+    summed into the deepest lineage nodes, and each higher level is derived
+    from the node sums of the level below. Returns a dict level -> sparse
+    table with one label column (the taxon name).
+    """
+    matrix = drop_missing(table["matrix"])
+    index = build_lineage_index(table["labels"], levels)
+
+    node_sums = group_sum(
+        matrix, index["row_nodes"], len(index["node_names"][levels[-1]])
+    )
+
+    level_tables = {}
+    for depth in range(len(levels) - 1, -1, -1):
+        level = levels[depth]
+        names = index["names"][level]
+
+        level_matrix = group_sum(node_sums, index["node_names"][level], len(names))
+        dtypes = sum_dtypes(level_matrix["data"], table["dtypes"])
+        level_matrix["data"] = level_matrix["data"].astype(np.result_type(*dtypes.unique()))
+        level_tables[level] = {
+            "labels": pd.DataFrame(index=names).reset_index(),
+            "samples": table["samples"],
+            "dtypes": dtypes,
+            "matrix": level_matrix
+        }
+
+        if depth > 0:
+            node_sums = group_sum(
+                node_sums,
+                index["parents"][level],
+                len(index["node_names"][levels[depth - 1]])
+            )
+
+    return {level: level_tables[level] for level in levels}
+
+
+def to_frame(table, start=0, stop=None):
+    """
+    Dense DataFrame (labels, then samples) of rows [start, stop), with
+    the sample columns in their own dtypes.
+    """
+    matrix = table["matrix"]
+    stop = matrix["shape"][0] if stop is None else min(stop, matrix["shape"][0])
+    indptr = matrix["indptr"]
+    first, last = indptr[start], indptr[stop]
+
+    values = np.zeros((stop - start, matrix["shape"][1]), dtype=matrix["data"].dtype)
+    rows = row_ids({"shape": (stop - start,), "indptr": indptr[start:stop + 1] - first})
+    values[rows, matrix["indices"][first:last]] = matrix["data"][first:last]
+
+    counts = pd.DataFrame(values, columns=table["samples"])
+    if (table["dtypes"] != values.dtype).any():
+        counts = (
+            counts.astype(table["dtypes"].iloc[0]) if table["dtypes"].nunique() == 1
+            else counts.astype(dict(zip(table["samples"], table["dtypes"])))
+        )
+
+    frame = table["labels"].iloc[start:stop].reset_index(drop=True)
+    return pd.concat([frame, counts], axis=1)
+
+
+def to_csv(table, path, chunk_rows=WRITE_CHUNK_ROWS):
+    # Densifies one block of rows at a time
+    n_rows = table["matrix"]["shape"][0]
+    for start in range(0, max(n_rows, 1), chunk_rows):
+        block = to_frame(table, start, start + chunk_rows)
+        block.to_csv(
+            path, index=False, mode="w" if start == 0 else "a", header=start == 0
+        )
+
@@ -0,0 +1,169 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# ================= CONFIG =================
+PREFIXES = ["d__", "p__", "c__", "o__", "f__", "g__", "s__"]
+
+# Lineage depth (1 = domain only ... 7 = species), shaped like the
+# bundled example report
+DEPTH_WEIGHTS = [44, 5, 27, 11, 52, 189, 196]
+
+# Children per node at each rank (domain, phylum, ...)
+BRANCHING = [2, 40, 6, 8, 10, 12, 15]
+ARCHAEA_SHARE = 0.05
+
+UNASSIGNED_SHARE = 0.006
+# Chance that a rank (class and below) is "uncultured"; the ranks below follow
+UNCULTURED_SHARE = 0.04
+# Chance that a rank repeats its parent's name (unresolved placements)
+REPEAT_PARENT_SHARE = 0.08
+
+# Samples each taxon is seen in: mostly one, like real reports
+PRESENCE_P = 0.7
+# Log-normal read counts (median ~35 reads)
+COUNT_MEAN_LOG = 3.5
+COUNT_SIGMA_LOG = 1.2
+
+CHUNK_ROWS = 10_000
+# =========================================
+
+SYLLABLES = [
+    "ba", "ci", "do", "fu", "ge", "la", "mi", "no", "pa", "ro", "sa", "te",
+    "vi", "xa", "zo", "bac", "cor", "myc", "spir", "thermo", "halo", "acti",
+    "strep", "lacto", "clos", "pseu", "rhodo", "nitro", "sulfo", "meth",
+    "geo", "chloro", "cyano", "flavo", "bacte", "proteo", "firmi", "plancto",
+    "verru", "acido"
+]
+RANK_SUFFIXES = ["", "ota", "ia", "ales", "aceae", "", ""]
+DOMAINS = ["Bacteria", "Archaea"]
+
+
+def node_name(depth, node_id):
+    # Deterministic pseudo-Latin name for a tree node
+    n = len(SYLLABLES)
+    stem = SYLLABLES[node_id % n] + SYLLABLES[(node_id // n) % n] + SYLLABLES[(node_id // n ** 2) % n]
+    if depth == 6:
+        return stem.lower()
+    return (stem + RANK_SUFFIXES[depth]).capitalize()
+
+
+def make_lineages(n_rows, rng):
+    """
+    Random lineage strings with d__ ... s__ prefixes, truncated depths,
+    "uncultured" placements, repeated parent names and a few
+    "Unassigned" rows.
+    """
+    weights = np.array(DEPTH_WEIGHTS, dtype=float)
+    depths = rng.choice(np.arange(1, 8), size=n_rows, p=weights / weights.sum())
+    domains = (rng.random(n_rows) < ARCHAEA_SHARE).astype(np.int64)
+
+    # Zipf-like child choice: a few large clades, a long tail
+    children = [
+        np.minimum(rng.zipf(1.6, n_rows) - 1, branching - 1)
+        for branching in BRANCHING[1:]
+    ]
+    uncultured = rng.random((n_rows, 7)) < UNCULTURED_SHARE
+    repeated = rng.random((n_rows, 7)) < REPEAT_PARENT_SHARE
+    unassigned = rng.random(n_rows) < UNASSIGNED_SHARE
+
+    lineages = []
+    for row in range(n_rows):
+        if unassigned[row]:
+            lineages.append("Unassigned")
+            continue
+
+        node_id = int(domains[row])
+        names = [DOMAINS[node_id]]
+        is_uncultured = False
+
+        for depth in range(1, depths[row]):
+            node_id = node_id * BRANCHING[depth] + int(children[depth - 1][row])
+            is_uncultured = is_uncultured or (depth >= 2 and uncultured[row, depth])
+
+            if is_uncultured:
+                name = "uncultured_bacterium" if depth == 6 else "uncultured"
+            elif depth == 6:
+                genus = names[-1] if not names[-1].startswith("uncultured") else "bacterium"
+                name = f"{genus}_{node_name(depth, node_id)}"
+            elif repeated[row, depth]:
+                name = names[-1]
+            else:
+                name = node_name(depth, node_id)
+            names.append(name)
+
+        lineages.append("; ".join(p + n for p, n in zip(PREFIXES, names)))
+
+    return lineages
+
+
+def make_counts(n_rows, n_samples, rng):
+    # Sparse counts: each taxon is present in a geometric number of samples
+    counts = np.zeros((n_rows, n_samples), dtype=np.int64)
+    presence = np.minimum(rng.geometric(PRESENCE_P, n_rows), n_samples)
+
+    rows = np.repeat(np.arange(n_rows), presence)
+    cols = np.concatenate([
+        rng.choice(n_samples, size=k, replace=False) for k in presence
+    ]) if n_rows else np.empty(0, dtype=np.int64)
+    values = np.ceil(rng.lognormal(COUNT_MEAN_LOG, COUNT_SIGMA_LOG, len(rows)))
+
+    counts[rows, cols] = values.astype(np.int64)
+    return counts
+
+
+def sample_names(n_samples):
+    return [f"S{i + 1:04d}" for i in range(n_samples)]
+
+
+def iter_report_chunks(n_taxa, n_samples, seed=0, chunk_rows=CHUNK_ROWS):
+    """
+    Yields the report as DataFrames of at most `chunk_rows` rows, so large
+    reports never have to be held in memory at once.
+    """
+    rng = np.random.default_rng(seed)
+    columns = sample_names(n_samples)
+
+    for start in range(0, n_taxa, chunk_rows):
+        n_rows = min(chunk_rows, n_taxa - start)
+        chunk = pd.DataFrame(make_counts(n_rows, n_samples, rng), columns=columns)
+        chunk.insert(0, "Taxon", make_lineages(n_rows, rng))
+        yield chunk
+
+
+def generate_report(n_taxa, n_samples, seed=0):
+    chunks = list(iter_report_chunks(n_taxa, n_samples, seed))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(
+        columns=["Taxon"] + sample_names(n_samples)
+    )
+
+
+def write_report(path, n_taxa, n_samples, seed=0):
+    """
+    Writes a tab-separated Kraken2-style report (same layout as
+    input_taxonomy.txt).
+    """
+    path = Path(path)
+    for i, chunk in enumerate(iter_report_chunks(n_taxa, n_samples, seed)):
+        chunk.to_csv(path, sep="\t", index=False, mode="w" if i == 0 else "a", header=i == 0)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic Kraken2-style taxonomy report."
+    )
+    parser.add_argument("--taxa", type=int, default=1000, help="rows (default: 1000)")
+    parser.add_argument("--samples", type=int, default=4, help="sample columns (default: 4)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", type=Path, default=Path("input_taxonomy.txt"))
+    args = parser.parse_args(argv)
+
+    write_report(args.output, args.taxa, args.samples, args.seed)
+    print(f"Wrote {args.taxa} taxa x {args.samples} samples to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import io
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import normalization
+
+# ================= CONFIG =================
+# Columnar on-disk format for cleaned and level tables. Numeric columns are
+# stored as one .npy block per dtype (memory-mapped on load); text columns
+# dictionary-encoded: each distinct name once, plus one integer code per row
+# (-1 = missing).
+META_FILE = "meta.json"
+# =========================================
+
+
+def split_table(df):
+    """
+    Splits a table into its label (text) columns and one 2-D array per
+    numeric dtype. Returns (meta, {array name: ndarray}).
+    """
+    meta = {"columns": [str(c) for c in df.columns], "labels": [], "blocks": []}
+    arrays = {}
+
+    numeric = {}
+    for col, dtype in df.dtypes.items():
+        if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            numeric.setdefault(np.dtype(dtype).str, []).append(str(col))
+        else:
+            meta["labels"].append(str(col))
+
+    for i, col in enumerate(meta["labels"]):
+        codes, names = pd.factorize(df[col])
+        arrays[f"label_{i}_names"] = np.asarray(names, dtype=object).astype(str)
+        arrays[f"label_{i}_codes"] = codes.astype(normalization.fitting_dtype(-1, len(names)))
+
+    for i, (dtype, cols) in enumerate(numeric.items()):
+        # Row-major (rows x columns) so a memory map reads as a DataFrame block
+        arrays[f"block_{i}"] = df[cols].to_numpy(dtype=dtype)
+        meta["blocks"].append({"dtype": dtype, "columns": cols})
+
+    return meta, arrays
+
+
+def label_values(arrays, i):
+    # Object array of label column i (None = missing)
+    if f"label_{i}_codes" in arrays:
+        codes = arrays[f"label_{i}_codes"]
+        names = np.append(arrays[f"label_{i}_names"].astype(object), None)
+        return names[codes]
+
+    # Stores written before dictionary encoding: one string per row
+    labels = arrays[f"label_{i}"].astype(object)
+    labels[arrays[f"label_{i}_missing"]] = None
+    return labels
+
+
+def join_table(meta, arrays):
+    """
+    Inverse of split_table.
+    """
+    # Numeric blocks are wrapped without copying (memory maps stay mapped)
+    frames = [
+        pd.DataFrame(arrays[f"block_{i}"], columns=block["columns"], copy=False)
+        for i, block in enumerate(meta["blocks"])
+    ]
+    n_rows = len(label_values(arrays, 0)) if meta["labels"] else 0
+    table = (
+        frames[0] if len(frames) == 1
+        else pd.concat(frames, axis=1) if frames
+        else pd.DataFrame(index=pd.RangeIndex(n_rows))
+    )
+
+    # Labels go back to their original positions (leading, as a rule)
+    positions = {col: i for i, col in enumerate(meta["columns"])}
+    for i, col in sorted(enumerate(meta["labels"]), key=lambda item: positions[item[1]]):
+        labels = label_values(arrays, i)
+        table.insert(min(positions[col], len(table.columns)), col, pd.Series(labels))
+
+    if list(table.columns) != meta["columns"]:
+        table = table[meta["columns"]]
+    return table
+
+
+def source_stamp(csv_path):
+    # Size and mtime of the CSV a binary copy was made from
+    stat = Path(csv_path).stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def save_table(df, path, source=None):
+    """
+    Writes a table as a directory of .npy arrays plus a JSON header.
+    The numeric blocks can be memory-mapped back without parsing.
+    `source` is the CSV the table was just written to; its stamp lets
+    read_table notice when the CSV is rewritten without this copy.
+    """
+    path = Path(path)
+    remove(path)
+    path.mkdir(parents=True)
+
+    meta, arrays = split_table(df)
+    if source is not None:
+        meta["source"] = source_stamp(source)
+    for name, values in arrays.items():
+        np.save(path / f"{name}.npy", values)
+    (path / META_FILE).write_text(json.dumps(meta))
+
+
+def load_table(path, mmap=True):
+    path = Path(path)
+    meta = json.loads((path / META_FILE).read_text())
+    mmap_mode = "r" if mmap else None
+
+    arrays = {
+        f.stem: np.load(f, mmap_mode=mmap_mode if f.stem.startswith("block_") else None)
+        for f in path.glob("*.npy")
+    }
+    return join_table(meta, arrays)
+
+
+def exists(path):
+    return (Path(path) / META_FILE).exists()
+
+
+def remove(path):
+    if Path(path).is_dir():
+        shutil.rmtree(path)
+
+
+def store_path(csv_path):
+    # A table's binary copy sits next to its CSV export: genus_table.csv -> genus_table/
+    return Path(csv_path).with_suffix("")
+
+
+def save_copy(df, csv_path):
+    # Binary copy of a table that was just written to csv_path
+    save_table(df, store_path(csv_path), source=csv_path)
+
+
+def is_current(csv_path):
+    """
+    True when the binary copy of csv_path was made from the CSV as it is
+    now (or there is no CSV). Copies without a stamp count as stale.
+    """
+    path = store_path(csv_path)
+    if not exists(path):
+        return False
+    if not Path(csv_path).exists():
+        return True
+    meta = json.loads((path / META_FILE).read_text())
+    return meta.get("source") == source_stamp(csv_path)
+
+
+def read_table(csv_path):
+    """
+    Loads a table from its binary copy when that copy is current, else
+    from the CSV.
+    """
+    if is_current(csv_path):
+        return load_table(store_path(csv_path))
+    return pd.read_csv(csv_path)
+
+
+def to_bytes(df):
+    # Single-blob form (uncompressed .npz) for caches and session state
+    meta, arrays = split_table(df)
+    buffer = io.BytesIO()
+    np.savez(buffer, meta=np.array(json.dumps(meta)), **arrays)
+    return buffer.getvalue()
+
+
+def from_bytes(data):
+    with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+        arrays = {name: npz[name] for name in npz.files}
+    meta = json.loads(str(arrays.pop("meta")))
+    return join_table(meta, arrays)
@@ -0,0 +1,158 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+import lineage_tree
+import normalization
+import perf_trace
+
+# ================= CONFIG =================
+# Query modes (case-insensitive)
+MODES = {
+    "substring": "Contains",
+    "prefix": "Starts with",
+    "regex": "Regular expression"
+}
+
+# Rows returned by a query, most abundant first
+MAX_RESULTS = 200
+# =========================================
+
+
+@perf_trace.timed()
+def build_index(tree):
+    """
+    Search index over the interned names of a lineage tree (every name of
+    every rank, once). Built once per dataset; queries only touch names
+    and the nodes that match.
+    """
+    names = tree["names"]
+    lower = np.strings.lower(names)
+    order = np.argsort(lower, kind="stable")
+
+    return {
+        "names": names.tolist(),
+        "lower": lower,
+        # Lower-cased names in sorted order, for prefix ranges
+        "sorted_lower": lower[order],
+        "sorted_codes": order,
+        # Total count of every node, to rank matches before summing samples
+        "node_totals": tree["abundance"].sum(axis=1, dtype=np.float64)
+    }
+
+
+def match_names(index, query, mode="substring"):
+    # Codes (positions in tree["names"]) of the names matching a query
+    if mode == "prefix":
+        prefix = query.lower()
+        sorted_lower = index["sorted_lower"]
+        first = np.searchsorted(sorted_lower, prefix, side="left")
+        last = np.searchsorted(sorted_lower, prefix + "\U0010ffff", side="left")
+        return np.sort(index["sorted_codes"][first:last])
+
+    if mode == "substring":
+        return np.flatnonzero(np.strings.find(index["lower"], query.lower()) >= 0)
+
+    if mode == "regex":
+        try:
+            pattern = re.compile(query, re.IGNORECASE)
+        except re.error as error:
+            raise ValueError(f"Invalid regular expression: {error}") from error
+        return np.array(
+            [code for code, name in enumerate(index["names"]) if pattern.search(name)],
+            dtype=np.int64
+        )
+
+    raise ValueError(f"Unknown search mode: {mode}")
+
+
+@perf_trace.timed()
+def search(tree, index, query, mode="substring", max_results=MAX_RESULTS):
+    """
+    Per-sample abundance of every taxon matching a query, one row per
+    (rank, name) with its subtree counts summed over every lineage that
+    holds it. Returns the `max_results` most abundant matches.
+    """
+    codes = match_names(index, query, mode)
+    n_names = len(index["names"])
+
+    hit = np.zeros(n_names + 1, dtype=bool)
+    hit[codes] = True
+    node_name = tree["node_name"].astype(np.int64)
+    nodes = np.flatnonzero(hit[np.where(node_name >= 0, node_name, n_names)])
+
+    # Rank (rank, name) groups by total first; only the kept ones are summed per sample
+    groups, group_keys = pd.factorize(tree["node_level"][nodes].astype(np.int64) * n_names + node_name[nodes])
+    totals = np.bincount(groups, weights=index["node_totals"][nodes], minlength=len(group_keys))
+    top = np.argsort(-totals, kind="stable")[:max_results]
+
+    rank = np.full(len(group_keys), -1, dtype=np.int64)
+    rank[top] = np.arange(len(top))
+    keep = rank[groups] >= 0
+    counts = np.zeros((len(top), len(tree["samples"])), dtype=np.float64)
+    np.add.at(counts, rank[groups[keep]], tree["abundance"][nodes[keep]])
+
+    keys = group_keys[top]
+    totals = totals[top]
+    result = pd.DataFrame(counts, columns=tree["samples"])
+    if tree["abundance"].dtype.kind in "iu":
+        result = result.astype(normalization.count_dtype(counts))
+        totals = totals.astype(np.int64)
+
+    result.insert(0, "Rank", [tree["levels"][key // n_names] for key in keys])
+    result.insert(1, "Taxon", [index["names"][key % n_names] for key in keys])
+    result.insert(2, "Prevalence (%)", (counts > 0).mean(axis=1) * 100 if counts.size else 0.0)
+    result.insert(3, "Total", totals)
+    return result
+
+
+def excluded_nodes(tree, exclude):
+    # Nodes named in `exclude` and everything below them
+    names = tree["names"]
+    exclude = list(exclude)
+    codes = [
+        code for code, name in zip(np.searchsorted(names, exclude), exclude)
+        if code < len(names) and names[code] == name
+    ]
+
+    excluded = np.isin(tree["node_name"], codes)
+    level_start = tree["level_start"]
+    for depth in range(1, len(tree["levels"])):
+        nodes = np.arange(level_start[depth], level_start[depth + 1])
+        excluded[nodes] |= excluded[tree["parent"][nodes]]
+    return excluded
+
+
+@perf_trace.timed()
+def filter_level_tables(tree, exclude=(), min_prevalence=0.0):
+    """
+    Level tables (shaped like process_taxonomy's) without the excluded
+    taxa and their subtrees; at each level, taxa present in fewer than
+    `min_prevalence` (0-1) of the samples are dropped.
+    The deepest nodes partition the input rows, so every level is summed
+    from the kept deepest nodes grouped by their ancestor at that level.
+    """
+    levels = tree["levels"]
+    leaves = lineage_tree.level_nodes(tree, levels[-1])
+    leaves = leaves[~excluded_nodes(tree, exclude)[leaves]]
+    values = tree["abundance"][leaves]
+
+    level_tables = {}
+    ancestors = leaves
+    for depth in range(len(levels) - 1, -1, -1):
+        level = levels[depth]
+        codes = tree["node_name"][ancestors].astype(np.int64)
+
+        named = codes >= 0
+        table = pd.DataFrame(values[named], columns=tree["samples"]) \
+            .groupby(codes[named], sort=True).sum()
+        table.index = pd.Index(tree["names"][table.index].astype(object), name=level)
+
+        if min_prevalence > 0 and len(table.columns):
+            table = table[(table > 0).mean(axis=1) >= min_prevalence]
+
+        level_tables[level] = normalization.downcast_counts(table).reset_index()
+        ancestors = tree["parent"][ancestors]
+
+    return {level: level_tables[level] for level in levels}
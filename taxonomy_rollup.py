@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+import normalization
+
+# ================= CONFIG =================
+TAX_LEVELS = ["Domain", "Phylum", "Class", "Order", "Family", "Genus", "Species"]
+# =========================================
+
+
+def scatter_sum(codes, values, size):
+    """
+    Sums the columns of a samples x items matrix into `size` accumulators
+    selected by `codes`. Items with a negative code are dropped.
+    Returns a float64 samples x size matrix.
+    """
+    keep = codes >= 0
+    if not keep.all():
+        codes, values = codes[keep], values[:, keep]
+
+    out = np.empty((values.shape[0], size), dtype=np.float64)
+    for i, sample_values in enumerate(values):
+        out[i] = np.bincount(codes, weights=sample_values, minlength=size)
+    return out
+
+
+def build_lineage_index(df, levels=TAX_LEVELS):
+    """
+    Factorizes each rank of a cleaned table once and links the ranks into
+    a lineage tree. A node at a level is one distinct lineage prefix down
+    to that level.
+
+    Returns a dict with:
+      - names:      level -> sorted unique names
+      - node_names: level -> name code of every node (-1 = no name)
+      - parents:    level -> parent node of every node in the level above
+      - row_nodes:  deepest-level node of every input row
+    """
+    index = {"levels": list(levels), "names": {}, "node_names": {}, "parents": {}}
+    row_nodes = np.zeros(len(df), dtype=np.int64)
+
+    for depth, level in enumerate(levels):
+        name_codes, names = pd.factorize(df[level], sort=True)
+        index["names"][level] = pd.Index(names, name=level)
+
+        # Extend each row's path by one rank and number the distinct paths
+        parent_nodes = row_nodes
+        path_keys = parent_nodes * (len(names) + 1) + (name_codes + 1)
+        row_nodes, path_ids = pd.factorize(path_keys)
+        n_nodes = len(path_ids)
+
+        node_names = np.empty(n_nodes, dtype=np.int64)
+        node_names[row_nodes] = name_codes
+        index["node_names"][level] = node_names
+
+        if depth > 0:
+            parents = np.empty(n_nodes, dtype=np.int64)
+            parents[row_nodes] = parent_nodes
+            index["parents"][level] = parents
+
+    index["row_nodes"] = row_nodes
+    return index
+
+
+def iter_node_sums(index, values):
+    """
+    Yields (level, node sums) from the deepest level up: rows are
+    scattered into the deepest nodes, and each higher level is derived
+    from the node sums of the level below. `values` is a samples x rows
+    matrix; node sums are samples x nodes.
+    """
+    levels = index["levels"]
+    node_sums = scatter_sum(
+        index["row_nodes"],
+        values,
+        len(index["node_names"][levels[-1]])
+    )
+
+    for depth in range(len(levels) - 1, -1, -1):
+        level = levels[depth]
+        yield level, node_sums
+
+        if depth > 0:
+            node_sums = scatter_sum(
+                index["parents"][level],
+                node_sums,
+                len(index["node_names"][levels[depth - 1]])
+            )
+
+
+def rollup_level_sums(index, values):
+    """
+    Computes the per-name sums of every level with one pass over the
+    sample matrix. Returns a dict level -> array (samples x names).
+    """
+    level_sums = {
+        level: scatter_sum(index["node_names"][level], node_sums, len(index["names"][level]))
+        for level, node_sums in iter_node_sums(index, values)
+    }
+    return {level: level_sums[level] for level in index["levels"]}
+
+
+def sample_matrix(df, levels=TAX_LEVELS):
+    """
+    Returns (sample columns, samples x rows matrix) of a cleaned table,
+    with missing counts as zero (they add nothing, as in groupby().sum()).
+    """
+    samples = df[[c for c in df.columns if c not in levels]]
+
+    # Samples-major layout so every sample is one contiguous vector
+    values = np.ascontiguousarray(samples.to_numpy().T)
+    if values.dtype.kind == "f" and np.isnan(values).any():
+        values = np.nan_to_num(values)
+
+    return samples, values
+
+
+def restore_dtype(sums, dtypes):
+    """
+    Sums (samples x items) as an items x samples array or column dict:
+    integer counts get the smallest integer type that fits the sums;
+    other input dtypes are restored (one block when they all agree).
+    """
+    if all(dtype.kind in "iu" for dtype in dtypes):
+        return sums.T.astype(normalization.count_dtype(sums))
+    if dtypes.nunique() == 1:
+        return sums.T.astype(dtypes.iloc[0])
+    return {
+        col: sums[i].astype(dtype)
+        for i, (col, dtype) in enumerate(dtypes.items())
+    }
+
+
+def rollup_level_tables(df, levels=TAX_LEVELS):
+    """
+    Same result as df.groupby(level)[sample_cols].sum() for every level,
+    computed in a single pass. Returns a dict level -> DataFrame indexed
+    by taxon name.
+    """
+    samples, values = sample_matrix(df, levels)
+
+    index = build_lineage_index(df, levels)
+    level_sums = rollup_level_sums(index, values)
+
+    level_tables = {}
+    for level in levels:
+        level_tables[level] = pd.DataFrame(
+            restore_dtype(level_sums[level], samples.dtypes),
+            index=index["names"][level],
+            columns=samples.columns
+        )
+
+    return level_tables
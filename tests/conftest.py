@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The pipeline modules live at the repository root
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SAMPLE_INPUT = ROOT / "sample_input_example" / "input_taxonomy.txt"
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # The pipeline writes its outputs to the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def write_input(path, nan_columns=(), fraction_columns=()):
+    # Sample input with one missing (or fractional) count per listed
+    # column, in a late chunk
+    df = pd.read_csv(SAMPLE_INPUT, sep="\t")
+    for col in nan_columns:
+        df[col] = df[col].astype(float)
+        df.loc[len(df) - 5, col] = np.nan
+    for col in fraction_columns:
+        df[col] = df[col].astype(float)
+        df.loc[len(df) - 5, col] = 0.5
+    df.to_csv(path, sep="\t", index=False)
+    return path
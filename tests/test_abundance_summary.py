@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import abundance_summary
+import sparse_abundance
+from conftest import ROOT
+
+GOLDEN = ROOT / "tests" / "golden"
+
+
+@pytest.fixture(scope="module")
+def genus_table():
+    return pd.read_csv(GOLDEN / "genus_table.csv")
+
+
+def brute_force_summary(df, top_n):
+    # Top N by total, the rest pooled as Others, then % of each sample
+    counts = df.set_index("Genus")
+    totals = counts.sum(axis=1).sort_values(ascending=False, kind="stable")
+    top = counts.loc[totals.index[:top_n]]
+    top.loc["Others"] = counts.loc[totals.index[top_n:]].sum()
+    return top / counts.sum() * 100
+
+
+def test_summary_matches_brute_force(genus_table):
+    summary = abundance_summary.summarize_level(genus_table, "Genus", top_n=10)
+
+    expected = brute_force_summary(genus_table, 10)
+    assert list(summary.columns) == ["Genus", "Total", "Legend", *genus_table.columns[1:]]
+    assert summary["Genus"].tolist() == list(expected.index)
+    np.testing.assert_allclose(summary[genus_table.columns[1:]].to_numpy(), expected.to_numpy(), rtol=1e-6)
+    assert summary["Total"].sum() == genus_table.iloc[:, 1:].to_numpy().sum()
+
+    share = summary["Total"].iloc[0] / summary["Total"].sum() * 100
+    assert summary["Legend"].iloc[0] == f"{summary['Genus'].iloc[0]} ({share:.1f}%)"
+
+
+def test_sparse_summary_matches_dense(genus_table):
+    table = sparse_abundance.from_frame(genus_table, ["Genus"])
+
+    pd.testing.assert_frame_equal(
+        abundance_summary.summarize_level(table, "Genus", top_n=10),
+        abundance_summary.summarize_level(genus_table, "Genus", top_n=10)
+    )
+
+
+def test_fewer_taxa_than_top_n_leave_others_empty():
+    df = pd.DataFrame({"Phylum": ["a", "b"], "S1": [1, 3], "S2": [2, 2]})
+
+    summary = abundance_summary.summarize_level(df, "Phylum", top_n=10)
+
+    assert summary["Phylum"].tolist() == ["b", "a", "Others"]
+    np.testing.assert_allclose(summary["S1"], [75, 25, 0])
+    assert summary["Total"].iloc[-1] == 0
+
+
+def test_every_style_reuses_one_summary(genus_table):
+    summaries = abundance_summary.summarize_tables({"Genus": genus_table}, top_n=5)
+
+    summary = summaries["Genus"]
+    assert abundance_summary.ensure_summary(summary, "Genus", 5) is summary
+    assert list(abundance_summary.sample_columns(summary)) == list(genus_table.columns[1:])
@@ -0,0 +1,31 @@
+import gzip
+
+import batch_process_reports
+from conftest import SAMPLE_INPUT
+
+KRAKEN_REPORT = (
+    "100.00\t10\t0\tR\t1\troot\n"
+    "100.00\t10\t0\tD\t2\t  Bacteria\n"
+    "100.00\t10\t10\tG\t561\t    Escherichia\n"
+)
+
+
+def test_compressed_reports_are_named_without_their_suffixes(tmp_path):
+    with gzip.open(tmp_path / "b.kreport.gz", "wt") as f:
+        f.write(KRAKEN_REPORT)
+
+    reports = batch_process_reports.clean_reports([tmp_path / "b.kreport.gz"], workers=1)
+
+    assert [name for name, _ in reports] == ["b"]
+    assert list(reports[0][1].columns) == ["b"]
+
+
+def test_compressed_copy_of_a_report_is_skipped(tmp_path):
+    plain = tmp_path / "a.txt"
+    plain.write_bytes(SAMPLE_INPUT.read_bytes())
+    with gzip.open(tmp_path / "a_copy.txt.gz", "wb") as f:
+        f.write(plain.read_bytes())
+
+    paths = batch_process_reports.find_reports([str(tmp_path)])
+
+    assert batch_process_reports.skip_duplicate_content(paths) == [plain]
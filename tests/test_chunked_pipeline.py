@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+import clean_input_microbiome_taxonomy as cleaning
+from conftest import write_input
+
+
+@pytest.mark.parametrize("nan_columns", [[], ["CD2"], ["AB1", "CD2", "EF3", "GH4"]])
+def test_chunked_level_tables_match_in_memory(workdir, nan_columns):
+    input_file = write_input(workdir / "input.txt", nan_columns)
+
+    _, in_memory = cleaning.process_taxonomy(cleaning.read_taxonomy(input_file), cache_file=None)
+    streamed = cleaning.stream_level_tables(input_file, chunksize=50)
+
+    for level in cleaning.TAX_LEVELS:
+        pd.testing.assert_frame_equal(streamed[level], in_memory[level].set_index(level))
+
+
+@pytest.mark.parametrize("columns", [{"nan_columns": ["CD2"]}, {"fraction_columns": ["CD2"]}])
+def test_chunked_cleaned_csv_matches_in_memory(workdir, monkeypatch, columns):
+    # The float value sits in the last chunk; earlier chunks read CD2 as int
+    input_file = write_input(workdir / "input.txt", **columns)
+    monkeypatch.setattr(cleaning, "LINEAGE_CACHE_FILE", None)
+
+    cleaning.main(input_file=input_file)
+    in_memory = (workdir / cleaning.OUTPUT_CLEANED).read_text()
+    cleaning.main(chunksize=50, input_file=input_file)
+
+    assert (workdir / cleaning.OUTPUT_CLEANED).read_text() == in_memory
+    counts = pd.read_csv(workdir / cleaning.OUTPUT_CLEANED, dtype=str)
+    assert counts["CD2"].dropna().str.contains(".", regex=False).all()
+    assert not counts["AB1"].str.contains(".", regex=False).any()
@@ -0,0 +1,61 @@
+import gzip
+import shutil
+
+import pandas as pd
+import pytest
+
+import clean_input_microbiome_taxonomy as cleaning
+from conftest import ROOT, SAMPLE_INPUT
+
+GOLDEN = ROOT / "tests" / "golden"
+OUTPUTS = [cleaning.OUTPUT_CLEANED] + [f"{level.lower()}_table.csv" for level in cleaning.TAX_LEVELS]
+
+
+def assert_golden(workdir):
+    for name in OUTPUTS:
+        assert (workdir / name).read_text() == (GOLDEN / name).read_text(), name
+
+
+@pytest.mark.parametrize("options", [{}, {"chunksize": 50}, {"sparse": True}, {"sparse": True, "chunksize": 50}])
+def test_main_matches_golden_outputs(workdir, monkeypatch, options):
+    monkeypatch.setattr(cleaning, "LINEAGE_CACHE_FILE", None)
+    shutil.copy(SAMPLE_INPUT, workdir / cleaning.INPUT_FILE)
+
+    cleaning.main(**options)
+
+    assert_golden(workdir)
+
+
+def test_lineage_cache_gives_same_outputs(workdir, monkeypatch):
+    monkeypatch.setattr(cleaning, "LINEAGE_CACHE_FILE", workdir / "lineages.sqlite")
+    shutil.copy(SAMPLE_INPUT, workdir / cleaning.INPUT_FILE)
+
+    # First run fills the cache, the second one reads every lineage from it
+    cleaning.main()
+    cleaning.main()
+
+    assert_golden(workdir)
+
+
+def test_compressed_input_matches_golden_outputs(workdir, monkeypatch):
+    monkeypatch.setattr(cleaning, "LINEAGE_CACHE_FILE", None)
+    with gzip.open(workdir / f"{cleaning.INPUT_FILE}.gz", "wb") as f:
+        f.write(SAMPLE_INPUT.read_bytes())
+
+    cleaning.main()
+
+    assert_golden(workdir)
+
+
+def test_process_taxonomy_matches_golden_level_tables():
+    cleaned, level_tables = cleaning.process_taxonomy(cleaning.read_taxonomy(SAMPLE_INPUT), cache_file=None)
+
+    pd.testing.assert_frame_equal(
+        cleaned.reset_index(drop=True),
+        pd.read_csv(GOLDEN / cleaning.OUTPUT_CLEANED),
+        check_dtype=False
+    )
+    for level, level_df in level_tables.items():
+        pd.testing.assert_frame_equal(
+            level_df, pd.read_csv(GOLDEN / f"{level.lower()}_table.csv"), check_dtype=False
+        )
@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+import clean_input_microbiome_taxonomy as cleaning
+import cohort
+from conftest import SAMPLE_INPUT
+
+
+def table(*samples):
+    return pd.DataFrame({sample: [1] for sample in samples})
+
+
+def test_distinct_names_are_kept(recwarn):
+    renamed = cohort.unique_sample_names([("r1", table("A")), ("r2", table("B"))])
+
+    assert [list(t.columns) for t in renamed] == [["A"], ["B"]]
+    assert not recwarn.list
+
+
+def test_clashing_names_get_report_prefix_and_suffix():
+    reports = [("run", table("S1")), ("run", table("S1")), ("run", table("S1"))]
+
+    with pytest.warns(UserWarning, match="renamed"):
+        renamed = cohort.unique_sample_names(reports)
+
+    assert [list(t.columns) for t in renamed] == [["S1"], ["run_S1"], ["run_S1_2"]]
+
+
+def test_report_named_after_its_sample_gets_suffix():
+    with pytest.warns(UserWarning):
+        renamed = cohort.unique_sample_names([("S1", table("S1")), ("S1", table("S1"))])
+
+    assert list(renamed[1].columns) == ["S1_2"]
+
+
+def test_names_taken_by_an_existing_cohort():
+    with pytest.warns(UserWarning):
+        renamed = cohort.unique_sample_names([("new", table("A", "B"))], taken={"A", "new_A"})
+
+    assert list(renamed[0].columns) == ["new_A_2", "B"]
+
+
+def split_samples(cleaned, groups):
+    # One collapsed table per report, holding only its own samples
+    collapsed = cohort.collapse_lineages(cleaned)
+    return [(name, collapsed[samples]) for name, samples in groups.items()]
+
+
+def test_build_cohort_of_split_report_matches_whole_report():
+    cleaned = cleaning.clean_taxonomy_table(cleaning.read_taxonomy(SAMPLE_INPUT), cache_file=None)
+    samples = [c for c in cleaned.columns if c not in cohort.TAX_LEVELS]
+
+    cohort_df, level_tables = cohort.build_cohort(
+        split_samples(cleaned, {"r1": samples[:1], "r2": samples[1:]})
+    )
+
+    expected = cohort.collapse_lineages(cleaned)
+    pd.testing.assert_frame_equal(
+        cohort.collapse_lineages(cohort_df), expected, check_dtype=False
+    )
+    for level in cohort.TAX_LEVELS:
+        pd.testing.assert_frame_equal(
+            level_tables[level],
+            cleaned.groupby(level)[samples].sum().reset_index(),
+            check_dtype=False
+        )
+
+
+def test_lineages_missing_from_a_report_count_as_zero():
+    index = pd.MultiIndex.from_tuples(
+        [("Bacteria",) * 6 + ("a",), ("Bacteria",) * 6 + ("b",)], names=cohort.TAX_LEVELS
+    )
+    first = pd.DataFrame({"A": [3, 0]}, index=index).iloc[:1]
+    second = pd.DataFrame({"B": [0, 5]}, index=index).iloc[1:]
+
+    merged = cohort.merge_lineage_tables([first, second])
+
+    assert merged.to_numpy().tolist() == [[3, 0], [0, 5]]
+    assert merged["A"].dtype.kind in "iu"
@@ -0,0 +1,88 @@
+import pandas as pd
+import pytest
+
+import clean_input_microbiome_taxonomy as cleaning
+import cohort
+import cohort_store
+import generate_all_abundance_plots
+from conftest import SAMPLE_INPUT
+
+
+@pytest.fixture(scope="module")
+def reports():
+    # The sample input split into two reports of two samples each
+    collapsed = cohort.collapse_lineages(
+        cleaning.clean_taxonomy_table(cleaning.read_taxonomy(SAMPLE_INPUT))
+    )
+    return [("r1", "hash1", collapsed[["AB1", "CD2"]]), ("r2", "hash2", collapsed[["EF3", "GH4"]])]
+
+
+def sorted_table(df, key):
+    return df.sort_values(key, ignore_index=True)
+
+
+def test_appended_parts_match_one_cohort(tmp_path, reports):
+    for report in reports:
+        cohort_store.append_reports([report], tmp_path)
+
+    cleaned, level_tables = cohort.build_cohort([(name, table) for name, _, table in reports])
+
+    for level in cohort_store.TAX_LEVELS:
+        pd.testing.assert_frame_equal(
+            sorted_table(cohort_store.load_level_table(level, tmp_path), level),
+            sorted_table(level_tables[level], level),
+            check_dtype=False
+        )
+    pd.testing.assert_frame_equal(
+        cohort.collapse_lineages(cohort_store.load_cleaned(tmp_path)),
+        cohort.collapse_lineages(cleaned),
+        check_dtype=False
+    )
+
+
+def test_append_only_writes_a_new_part(tmp_path, reports):
+    cohort_store.append_reports(reports[:1], tmp_path)
+    first_part = {
+        path: path.read_bytes() for path in (tmp_path / cohort_store.PART_DIR).rglob("*") if path.is_file()
+    }
+
+    stale = cohort_store.append_reports(reports[1:], tmp_path)
+
+    assert all(path.read_bytes() == data for path, data in first_part.items())
+    manifest = cohort_store.load_manifest(tmp_path)
+    assert [part["name"] for part in manifest["parts"]] == ["part-0001", "part-0002"]
+    assert cohort_store.known_reports(manifest) == {"hash1", "hash2"}
+    assert cohort_store.cohort_samples(manifest) == ["AB1", "CD2", "EF3", "GH4"]
+    assert stale == cohort_store.TAX_LEVELS
+
+
+def test_samples_already_in_the_store_are_renamed(tmp_path, reports):
+    cohort_store.append_reports(reports[:1], tmp_path)
+
+    with pytest.warns(UserWarning):
+        cohort_store.append_reports([("r3", "hash3", reports[0][2])], tmp_path)
+
+    manifest = cohort_store.load_manifest(tmp_path)
+    assert cohort_store.cohort_samples(manifest) == ["AB1", "CD2", "r3_AB1", "r3_CD2"]
+
+
+def test_refresh_plots_renders_stale_levels_once(tmp_path, monkeypatch, reports):
+    monkeypatch.setattr(generate_all_abundance_plots, "DPI", 20)
+    cohort_store.append_reports(reports, tmp_path)
+
+    written = cohort_store.refresh_plots([generate_all_abundance_plots], tmp_path, workers=1)
+
+    assert len(written) == len(cohort_store.TAX_LEVELS)
+    assert all(png.startswith(b"\x89PNG") for png in written.values())
+    assert cohort_store.load_manifest(tmp_path)["stale"] == []
+    assert cohort_store.refresh_plots([generate_all_abundance_plots], tmp_path, workers=1) == {}
+
+
+def test_export_writes_the_full_cohort(tmp_path, reports):
+    cohort_store.append_reports(reports, tmp_path / "store")
+
+    cohort_store.export_tables(tmp_path / "out", tmp_path / "store")
+
+    genus = pd.read_csv(tmp_path / "out" / "tables" / "genus_table.csv")
+    assert list(genus.columns) == ["Genus", "AB1", "CD2", "EF3", "GH4"]
+    assert (tmp_path / "out" / cleaning.OUTPUT_CLEANED).exists()
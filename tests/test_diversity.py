@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import diversity
+
+
+def level_table(counts):
+    # Level table layout: taxon names, then one column per sample
+    table = pd.DataFrame(counts, index=[f"taxon_{i}" for i in range(len(next(iter(counts.values()))))])
+    return table.rename_axis("Genus").reset_index()
+
+
+def test_alpha_diversity_of_even_samples():
+    alpha = diversity.alpha_diversity(level_table({"A": [1, 1, 0], "B": [5, 0, 0]}))
+
+    assert alpha.loc["A", "Observed richness"] == 2
+    assert alpha.loc["A", "Shannon"] == pytest.approx(np.log(2))
+    assert alpha.loc["A", "Simpson"] == pytest.approx(0.5)
+    assert alpha.loc["B", "Shannon"] == pytest.approx(0)
+    assert alpha.loc["B", "Simpson"] == pytest.approx(0)
+
+
+def brute_force_bray_curtis(matrix):
+    n = len(matrix)
+    out = np.zeros((n, n))
+    for i in range(n):
+        for j in range(n):
+            total = matrix[i].sum() + matrix[j].sum()
+            out[i, j] = 1 - 2 * np.minimum(matrix[i], matrix[j]).sum() / total
+    return out
+
+
+def brute_force_jaccard(matrix):
+    present = matrix > 0
+    n = len(matrix)
+    out = np.zeros((n, n))
+    for i in range(n):
+        for j in range(n):
+            out[i, j] = 1 - (present[i] & present[j]).sum() / (present[i] | present[j]).sum()
+    return out
+
+
+@pytest.mark.parametrize("metric, brute_force", [
+    ("Bray-Curtis", brute_force_bray_curtis),
+    ("Jaccard", brute_force_jaccard)
+])
+def test_beta_diversity_matches_brute_force(metric, brute_force):
+    rng = np.random.default_rng(1)
+    counts = rng.integers(0, 20, size=(30, 6)) * (rng.random((30, 6)) < 0.5)
+    table = level_table({f"S{i}": counts[:, i] for i in range(6)})
+
+    distances = diversity.beta_diversity(table, metric)
+
+    np.testing.assert_allclose(distances.to_numpy(), brute_force(counts.T.astype(float)), atol=1e-6)
+    assert list(distances.index) == [f"S{i}" for i in range(6)]
+
+
+def test_bray_curtis_bounds():
+    table = level_table({"A": [3, 0], "B": [3, 0], "C": [0, 4]})
+
+    distances = diversity.beta_diversity(table, "Bray-Curtis")
+
+    assert distances.loc["A", "B"] == pytest.approx(0)
+    assert distances.loc["A", "C"] == pytest.approx(1)
+
+
+def test_pcoa_of_euclidean_points_keeps_distances():
+    points = np.random.default_rng(2).normal(size=(8, 2))
+    distances = np.linalg.norm(points[:, None] - points[None], axis=-1)
+
+    coordinates, explained = diversity.pcoa(distances)
+
+    recovered = coordinates.to_numpy()
+    np.testing.assert_allclose(
+        np.linalg.norm(recovered[:, None] - recovered[None], axis=-1), distances, atol=1e-8
+    )
+    assert sum(explained) == pytest.approx(1)
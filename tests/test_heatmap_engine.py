@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+import heatmap_engine
+import render_executor
+
+
+def brute_force_condensed(matrix):
+    n = len(matrix)
+    return np.array([
+        np.linalg.norm(matrix[i] - matrix[j]) for i in range(n) for j in range(i + 1, n)
+    ])
+
+
+@pytest.mark.parametrize("block_rows", [512, 3])
+def test_condensed_distances_match_brute_force(monkeypatch, block_rows):
+    monkeypatch.setattr(heatmap_engine, "DISTANCE_BLOCK_ROWS", block_rows)
+    matrix = np.random.default_rng(0).random((10, 4))
+
+    np.testing.assert_allclose(
+        heatmap_engine.condensed_distances(matrix), brute_force_condensed(matrix), atol=1e-12
+    )
+
+
+def test_clustering_keeps_separated_groups_together():
+    rng = np.random.default_rng(1)
+    centres = np.array([[0, 0], [100, 0], [0, 100]])
+    groups = np.repeat(np.arange(3), 5)
+    shuffled = rng.permutation(len(groups))
+    points = centres[groups[shuffled]] + rng.random((len(groups), 2))
+
+    order = heatmap_engine.cluster_order(points)
+
+    assert sorted(order) == list(range(len(points)))
+    runs = groups[shuffled][order]
+    assert (np.diff(runs) != 0).sum() == 2
+
+
+@pytest.mark.parametrize("n", [0, 1, 2])
+def test_clustering_of_tiny_matrices(n):
+    assert list(heatmap_engine.cluster_order(np.ones((n, 3)))) == list(range(n))
+
+
+def test_bin_columns_averages_adjacent_columns():
+    matrix = np.arange(10, dtype=float).reshape(2, 5)
+
+    binned, labels, width = heatmap_engine.bin_columns(matrix, list("abcde"), 3)
+
+    assert width == 2
+    np.testing.assert_allclose(binned, [[0.5, 2.5, 4], [5.5, 7.5, 9]])
+    assert labels == ["a – b", "c – d", "e"]
+
+
+def test_bin_columns_keeps_narrow_matrices():
+    matrix = np.ones((2, 3))
+
+    binned, labels, width = heatmap_engine.bin_columns(matrix, list("abc"), 3)
+
+    assert binned is matrix and labels == list("abc") and width == 1
+
+
+@pytest.mark.parametrize("n_cols, ticks", [(5, 5), (heatmap_engine.MAX_TICK_LABELS + 1, 0)])
+def test_heatmap_is_one_image(n_cols, ticks):
+    fig = render_executor.new_figure((6, 4))
+    ax = fig.subplots()
+    matrix = np.random.default_rng(2).random((4, n_cols))
+
+    image = heatmap_engine.draw_heatmap(fig, ax, matrix, list("wxyz"), [f"S{i}" for i in range(n_cols)])
+
+    assert list(ax.images) == [image]
+    assert not ax.patches
+    assert len(ax.get_xticks()) == ticks
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+import job_queue
+
+
+@pytest.fixture(autouse=True)
+def no_jobs():
+    job_queue._jobs.clear()
+    yield
+    job_queue._jobs.clear()
+
+
+def wait(job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while job_queue.is_active(job_queue.status(job_id)):
+        assert time.monotonic() < deadline, "job did not finish"
+        time.sleep(0.01)
+    return job_queue.status(job_id)
+
+
+def test_job_reports_progress_partials_and_result():
+    release = threading.Event()
+
+    def work(x, report):
+        report(1, 2, "half way", partial={"first": x})
+        release.wait(5)
+        return x * 2
+
+    job_id = job_queue.submit("double", work, 21, label="Doubling")
+
+    deadline = time.monotonic() + 5
+    while job_queue.status(job_id)["done"] < 1:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    running = job_queue.status(job_id)
+    assert running["status"] == "running"
+    assert running["partial"] == {"first": 21}
+    assert job_queue.progress(running) == 0.5
+
+    release.set()
+    job = wait(job_id)
+    assert job["status"] == "done"
+    assert job["result"] == 42
+    assert job["label"] == "Doubling"
+
+
+def test_identical_jobs_run_once():
+    calls = []
+    release = threading.Event()
+
+    def work(report):
+        calls.append(1)
+        release.wait(5)
+        return "done"
+
+    first = job_queue.submit("same", work)
+    second = job_queue.submit("same", work)
+    release.set()
+
+    assert first == second
+    assert wait(first)["result"] == "done"
+    assert job_queue.submit("same", work) == first
+    assert len(calls) == 1
+
+
+def test_failed_jobs_are_reported_and_replaced():
+    def fail(report):
+        raise ValueError("bad input")
+
+    job = wait(job_queue.submit("flaky", fail))
+    assert job["status"] == "failed"
+    assert job["error"] == "ValueError: bad input"
+
+    job = wait(job_queue.submit("flaky", lambda report: "ok"))
+    assert job["status"] == "done"
+
+
+def test_finished_jobs_expire():
+    job_id = job_queue.submit("old", lambda report: 1)
+    finished = wait(job_id)["finished"]
+
+    with job_queue._lock:
+        job_queue.prune(now=finished + job_queue.JOB_TTL - 1)
+    assert job_queue.status(job_id) is not None
+
+    with job_queue._lock:
+        job_queue.prune(now=finished + job_queue.JOB_TTL + 1)
+    assert job_queue.status(job_id) is None
+
+
+def test_concurrent_sessions_share_one_pool(monkeypatch):
+    monkeypatch.setattr(job_queue, "_executor", None)
+    pools = []
+    start = threading.Barrier(8)
+
+    def get():
+        start.wait()
+        pools.append(job_queue.get_executor())
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(pool) for pool in pools}) == 1
+    pools[0].shutdown()
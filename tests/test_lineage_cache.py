@@ -0,0 +1,29 @@
+import lineage_cache
+
+LINEAGE = ("Bacteria", "Proteobacteria", "Gammaproteobacteria", "Enterobacterales",
+           "Enterobacteriaceae", "Escherichia", "Escherichia coli")
+
+
+def test_lineage_cache_lookup_and_store(tmp_path):
+    cache_file = tmp_path / "lineages.sqlite"
+
+    lineage_cache.store(cache_file, "1", {"Escherichia coli": LINEAGE})
+
+    assert lineage_cache.lookup(cache_file, "1", ["Escherichia coli", "unknown"]) == {
+        "Escherichia coli": LINEAGE
+    }
+
+
+def test_lineage_cache_drops_other_rules_versions(tmp_path):
+    cache_file = tmp_path / "lineages.sqlite"
+    lineage_cache.store(cache_file, "1", {"Escherichia coli": LINEAGE})
+
+    assert lineage_cache.lookup(cache_file, "2", ["Escherichia coli"]) == {}
+
+
+def test_lineage_cache_evicts_least_recently_used(tmp_path):
+    cache_file = tmp_path / "lineages.sqlite"
+    lineage_cache.store(cache_file, "1", {"a": LINEAGE})
+    lineage_cache.store(cache_file, "1", {"b": LINEAGE}, max_entries=1)
+
+    assert set(lineage_cache.lookup(cache_file, "1", ["a", "b"])) == {"b"}
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import clean_input_microbiome_taxonomy as cleaning
+import lineage_tree
+from conftest import SAMPLE_INPUT
+
+TAX_LEVELS = cleaning.TAX_LEVELS
+
+
+@pytest.fixture(scope="module")
+def cleaned():
+    return cleaning.clean_taxonomy_table(cleaning.read_taxonomy(SAMPLE_INPUT))
+
+
+@pytest.fixture(scope="module")
+def tree(cleaned):
+    return lineage_tree.build_tree(cleaned)
+
+
+def samples(df):
+    return [c for c in df.columns if c not in TAX_LEVELS]
+
+
+def test_level_tables_match_groupby(cleaned, tree):
+    for level in TAX_LEVELS:
+        expected = cleaned.groupby(level)[samples(cleaned)].sum().reset_index()
+        pd.testing.assert_frame_equal(lineage_tree.level_table(tree, level), expected, check_dtype=False)
+
+
+def test_bytes_round_trip(tree):
+    restored = lineage_tree.from_bytes(lineage_tree.to_bytes(tree))
+    for level in TAX_LEVELS:
+        pd.testing.assert_frame_equal(
+            lineage_tree.level_table(restored, level), lineage_tree.level_table(tree, level)
+        )
+
+
+def test_drill_down_matches_groupby(cleaned, tree):
+    phylum = lineage_tree.level_totals(tree, "Phylum").index[0]
+    subset = cleaned[cleaned["Phylum"] == phylum]
+    expected = subset.groupby("Genus")[samples(cleaned)].sum()
+    expected = expected.loc[expected.sum(axis=1).sort_values(ascending=False, kind="stable").index[:5]]
+
+    result = lineage_tree.drill_down(tree, "Phylum", phylum, "Genus", top_n=5).set_index("Genus")
+
+    pd.testing.assert_frame_equal(result[expected.columns], expected, check_dtype=False)
+    share = expected.sum(axis=1) / subset[samples(cleaned)].to_numpy().sum() * 100
+    np.testing.assert_allclose(result[f"% of {phylum}"], share)
+
+
+def test_drill_down_needs_a_lower_rank(tree):
+    with pytest.raises(ValueError):
+        lineage_tree.drill_down(tree, "Genus", "Escherichia", "Phylum")
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import clean_input_microbiome_taxonomy as cleaning
+import normalization
+from conftest import SAMPLE_INPUT
+
+
+def test_integer_counts_share_one_fitting_block():
+    df = pd.DataFrame({"Taxon": ["a", "b"], "S1": [1, 300], "S2": [0, 7]})
+
+    downcast = normalization.downcast_counts(df, ["Taxon"])
+
+    assert list(downcast.dtypes[["S1", "S2"]]) == [np.dtype(np.uint16)] * 2
+    assert downcast["Taxon"].tolist() == ["a", "b"]
+    pd.testing.assert_frame_equal(downcast, df, check_dtype=False)
+
+
+def test_float_counts_stay_float():
+    df = pd.DataFrame({"Taxon": ["a", "b"], "S1": [1, 2], "S2": [1.0, 2.0]})
+
+    assert normalization.downcast_counts(df, ["Taxon"]) is df
+
+
+def test_whole_float_input_keeps_float_outputs(workdir, monkeypatch):
+    monkeypatch.setattr(cleaning, "LINEAGE_CACHE_FILE", None)
+    raw = pd.read_csv(SAMPLE_INPUT, sep="\t")
+    raw = raw.astype({col: float for col in raw.columns[1:]})
+    raw.to_csv("input.txt", sep="\t", index=False)
+
+    cleaning.main(input_file="input.txt")
+
+    # Same text as pandas writes for the float table (baseline formatting)
+    cleaned = cleaning.clean_taxonomy_table(raw)
+    assert (workdir / cleaning.OUTPUT_CLEANED).read_text() == cleaned.to_csv(index=False)
+    for level in cleaning.TAX_LEVELS:
+        expected = cleaned.groupby(level)[list(raw.columns[1:])].sum().reset_index()
+        assert (workdir / f"{level.lower()}_table.csv").read_text() == expected.to_csv(index=False)
+
+
+def level_table():
+    return pd.DataFrame({
+        "Genus": ["a", "b", "c"],
+        "S1": np.array([2, 6, 0], dtype=np.uint8),
+        "S2": np.array([5, 5, 10], dtype=np.uint8),
+        "S3": np.array([0, 0, 0], dtype=np.uint8)
+    })
+
+
+def test_percent_scales_every_sample_to_100():
+    normalized = normalization.normalize(level_table(), "percent")
+
+    assert normalized["Genus"].tolist() == ["a", "b", "c"]
+    np.testing.assert_allclose(normalized["S1"], [25, 75, 0])
+    np.testing.assert_allclose(normalized["S2"], [25, 25, 50])
+    assert normalized["S3"].isna().all()
+    assert normalized["S1"].dtype == normalization.FLOAT_DTYPE
+
+
+def test_clr_centres_every_sample():
+    normalized = normalization.normalize(level_table(), "clr", dtype=np.float64)
+
+    values = normalized[["S1", "S2"]].to_numpy()
+    np.testing.assert_allclose(values.mean(axis=0), 0, atol=1e-12)
+    # Log-ratios of (count + pseudocount) between taxa
+    np.testing.assert_allclose(values[1, 0] - values[0, 0], np.log(6.5 / 2.5))
+
+
+def test_rarefy_draws_depth_reads_within_each_sample():
+    counts = np.array([[50, 3, 0], [30, 7, 1], [20, 0, 0]])
+
+    rarefied, keep = normalization.rarefy(counts, depth=10, seed=1)
+
+    assert keep.tolist() == [True, True, False]
+    assert rarefied.sum(axis=0).tolist() == [10, 10]
+    assert (rarefied <= counts[:, keep]).all()
+    np.testing.assert_array_equal(normalization.rarefy(counts, depth=10, seed=1)[0], rarefied)
+
+
+def test_rarefied_tables_need_whole_counts():
+    table = level_table().astype({"S1": float})
+    table.loc[0, "S1"] = 0.5
+
+    with pytest.raises(ValueError):
+        normalization.normalize(table, "rarefied")
+
+
+def test_counts_method_downcasts_only():
+    table = level_table().astype({col: np.int64 for col in ["S1", "S2", "S3"]})
+
+    normalized = normalization.normalize(table, "counts")
+
+    pd.testing.assert_frame_equal(normalized, table, check_dtype=False)
+    assert normalized["S1"].dtype == np.uint8
@@ -0,0 +1,105 @@
+import bz2
+import gzip
+import io
+import lzma
+
+import pandas as pd
+import pytest
+
+import report_formats
+import result_cache
+from conftest import SAMPLE_INPUT
+
+KRAKEN_REPORT = (
+    " 5.00\t5\t5\tU\t0\tunclassified\n"
+    "95.00\t95\t1\tR\t1\troot\n"
+    "94.00\t94\t0\tR1\t131567\t  cellular organisms\n"
+    "94.00\t94\t2\tD\t2\t    Bacteria\n"
+    "50.00\t50\t10\tP\t1224\t      Proteobacteria\n"
+    "40.00\t40\t30\tG\t561\t        Escherichia\n"
+    "10.00\t10\t6\tS\t562\t          Escherichia coli\n"
+    " 4.00\t4\t4\tS1\t83333\t            Escherichia coli K-12\n"
+    "42.00\t42\t42\tP\t1239\t      Firmicutes\n"
+)
+
+BRACKEN_TABLE = (
+    "name\ttaxonomy_id\ttaxonomy_lvl\tkraken_assigned_reads\tadded_reads\tnew_est_reads\tfraction_total_reads\n"
+    "Escherichia coli\t562\tS\t10\t5\t15\t0.6\n"
+    "Bacillus subtilis\t1423\tS\t8\t2\t10\t0.4\n"
+)
+
+COMPRESSORS = {"gzip": gzip.compress, "bz2": bz2.compress, "xz": lzma.compress}
+
+
+def test_kraken_report_becomes_lineage_table():
+    table = report_formats.read_report(io.BytesIO(KRAKEN_REPORT.encode()), sample="S1")
+
+    assert report_formats.detect_format(KRAKEN_REPORT.encode()) == "kraken"
+    # Direct reads of sub-ranks (S1) count towards their ranked parent;
+    # unclassified reads and reads at the root have no lineage
+    assert dict(zip(table["Taxon"], table["S1"])) == {
+        "d__Bacteria": 2,
+        "d__Bacteria; p__Proteobacteria": 10,
+        "d__Bacteria; p__Proteobacteria; g__Escherichia": 30,
+        "d__Bacteria; p__Proteobacteria; g__Escherichia; s__Escherichia coli": 10,
+        "d__Bacteria; p__Firmicutes": 42
+    }
+
+
+def test_bracken_table_becomes_lineage_table():
+    table = report_formats.read_report(io.BytesIO(BRACKEN_TABLE.encode()), sample="B1")
+
+    assert list(table.columns) == ["Taxon", "B1"]
+    assert dict(zip(table["Taxon"], table["B1"])) == {
+        "s__Escherichia coli": 15,
+        "s__Bacillus subtilis": 10
+    }
+
+
+@pytest.mark.parametrize("compression", list(COMPRESSORS))
+def test_compressed_reports_read_like_plain_ones(compression):
+    data = COMPRESSORS[compression](KRAKEN_REPORT.encode())
+
+    assert report_formats.detect_compression(io.BytesIO(data)) == compression
+    pd.testing.assert_frame_equal(
+        report_formats.read_report(io.BytesIO(data), sample="S1"),
+        report_formats.read_report(io.BytesIO(KRAKEN_REPORT.encode()), sample="S1")
+    )
+
+
+def test_lineage_table_is_read_in_chunks(tmp_path):
+    path = tmp_path / "input.txt.gz"
+    rows = [f"d__Bacteria; p__P{i}\t{i}\t{2 * i}" for i in range(10)]
+    path.write_bytes(gzip.compress(("Taxon\tA\tB\n" + "\n".join(rows) + "\n").encode()))
+
+    chunks = list(report_formats.read_chunks(path, chunksize=4))
+
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert pd.concat(chunks)["B"].tolist() == [2 * i for i in range(10)]
+
+
+def test_caller_stream_stays_open():
+    stream = io.BytesIO(gzip.compress(KRAKEN_REPORT.encode()))
+    report_formats.read_report(stream, sample="S1")
+    assert not stream.closed
+
+
+@pytest.mark.parametrize("name, sample", [
+    ("S1.kreport", "S1"),
+    ("reports/S1.kreport.gz", "S1"),
+    ("S1.txt.bz2", "S1"),
+    ("r3.v2.txt", "r3.v2"),
+    ("sample.bracken", "sample")
+])
+def test_sample_name(name, sample):
+    assert report_formats.sample_name(name) == sample
+
+
+def test_compressed_copy_hashes_like_the_plain_report(tmp_path):
+    plain = tmp_path / "b.txt"
+    plain.write_bytes(SAMPLE_INPUT.read_bytes())
+    with gzip.open(tmp_path / "b.txt.gz", "wb") as f:
+        f.write(plain.read_bytes())
+
+    assert report_formats.content_hash(tmp_path / "b.txt.gz") == report_formats.content_hash(plain)
+    assert report_formats.content_hash(plain) == result_cache.content_hash(plain.read_bytes())
@@ -0,0 +1,41 @@
+import pytest
+
+import result_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_memory_cache():
+    result_cache._memory.clear()
+    yield
+    result_cache._memory.clear()
+
+
+def test_result_cache_round_trip(tmp_path):
+    files = {"tables/genus_table.csv": b"Genus,A\nx,1\n", "plot.png": b"\x89PNG"}
+
+    result_cache.store("key", files, cache_dir=tmp_path)
+
+    assert result_cache.restore("key", cache_dir=tmp_path) == files
+    assert result_cache.restore("other", cache_dir=tmp_path) is None
+
+
+def test_result_cache_evicts_oldest_entries(tmp_path):
+    result_cache.store("old", {"a": b"x" * 100}, cache_dir=tmp_path)
+    result_cache.store("new", {"a": b"y" * 100}, cache_dir=tmp_path, max_bytes=150)
+
+    assert result_cache.restore("old", cache_dir=tmp_path) is None
+    assert result_cache.restore("new", cache_dir=tmp_path) == {"a": b"y" * 100}
+
+
+def test_cache_key_changes_with_results_version(monkeypatch):
+    key = result_cache.cache_key("abc", stage="tables", top_n=10)
+    assert result_cache.cache_key("abc", stage="tables", top_n=10) == key
+    assert result_cache.cache_key("abc", stage="tables", top_n=20) != key
+
+    monkeypatch.setattr(result_cache, "RESULTS_VERSION", result_cache.RESULTS_VERSION + 1)
+    result_cache.code_version.cache_clear()
+    try:
+        assert result_cache.cache_key("abc", stage="tables", top_n=10) != key
+    finally:
+        monkeypatch.undo()
+        result_cache.code_version.cache_clear()
@@ -0,0 +1,99 @@
+import hashlib
+import io
+import threading
+import time
+import zipfile
+
+import pytest
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.testing.v1 import AppTest
+
+import job_queue
+from conftest import ROOT, SAMPLE_INPUT
+from taxonomy_rollup import TAX_LEVELS
+
+APP_FILE = ROOT / "Microbiome_Report_Analysis_APP.py"
+ARCHIVE_NAME = "microbiome_analysis_results.zip"
+GOLDEN = ROOT / "tests" / "golden"
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    # Download callables registered by the app, as (file name, callable)
+    registered = []
+    add_deferred = MediaFileManager.add_deferred
+
+    def record(self, data_callable, mimetype, coordinates, file_name=None):
+        registered.append((file_name, data_callable))
+        return add_deferred(self, data_callable, mimetype, coordinates, file_name=file_name)
+
+    monkeypatch.setattr(MediaFileManager, "add_deferred", record)
+    return registered
+
+
+@pytest.fixture
+def app(workdir, downloads):
+    # App with the sample input cleaned (results cached under workdir)
+    at = AppTest.from_file(str(APP_FILE), default_timeout=120)
+    at.run()
+
+    data = SAMPLE_INPUT.read_bytes()
+    at.session_state["input"] = {
+        "file_id": SAMPLE_INPUT.name,
+        "bytes": data,
+        "hash": hashlib.sha256(data).hexdigest()
+    }
+    at.run()
+    next(b for b in at.button if b.label == "Run Taxonomy Cleaning").click().run()
+
+    deadline = time.monotonic() + 120
+    while at.session_state["jobs"] or "tables" not in at.session_state:
+        assert time.monotonic() < deadline, "cleaning job did not finish"
+        time.sleep(job_queue.POLL_INTERVAL)
+        at.run()
+    return at
+
+
+def archive_callable(downloads):
+    # Download callable of the ZIP button registered by the latest run
+    return [func for name, func in downloads if name == ARCHIVE_NAME][-1]
+
+
+def download(data):
+    # What Streamlit serves for a download callable's return value
+    return convert_data_to_bytes_and_infer_mime(data, TypeError("unsupported"))[0]
+
+
+def test_archive_holds_every_table_and_the_input(app, downloads):
+    archive = zipfile.ZipFile(io.BytesIO(download(archive_callable(downloads)())))
+
+    names = archive.namelist()
+    assert SAMPLE_INPUT.name in names
+    assert archive.read(SAMPLE_INPUT.name) == SAMPLE_INPUT.read_bytes()
+
+    tables = ["cleaned_taxonomy.csv"] + [f"tables/{level.lower()}_table.csv" for level in TAX_LEVELS]
+    assert set(tables) <= set(names)
+    assert archive.read("tables/genus_table.csv") == (GOLDEN / "genus_table.csv").read_bytes()
+
+
+def test_archive_is_returned_as_a_stream_and_reused(app, downloads):
+    build = archive_callable(downloads)
+
+    first = build()
+    assert isinstance(first, io.RawIOBase)
+    assert build().file is first.file
+
+    # Concurrent downloads each read the whole archive
+    results = [None] * 4
+
+    def read(i):
+        results[i] = download(build())
+
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(len(results))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(results)) == 1
+    assert zipfile.ZipFile(io.BytesIO(results[0])).testzip() is None
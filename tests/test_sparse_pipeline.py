@@ -0,0 +1,22 @@
+import pytest
+
+import clean_input_microbiome_taxonomy as cleaning
+from conftest import write_input
+
+OUTPUTS = [cleaning.OUTPUT_CLEANED] + [f"{level.lower()}_table.csv" for level in cleaning.TAX_LEVELS]
+
+
+@pytest.mark.parametrize("chunksize", [None, 50])
+@pytest.mark.parametrize("columns", [{}, {"nan_columns": ["CD2"]}, {"fraction_columns": ["AB1"]}])
+def test_sparse_outputs_match_dense(workdir, monkeypatch, chunksize, columns):
+    input_file = write_input(workdir / "input.txt", **columns)
+    monkeypatch.setattr(cleaning, "LINEAGE_CACHE_FILE", None)
+
+    cleaning.main(input_file=input_file)
+    dense = {name: (workdir / name).read_text() for name in OUTPUTS}
+
+    cleaning.main(chunksize=chunksize, sparse=True, input_file=input_file)
+
+    # Every file, count formatting included, is the same text
+    for name in OUTPUTS:
+        assert (workdir / name).read_text() == dense[name], name
@@ -0,0 +1,88 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import clean_input_microbiome_taxonomy as cleaning
+import table_store
+from conftest import SAMPLE_INPUT
+
+OUTPUTS = [cleaning.OUTPUT_CLEANED] + [f"{level.lower()}_table.csv" for level in cleaning.TAX_LEVELS]
+
+
+def sample_table():
+    return pd.DataFrame({
+        "Genus": ["Bacillus", None, "Escherichia", "Bacillus"],
+        "S1": np.array([1, 2, 3, 4], dtype=np.uint16),
+        "S2": [0.5, np.nan, 2.0, 0.0],
+        "S3": np.array([7, 0, 0, 1], dtype=np.uint16)
+    })
+
+
+def test_bytes_round_trip():
+    df = sample_table()
+    restored = table_store.from_bytes(table_store.to_bytes(df))
+
+    pd.testing.assert_frame_equal(restored, df, check_dtype=False)
+    assert restored["S1"].dtype == np.uint16
+    assert restored["S2"].dtype == np.float64
+
+
+def test_directory_round_trip(tmp_path):
+    df = sample_table()
+    table_store.save_table(df, tmp_path / "genus_table")
+
+    pd.testing.assert_frame_equal(table_store.load_table(tmp_path / "genus_table"), df, check_dtype=False)
+
+
+def test_read_table_uses_current_copy_only(tmp_path):
+    csv_path = tmp_path / "genus_table.csv"
+    df = sample_table()
+    df.to_csv(csv_path, index=False)
+    table_store.save_copy(df, csv_path)
+
+    assert table_store.is_current(csv_path)
+    assert table_store.read_table(csv_path)["S1"].dtype == np.uint16
+
+    # The CSV is rewritten without its binary copy
+    df.iloc[:2].to_csv(csv_path, index=False)
+    os.utime(csv_path, ns=(0, 0))
+
+    assert not table_store.is_current(csv_path)
+    assert len(table_store.read_table(csv_path)) == 2
+
+
+def test_save_replaces_the_whole_store(tmp_path):
+    path = tmp_path / "genus_table"
+    table_store.save_table(sample_table(), path)
+    table_store.save_table(sample_table()[["Genus", "S2"]], path)
+
+    assert sorted(p.name for p in path.iterdir()) == ["block_0.npy", "label_0_codes.npy", "label_0_names.npy", "meta.json"]
+
+
+def test_binary_stores_match_csv(workdir, monkeypatch):
+    monkeypatch.setattr(cleaning, "LINEAGE_CACHE_FILE", None)
+    shutil.copy(SAMPLE_INPUT, workdir / cleaning.INPUT_FILE)
+    cleaning.main()
+
+    for name in OUTPUTS:
+        assert table_store.is_current(name)
+        pd.testing.assert_frame_equal(
+            table_store.read_table(name), pd.read_csv(name), check_dtype=False
+        )
+
+
+@pytest.mark.parametrize("options", [{"chunksize": 50}, {"sparse": True}])
+def test_other_modes_drop_stale_binary_copies(workdir, monkeypatch, options):
+    monkeypatch.setattr(cleaning, "LINEAGE_CACHE_FILE", None)
+    shutil.copy(SAMPLE_INPUT, workdir / cleaning.INPUT_FILE)
+    cleaning.main()
+
+    cleaning.main(**options)
+
+    assert not table_store.exists(table_store.store_path(cleaning.OUTPUT_CLEANED))
+    assert not (workdir / cleaning.TREE_FILE).exists()
+    for level in cleaning.TAX_LEVELS:
+        assert table_store.is_current(f"{level.lower()}_table.csv")
@@ -0,0 +1,56 @@
+import re
+
+import pandas as pd
+import pytest
+
+import clean_input_microbiome_taxonomy as cleaning
+import lineage_tree
+import taxon_search
+from conftest import SAMPLE_INPUT
+
+TAX_LEVELS = cleaning.TAX_LEVELS
+
+
+@pytest.fixture(scope="module")
+def cleaned():
+    return cleaning.clean_taxonomy_table(cleaning.read_taxonomy(SAMPLE_INPUT))
+
+
+@pytest.fixture(scope="module")
+def tree(cleaned):
+    return lineage_tree.build_tree(cleaned)
+
+
+def samples(df):
+    return [c for c in df.columns if c not in TAX_LEVELS]
+
+
+@pytest.mark.parametrize("query, mode", [("bacter", "substring"), ("Pseudo", "prefix"), ("^[a-c].*ales$", "regex")])
+def test_search_matches_brute_force(cleaned, tree, query, mode):
+    index = taxon_search.build_index(tree)
+    result = taxon_search.search(tree, index, query, mode, max_results=1000)
+
+    match = {
+        "substring": lambda name: query.lower() in name.lower(),
+        "prefix": lambda name: name.lower().startswith(query.lower()),
+        "regex": lambda name: re.search(query, name, re.IGNORECASE) is not None
+    }[mode]
+    expected = {}
+    for level in TAX_LEVELS:
+        sums = cleaned.groupby(level)[samples(cleaned)].sum()
+        for name, row in sums.iterrows():
+            if match(name):
+                expected[(level, name)] = row.sum()
+
+    assert dict(zip(zip(result["Rank"], result["Taxon"]), result["Total"])) == expected
+
+
+def test_filter_level_tables_matches_regrouping(cleaned, tree):
+    exclude = ["Proteobacteria", "Bacillales"]
+    kept = cleaned[~cleaned[TAX_LEVELS].isin(exclude).any(axis=1)]
+
+    filtered = taxon_search.filter_level_tables(tree, exclude)
+
+    for level in TAX_LEVELS:
+        expected = kept.groupby(level)[samples(cleaned)].sum().reset_index()
+        pd.testing.assert_frame_equal(filtered[level], expected, check_dtype=False)
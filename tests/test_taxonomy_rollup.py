@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+import normalization
+import taxonomy_rollup
+from taxonomy_rollup import TAX_LEVELS
+
+
+def random_cleaned_table(seed, n_rows=300, n_samples=4, missing=False):
+    rng = np.random.default_rng(seed)
+    taxonomy = {
+        level: np.where(
+            rng.random(n_rows) < 0.1, None,
+            [f"{level[0]}{i}" for i in rng.integers(0, 3 + depth * 2, n_rows)]
+        )
+        for depth, level in enumerate(TAX_LEVELS)
+    }
+    counts = rng.poisson(3, (n_rows, n_samples)).astype(np.float64 if missing else np.int64)
+    if missing:
+        counts[rng.random(counts.shape) < 0.05] = np.nan
+    df = pd.DataFrame(taxonomy)
+    for i in range(n_samples):
+        df[f"S{i}"] = counts[:, i]
+    return df
+
+
+def test_rollup_matches_groupby():
+    for seed, missing in [(0, False), (1, True), (2, False)]:
+        df = random_cleaned_table(seed, missing=missing)
+        samples = [c for c in df.columns if c not in TAX_LEVELS]
+
+        level_tables = taxonomy_rollup.rollup_level_tables(df)
+
+        for level in TAX_LEVELS:
+            expected = df.groupby(level)[samples].sum()
+            pd.testing.assert_frame_equal(level_tables[level], expected, check_dtype=False)
+
+
+def test_integer_sums_get_fitting_dtype():
+    df = random_cleaned_table(3)
+    level_tables = taxonomy_rollup.rollup_level_tables(df)
+
+    for table in level_tables.values():
+        # One block of the smallest integer type holding the level's sums
+        assert table.dtypes.nunique() == 1
+        assert table.dtypes.iloc[0] == normalization.count_dtype(table.to_numpy())
+        assert table.dtypes.iloc[0].kind == "u"